@@ -0,0 +1,284 @@
+"""Headless benchmark for Space Invaders.
+
+Drives scripted input through Game.handle_events/update/draw for every level
+config, the stress presets, the Ctrl rapid-fire volley, spectator-stream
+encoding and the logo, intro and credits sequences, then reports ticks/sec,
+per-phase time and peak memory.
+
+    python benchmark.py                      # run everything, compare to baseline
+    python benchmark.py --save-baseline      # store the current numbers as the baseline
+    python benchmark.py --only level_1 swarm --ticks 300
+    python benchmark.py --renderer sdl2 --baseline sdl2_baseline.json
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pygame
+import space_invaders as si
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TICKS = 300
+MEMORY_TICKS = 120         # Ticks run again under tracemalloc to measure peak memory
+DEFAULT_THRESHOLD = 0.15   # Allowed slowdown / memory growth before it counts as a regression
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+PHASES = ('events', 'update', 'spectate', 'draw', 'flip')
+
+
+class ScriptedKeys:
+    """Stands in for pygame.key.get_pressed() with a fixed set of held keys"""
+    def __init__(self):
+        self.held = set()
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+def press(key):
+    """Queue a key press for the next handle_events call"""
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0))
+
+
+def new_game(level=1, stress=None):
+    """A game past the title screen, playing the given level with sound off"""
+    game = si.Game(endless=level >= si.ENDLESS_START_LEVEL, stress=stress, seed=1234)
+    game.title_screen = False
+    game.show_level_text = False
+    game.mute_sounds = True
+    game.mute_bgm = True
+    game.level = level
+    game.create_invaders()
+    return game
+
+
+def game_scenario(level=1, stress=None, volley=False, spectate=False):
+    """Build a scenario that plays a level with a fixed input script"""
+    def run(ticks):
+        game = new_game(level, stress)
+        stream = si.SpectatorStream() if spectate else None  # Encodes only; nowhere to send it
+        keys = ScriptedKeys()
+        keys.held.add(pygame.K_RSHIFT)  # Invincible, so every tick is real gameplay
+        if volley:
+            keys.held.add(pygame.K_RCTRL)
+        game.input_source = lambda: keys
+
+        phases = dict.fromkeys(PHASES, 0.0)
+        perf = time.perf_counter
+        for tick in range(ticks):
+            # Sweep left and right, firing every few ticks
+            keys.held.discard(pygame.K_LEFT)
+            keys.held.discard(pygame.K_RIGHT)
+            keys.held.add(pygame.K_LEFT if (tick // 90) % 2 else pygame.K_RIGHT)
+            if tick % (5 if volley else 12) == 0:
+                press(pygame.K_SPACE)
+            if game.level_complete:
+                press(pygame.K_RETURN)
+
+            t0 = perf()
+            game.handle_events()
+            t1 = perf()
+            game.update()
+            t2 = perf()
+            if stream is not None:
+                stream.capture(game)
+            t3 = perf()
+            game.draw(si.app.screen)
+            t4 = perf()
+            si.app.present()
+            t5 = perf()
+            phases['events'] += t1 - t0
+            phases['update'] += t2 - t1
+            phases['spectate'] += t3 - t2
+            phases['draw'] += t4 - t3
+            phases['flip'] += t5 - t4
+        return phases
+    return run
+
+
+def logo_scenario(ticks):
+    logo_screen = si.LogoScreen()
+    phases = dict.fromkeys(PHASES, 0.0)
+    perf = time.perf_counter
+    for _ in range(ticks):
+        t0 = perf()
+        logo_screen.update()
+        t1 = perf()
+        logo_screen.draw(si.app.screen)
+        t2 = perf()
+        si.app.present()
+        t3 = perf()
+        phases['update'] += t1 - t0
+        phases['draw'] += t2 - t1
+        phases['flip'] += t3 - t2
+    return phases
+
+
+def intro_scenario(ticks):
+    start = time.perf_counter()
+    si.star_wars_intro(si.app.screen, fps=0, max_frames=ticks)
+    return {'draw': time.perf_counter() - start}
+
+
+def credits_scenario(ticks):
+    start = time.perf_counter()
+    si.show_exit_credits(fps=0, max_frames=ticks)
+    return {'draw': time.perf_counter() - start}
+
+
+def measure_startup(runs=5):
+    """Import the game module in fresh interpreters and time the import, pygame included"""
+    code = "import space_invaders as si; print(si.app.timings['import'])"
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True,
+                                text=True, check=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return min(times)
+
+
+def build_scenarios():
+    """All benchmark scenarios, in report order"""
+    scenarios = {}
+    for level in range(1, si.ENDLESS_START_LEVEL):
+        scenarios[f"level_{level}"] = game_scenario(level)
+    scenarios['endless_25'] = game_scenario(25)
+    for name in si.STRESS_PRESETS:
+        scenarios[name] = game_scenario(stress=name)
+    scenarios['ctrl_volley'] = game_scenario(1, volley=True)
+    scenarios['spectate_10'] = game_scenario(10, spectate=True)
+    scenarios['spectate_25'] = game_scenario(25, spectate=True)
+    scenarios['spectate_barrage'] = game_scenario(stress='barrage', spectate=True)
+    scenarios['logo'] = logo_scenario
+    scenarios['intro'] = intro_scenario
+    scenarios['credits'] = credits_scenario
+    return scenarios
+
+
+def measure(run, ticks):
+    """Time one scenario, then run it again briefly under tracemalloc for peak memory"""
+    random.seed(1234)
+    pygame.event.clear()
+    start = time.perf_counter()
+    phases = run(ticks)
+    total = time.perf_counter() - start
+
+    random.seed(1234)
+    pygame.event.clear()
+    tracemalloc.start()
+    run(min(ticks, MEMORY_TICKS))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'ticks_per_sec': round(ticks / total, 1),
+        'peak_kb': round(peak / 1024, 1),
+    }
+    for phase, seconds in phases.items():
+        result[f"{phase}_ms"] = round(seconds * 1000 / ticks, 4)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages against the baseline numbers"""
+    regressions = []
+    for name, result in results.items():
+        if 'error' in result or name not in baseline or 'error' in baseline[name]:
+            continue
+        base = baseline[name]
+        if result['ticks_per_sec'] < base['ticks_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {result['ticks_per_sec']} ticks/sec "
+                               f"(baseline {base['ticks_per_sec']})")
+        if result['peak_kb'] > base['peak_kb'] * (1 + threshold) + 64:
+            regressions.append(f"{name}: peak {result['peak_kb']} KB (baseline {base['peak_kb']} KB)")
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'scenario':<18}{'ticks/s':>10}{'vs base':>9}"
+          + "".join(f"{phase + ' ms':>12}" for phase in PHASES) + f"{'peak KB':>10}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<18}  skipped: {result['error']}")
+            continue
+        base = baseline.get(name, {}).get('ticks_per_sec')
+        change = f"{(result['ticks_per_sec'] / base - 1) * 100:+.0f}%" if base else "-"
+        print(f"{name:<18}{result['ticks_per_sec']:>10}{change:>9}"
+              + "".join(f"{result.get(phase + '_ms', 0):>12.3f}" for phase in PHASES)
+              + f"{result['peak_kb']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS, help="Ticks per scenario")
+    parser.add_argument('--only', nargs='+', metavar='SCENARIO', help="Run only these scenarios")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="Write results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Fractional slowdown or memory growth that fails the run")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--renderer', choices=si.RENDERERS, default='software',
+                        help="How frames reach the window (compare against a baseline taken the same way)")
+    args = parser.parse_args(argv)
+
+    si.app.renderer = args.renderer
+    si.app.open_window()
+
+    scenarios = build_scenarios()
+    if args.only:
+        unknown = set(args.only) - set(scenarios)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in args.only}
+
+    results = {}
+    for name, run in scenarios.items():
+        try:
+            results[name] = measure(run, args.ticks)
+        except Exception as e:  # e.g. a music file missing from this checkout
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_table(results, baseline)
+    import_ms = measure_startup()
+    print(f"module import: {import_ms:.2f} ms (budget {si.IMPORT_BUDGET_MS} ms)")
+    if resource is not None:
+        print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if import_ms > si.IMPORT_BUDGET_MS:
+        regressions.append(f"module import took {import_ms:.2f} ms (budget {si.IMPORT_BUDGET_MS} ms)")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Preprocess the game's assets and pack them into a single memory-mappable archive.
+
+    python build_assets.py                 # writes assets.pak next to the game
+    python build_assets.py --no-compress   # store long audio as WAV (no encoder needed)
+
+Preprocessing:
+- logos are pre-scaled for the SCREEN_WIDTH x SCREEN_HEIGHT canvas, the only
+  size the game draws them at, and stored as zlib-packed raw pixels that load
+  with pygame.image.frombytes instead of a PNG/JPG decode. The full-size
+  original isn't packed when a pre-scaled one replaces it;
+- long audio tracks are transcoded to OGG Vorbis with ffmpeg or oggenc, and
+  the build fails without one unless --no-compress is given;
+- sound effects stay as they are: converting them to the mixer's format here
+  would double their size, and SDL_mixer converts them as they load anyway.
+
+Every output is kept in .asset_cache/ under a hash of the source file's bytes
+plus the parameters that produced it, so rebuilding only redoes what changed.
+The game reads entries straight out of the mapped archive through App.open_asset.
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import hashlib
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import zlib
+
+import pygame
+from space_invaders import (ASSET_BUNDLE, BUNDLE_MAGIC, SOUND_FILES, MUSIC_TRACKS, LOGO_SEQUENCE,
+                            SCREEN_WIDTH, SCREEN_HEIGHT, logo_fit_size, image_variant_name)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, ".asset_cache")
+PREPROCESS_VERSION = 2  # Bump to invalidate every cached output
+
+COMPRESS_MIN_BYTES = 256 * 1024  # Short effects stay WAV: they decode faster than they'd save
+OGG_ENCODERS = ("ffmpeg", "oggenc")
+
+
+def logo_files():
+    """(filename, paired) for every logo in the startup sequence"""
+    for item in LOGO_SEQUENCE:
+        if isinstance(item, tuple):
+            for filename in item:
+                yield filename, True
+        else:
+            yield item, False
+
+
+def asset_files():
+    """Every original asset the game loads, in a stable order"""
+    sounds = [filename for filename, _ in SOUND_FILES.values()]
+    music = [filename for filename, _ in MUSIC_TRACKS.values()]
+    return sounds + music + [filename for filename, _ in logo_files()]
+
+
+def cached(cache_dir, source_bytes, params, produce):
+    """Return produce()'s output, reusing the copy cached for these source bytes and params"""
+    key = hashlib.sha256(source_bytes)
+    key.update(json.dumps(dict(params, version=PREPROCESS_VERSION), sort_keys=True).encode('utf-8'))
+    path = os.path.join(cache_dir, key.hexdigest())
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    data = produce()
+    if data is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    return data
+
+
+def ogg_encoder():
+    """The first of OGG_ENCODERS on the PATH, or None"""
+    return next((name for name in OGG_ENCODERS if shutil.which(name)), None)
+
+
+def transcode_to_ogg(source_bytes, encoder):
+    """Encode WAV bytes as OGG Vorbis; a failing encoder raises CalledProcessError"""
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "in.wav")
+        target = os.path.join(work, "out.ogg")
+        with open(source, 'wb') as f:
+            f.write(source_bytes)
+        if encoder == "ffmpeg":
+            command = ["ffmpeg", "-loglevel", "error", "-y", "-i", source, "-c:a", "libvorbis",
+                       "-q:a", "5", target]
+        else:
+            command = ["oggenc", "--quiet", "-q", "5", "-o", target, source]
+        subprocess.run(command, check=True)
+        with open(target, 'rb') as f:
+            return f.read()
+
+
+def prescale_logo(source_bytes, filename, size):
+    """Scale a logo to size; returns its 4-byte pixel format name then the zlib-packed pixels"""
+    image = pygame.image.load(io.BytesIO(source_bytes), filename)
+    image = pygame.transform.scale(image, size)
+    pixel_format = 'RGBA' if image.get_flags() & pygame.SRCALPHA else 'RGB'
+    return pixel_format.ljust(4).encode('ascii') + zlib.compress(pygame.image.tobytes(image, pixel_format), 6)
+
+
+def preprocess(source_dir, cache_dir, encoder=None):
+    """Build the (name, stored_as, data, meta) bundle entries from the loose assets.
+
+    Long audio is transcoded with encoder (see ogg_encoder); None stores it as WAV.
+    """
+    screen = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    paired = dict(logo_files())
+    entries = []
+
+    for name in asset_files():
+        source = os.path.join(source_dir, name)
+        if not os.path.exists(source):
+            print(f"missing, skipped: {name}", file=sys.stderr)
+            continue
+        with open(source, 'rb') as f:
+            source_bytes = f.read()
+
+        if name in paired:
+            image_size = pygame.image.load(io.BytesIO(source_bytes), name).get_size()
+            size = logo_fit_size(image_size, screen, paired[name])
+            if size is not None:  # Otherwise it's shown unscaled and the original is the right entry
+                blob = cached(cache_dir, source_bytes, {'op': 'logo', 'size': list(size)},
+                              lambda: prescale_logo(source_bytes, name, size))
+                pixel_format, pixels = blob[:4].rstrip(b' ').decode('ascii'), blob[4:]
+                meta = {'pixel_size': list(size), 'pixel_format': pixel_format}
+                variant = image_variant_name(name, screen)
+                entries.append((variant, variant + ".raw", pixels, meta))
+                continue
+
+        stored_as, data = name, source_bytes
+        if name.endswith('.wav') and encoder and len(source_bytes) >= COMPRESS_MIN_BYTES:
+            stored_as = os.path.splitext(name)[0] + ".ogg"
+            data = cached(cache_dir, source_bytes, {'op': 'ogg', 'quality': 5, 'encoder': encoder},
+                          lambda: transcode_to_ogg(source_bytes, encoder))
+        entries.append((name, stored_as, data, {}))
+    return entries
+
+
+def write_bundle(path, entries):
+    """Write (name, stored_as, data, meta) entries as an asset bundle"""
+    index = {}
+    offset = 0
+    for name, stored_as, data, meta in entries:
+        index[name] = dict(meta, offset=offset, size=len(data), stored_as=stored_as)
+        offset += len(data)
+    index_bytes = json.dumps(index, sort_keys=True).encode('utf-8')
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(len(index_bytes).to_bytes(4, 'little'))
+        f.write(index_bytes)
+        for _, _, data, _ in entries:
+            f.write(data)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess and pack the game's assets")
+    parser.add_argument('--source', default=HERE, help="Directory holding the loose asset files")
+    parser.add_argument('--output', default=os.path.join(HERE, ASSET_BUNDLE))
+    parser.add_argument('--cache', default=CACHE_DIR, help="Directory for cached preprocessing outputs")
+    parser.add_argument('--no-compress', action='store_true', help="Don't transcode long audio to OGG")
+    args = parser.parse_args(argv)
+
+    encoder = None
+    if not args.no_compress:
+        encoder = ogg_encoder()
+        if encoder is None:
+            print(f"error: no OGG encoder found (looked for {' and '.join(OGG_ENCODERS)}). Without one the "
+                  "music is packed as WAV and the one-file build extracts nearly as much as before; "
+                  "install an encoder or pass --no-compress to build that way anyway.", file=sys.stderr)
+            return 1
+
+    entries = preprocess(args.source, args.cache, encoder)
+    write_bundle(args.output, entries)
+    for name, stored_as, data, _ in entries:
+        print(f"{name:<32}{stored_as:<40}{len(data) // 1024:>8} KB")
+    # The pak replaces the loose files in the one-file build, so it has to come out smaller
+    loose = sum(os.path.getsize(os.path.join(args.source, name)) for name in asset_files()
+                if os.path.exists(os.path.join(args.source, name)))
+    packed = os.path.getsize(args.output)
+    print(f"wrote {args.output} ({packed // 1024} KB, loose assets {loose // 1024} KB)")
+    if packed >= loose:
+        print("warning: the pak is no smaller than the loose assets it replaces", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,516 @@
+"""Two-player versus over UDP with rollback netcode.
+
+Both peers simulate both players' games. Only each tick's input bitmask goes
+over the wire. A peer applies its own input on the frame it was pressed and
+guesses the other player's input from what they last held. When the real input
+arrives and differs from the guess, the peer restores the snapshot taken before
+that frame and resimulates up to the present. Points scored drop extra bullets
+on the opponent, so each game depends on both players' inputs.
+
+    python netplay.py host --port 7777
+    python netplay.py join 192.168.1.5:7777
+    python netplay.py selftest --latency 60 --jitter 20 --loss 0.05 --frames 1800
+
+--latency, --jitter and --loss go through a shim that delays, reorders and drops
+outgoing packets, so bad networks can be tried on one machine over loopback.
+Each peer reports rollback depth and resimulation cost per frame.
+"""
+import os
+import argparse
+import heapq
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+
+import pygame
+import space_invaders as si
+
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_FIRE = 4      # Pressed this tick
+INPUT_CONFIRM = 8   # Pressed this tick; moves on from a completed level
+HELD_INPUTS = INPUT_LEFT | INPUT_RIGHT  # What prediction assumes is still held
+
+NET_MAGIC = b"SIN1"
+# magic, match id, ack (last frame received from the peer), checksum frame, checksum,
+# first frame of the inputs that follow, input count
+NET_HEADER = struct.Struct('<4sIiiIIB')
+MAX_ROLLBACK = 15        # Frames a peer may run ahead of the other's confirmed input before stalling
+MAX_PACKET_INPUTS = 255  # Unacknowledged inputs are resent in every packet, so a lost one costs nothing
+CHECKSUM_INTERVAL = 60   # Frames between state checksums exchanged to catch desyncs
+GARBAGE_POINTS = 300     # Points scored per bullet dropped on the opponent
+DEFAULT_PORT = 7777
+
+
+class InputKeys:
+    """Stands in for pygame.key.get_pressed(), reading the held keys from an input bitmask"""
+    def __init__(self):
+        self.bits = 0
+
+    def __getitem__(self, key):
+        if key == pygame.K_LEFT:
+            return bool(self.bits & INPUT_LEFT)
+        if key == pygame.K_RIGHT:
+            return bool(self.bits & INPUT_RIGHT)
+        return False
+
+
+def sample_input(events):
+    """The local player's input bitmask from the keyboard and this frame's key presses"""
+    keys = pygame.key.get_pressed()
+    bits = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        bits |= INPUT_LEFT
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        bits |= INPUT_RIGHT
+    for event in events:
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            bits |= INPUT_FIRE
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+            bits |= INPUT_CONFIRM
+    return bits
+
+
+class VersusMatch:
+    """Two games on the same seed, stepped together from both players' inputs"""
+    def __init__(self, seed=0, level=1):
+        self.games = []
+        self.keys = []
+        for _ in range(2):
+            game = si.Game(seed=seed)
+            game.rewind = None         # Rollback keeps its own snapshots
+            game.score_submitted = True  # Versus scores stay off the leaderboard
+            game.title_screen = False
+            game.level = level
+            game.create_invaders()
+            game.start_level_text()
+            keys = InputKeys()
+            game.input_source = lambda keys=keys: keys
+            self.games.append(game)
+            self.keys.append(keys)
+        self.sent = [0, 0]  # Garbage bullets each player has sent so far
+
+    @property
+    def finished(self):
+        return all(game.game_over for game in self.games)
+
+    def step(self, inputs, quiet=False):
+        """Advance both games one frame; quiet keeps resimulated frames from replaying sounds"""
+        for game, keys, bits in zip(self.games, self.keys, inputs):
+            keys.bits = bits
+            mute_sounds = game.mute_sounds
+            if quiet:
+                game.mute_sounds = True
+            if (bits & INPUT_FIRE and not (game.game_over or game.level_complete or game.show_level_text)):
+                game.shoot_player_bullet()
+            if bits & INPUT_CONFIRM and game.level_complete and not game.won:
+                game.next_level()
+            game.step()
+            game.mute_sounds = mute_sounds
+
+        for index, game in enumerate(self.games):
+            owed = game.score // GARBAGE_POINTS - self.sent[index]
+            if owed > 0:
+                self.sent[index] += owed
+                self.drop_garbage(self.games[1 - index], owed)
+
+    def drop_garbage(self, game, count):
+        """Rain bullets on a game from above, at columns its own rng picks"""
+        if game.game_over:
+            return
+        for _ in range(count):
+            x = game.rng.randrange(0, si.SCREEN_WIDTH - 4)
+            game.invader_bullets.append(si.Bullet(x, 0, 5 + game.level, si.ORANGE, si.INVADER_BULLET_HP[5]))
+
+    def snapshot(self):
+        return b''.join([struct.pack('<II', *self.sent)] + [si.pack_block(game.snapshot()) for game in self.games])
+
+    def restore(self, blob):
+        self.sent = list(struct.unpack_from('<II', blob))
+        offset = 8
+        for game in self.games:
+            size, = struct.unpack_from('<I', blob, offset)
+            game.restore(blob[offset + 4:offset + 4 + size])
+            offset += 4 + size
+
+
+class UdpLink:
+    """A non-blocking UDP socket talking to one peer; a host learns its peer from the first packet"""
+    def __init__(self, sock, peer=None):
+        sock.setblocking(False)
+        self.sock = sock
+        self.peer = peer
+
+    def send(self, data):
+        if self.peer is not None:
+            try:
+                self.sock.sendto(data, self.peer)
+            except OSError:
+                pass  # Unreachable for now; the next packet carries the same inputs
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except OSError:
+                return packets  # e.g. ICMP port unreachable reported on Windows
+            if self.peer is None:
+                self.peer = address
+            if address == self.peer:
+                packets.append(data)
+
+
+class LossyLink:
+    """Wraps a link, delaying outgoing packets by latency +/- jitter ms and dropping a share of them"""
+    def __init__(self, link, latency=0, jitter=0, loss=0.0, seed=None, clock=None):
+        self.link = link
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock or (lambda: time.monotonic() * 1000)
+        self.queue = []  # (due ms, seq, data)
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        self.seq += 1
+        heapq.heappush(self.queue, (self.clock() + delay, self.seq, data))
+
+    def flush(self):
+        now = self.clock()
+        while self.queue and self.queue[0][0] <= now:
+            self.link.send(heapq.heappop(self.queue)[2])
+
+    def receive(self):
+        self.flush()
+        return self.link.receive()
+
+
+class NetStats:
+    """Rollback depth and resimulation time, per frame and over the session"""
+    def __init__(self):
+        self.frames = 0
+        self.stalls = 0
+        self.rollbacks = 0
+        self.depths = {}  # Rollback depth -> times it happened
+        self.resim_ms = 0.0
+        self.max_resim_ms = 0.0
+        self.last_depth = 0
+        self.last_resim_ms = 0.0
+
+    def rollback(self, depth, ms):
+        self.rollbacks += 1
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+        self.resim_ms += ms
+        self.max_resim_ms = max(self.max_resim_ms, ms)
+        self.last_depth = depth
+        self.last_resim_ms = ms
+
+    def summary(self):
+        depth_total = sum(depth * count for depth, count in self.depths.items())
+        return {
+            'frames': self.frames,
+            'stalls': self.stalls,
+            'rollbacks': self.rollbacks,
+            'mean_depth': round(depth_total / self.rollbacks, 2) if self.rollbacks else 0,
+            'max_depth': max(self.depths, default=0),
+            'resim_ms_per_frame': round(self.resim_ms / max(1, self.frames), 3),
+            'max_resim_ms': round(self.max_resim_ms, 3),
+            'depths': dict(sorted(self.depths.items())),
+        }
+
+
+class RollbackSession:
+    """Keeps a VersusMatch in lockstep with the peer playing the other side of it"""
+    def __init__(self, match, local, link, match_id=0, max_rollback=MAX_ROLLBACK):
+        self.match = match
+        self.local = local        # Which of match.games this peer plays
+        self.remote = 1 - local
+        self.link = link
+        self.match_id = match_id  # Packets from a match on another seed are ignored
+        self.max_rollback = max_rollback
+        self.frame = 0            # Next frame to simulate
+        self.inputs = ({}, {})    # Per player: frame -> input bitmask
+        self.used = {}            # Frame -> remote input the simulation used, real or predicted
+        self.states = {}          # Frame -> match snapshot taken before simulating it
+        self.remote_frame = -1    # Remote inputs are known for every frame up to this one
+        self.remote_ack = -1      # The peer has every local input up to this frame
+        self.rollback_from = None
+        self.checksums = {}       # Frame -> crc32 of the confirmed state at its start
+        self.remote_checksum = None
+        self.desync_frame = None
+        self.stats = NetStats()
+
+    def tick(self, bits):
+        """Take the local input for the next frame and simulate it; False while stalled for the peer"""
+        self.update()
+        if self.frame - self.remote_frame > self.max_rollback:
+            self.stats.stalls += 1
+            self.send()  # Keep resending: the peer may be stalled waiting on inputs that were lost
+            return False
+        self.inputs[self.local][self.frame] = bits
+        self.states[self.frame] = self.match.snapshot()
+        self.simulate(self.frame)
+        self.frame += 1
+        self.stats.frames += 1
+        self.send()
+        return True
+
+    def update(self):
+        """Read the peer's packets, rolling back if they contradict a prediction"""
+        self.stats.last_depth = 0
+        self.stats.last_resim_ms = 0.0
+        for packet in self.link.receive():
+            self.receive(packet)
+        if self.rollback_from is not None:
+            self.rollback(self.rollback_from)
+            self.rollback_from = None
+        self.confirm()
+
+    def receive(self, packet):
+        if len(packet) < NET_HEADER.size:
+            return
+        magic, match_id, ack, checksum_frame, checksum, first, count = NET_HEADER.unpack_from(packet)
+        if magic != NET_MAGIC or match_id != self.match_id or len(packet) < NET_HEADER.size + count:
+            return
+        self.remote_ack = max(self.remote_ack, ack)
+        if checksum_frame >= 0:
+            self.remote_checksum = (checksum_frame, checksum)
+        remote_inputs = self.inputs[self.remote]
+        for frame, bits in enumerate(packet[NET_HEADER.size:NET_HEADER.size + count], first):
+            if frame <= self.remote_frame or frame in remote_inputs:
+                continue
+            remote_inputs[frame] = bits
+            if frame < self.frame and self.used.get(frame) != bits:
+                self.rollback_from = frame if self.rollback_from is None else min(self.rollback_from, frame)
+        while self.remote_frame + 1 in remote_inputs:
+            self.remote_frame += 1
+
+    def predict(self):
+        """Guess the peer's input: still holding what they last held, pressing nothing new"""
+        return self.inputs[self.remote].get(self.remote_frame, 0) & HELD_INPUTS
+
+    def simulate(self, frame, quiet=False):
+        remote = self.inputs[self.remote].get(frame)
+        if remote is None:
+            remote = self.predict()
+        self.used[frame] = remote
+        inputs = [0, 0]
+        inputs[self.local] = self.inputs[self.local][frame]
+        inputs[self.remote] = remote
+        self.match.step(inputs, quiet)
+
+    def rollback(self, start):
+        """Restore the state before frame start and resimulate up to the present"""
+        began = time.perf_counter()
+        self.match.restore(self.states[start])
+        for frame in range(start, self.frame):
+            if frame > start:
+                self.states[frame] = self.match.snapshot()
+            self.simulate(frame, quiet=True)
+        self.stats.rollback(self.frame - start, (time.perf_counter() - began) * 1000)
+
+    def confirm(self):
+        """Checksum and forget everything the peer's inputs have settled"""
+        settled = self.remote_frame + 1  # States before this frame can't be rolled back to again
+        for frame in [frame for frame in self.states if frame < settled]:
+            state = self.states.pop(frame)
+            if frame % CHECKSUM_INTERVAL == 0:
+                self.checksums[frame] = zlib.crc32(state)
+        if settled in self.states and settled % CHECKSUM_INTERVAL == 0 and settled not in self.checksums:
+            self.checksums[settled] = zlib.crc32(self.states[settled])
+        if self.remote_checksum is not None and self.desync_frame is None:
+            frame, checksum = self.remote_checksum
+            if frame in self.checksums and self.checksums[frame] != checksum:
+                self.desync_frame = frame
+
+        oldest = min(self.remote_frame, self.remote_ack + 1) - 1
+        for table in (self.used, self.inputs[self.local], self.inputs[self.remote]):
+            for frame in [frame for frame in table if frame < oldest]:
+                del table[frame]
+        for frame in [frame for frame in self.checksums if frame < settled - 4 * CHECKSUM_INTERVAL]:
+            del self.checksums[frame]
+
+    def send(self):
+        """Send every local input the peer hasn't acknowledged, plus the latest checksum"""
+        first = max(self.remote_ack + 1, 0)
+        local_inputs = self.inputs[self.local]
+        payload = bytes(local_inputs[frame] for frame in range(first, min(self.frame, first + MAX_PACKET_INPUTS)))
+        checksum_frame, checksum = max(self.checksums.items(), default=(-1, 0))
+        self.link.send(NET_HEADER.pack(NET_MAGIC, self.match_id, self.remote_frame, checksum_frame, checksum,
+                                       first, len(payload)) + payload)
+
+
+def scripted_input(rng, frame):
+    """A bot's input for one frame: sweeping back and forth, firing often, confirming now and then"""
+    bits = INPUT_LEFT if (frame // rng.choice((30, 45, 90))) % 2 else INPUT_RIGHT
+    if rng.random() < 0.15:
+        bits |= INPUT_FIRE
+    if frame % 60 == 0:
+        bits |= INPUT_CONFIRM
+    return bits
+
+
+def selftest(args):
+    """Play two scripted peers against each other over loopback and check they agree"""
+    si.app.open_window()
+    clock_ms = [0.0]
+    clock = lambda: clock_ms[0]  # Virtual time, so the test runs as fast as the machine allows
+    scripts = [[], []]
+    for index in range(2):
+        rng = random.Random(args.seed * 2 + index)
+        scripts[index] = [scripted_input(rng, frame) for frame in range(args.frames)]
+
+    sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(2)]
+    for sock in sockets:
+        sock.bind(('127.0.0.1', 0))
+    links = [UdpLink(sockets[0]), UdpLink(sockets[1], sockets[0].getsockname())]
+    sessions = []
+    for index, link in enumerate(links):
+        shim = LossyLink(link, args.latency, args.jitter, args.loss, seed=args.seed + index, clock=clock)
+        match = VersusMatch(args.seed, args.level)
+        for game in match.games:
+            game.mute_sounds = game.mute_bgm = True
+        sessions.append(RollbackSession(match, index, shim, args.seed))
+
+    wall = time.perf_counter()
+    for _ in range(args.frames * 10):  # Give up rather than spin forever if something is stuck
+        if all(session.frame >= args.frames and session.remote_frame >= args.frames - 1 for session in sessions):
+            break
+        clock_ms[0] += 1000 / si.FPS
+        for index, session in enumerate(sessions):
+            if session.frame < args.frames:
+                session.tick(scripts[index][session.frame])
+            else:
+                session.update()
+                session.send()
+    wall = time.perf_counter() - wall
+
+    reference = VersusMatch(args.seed, args.level)
+    for frame in range(args.frames):
+        reference.step([scripts[0][frame], scripts[1][frame]], quiet=True)
+    expected = zlib.crc32(reference.snapshot())
+
+    ok = True
+    for index, session in enumerate(sessions):
+        final = zlib.crc32(session.match.snapshot())
+        shim = session.link
+        summary = session.stats.summary()
+        agrees = final == expected and session.frame == args.frames and session.desync_frame is None
+        ok = ok and agrees
+        print(f"peer {index}: {'in sync' if agrees else 'DESYNC'}  frames {summary['frames']}  "
+              f"stalls {summary['stalls']}  rollbacks {summary['rollbacks']}  "
+              f"depth mean {summary['mean_depth']} max {summary['max_depth']}  "
+              f"resim {summary['resim_ms_per_frame']} ms/frame (max {summary['max_resim_ms']} ms)  "
+              f"packets {shim.sent} sent {shim.dropped} dropped")
+        if args.verbose:
+            print(f"  rollback depths: {summary['depths']}")
+    scores = [game.score for game in reference.games]
+    print(f"{args.frames} frames in {wall:.2f} s; scores {scores[0]} vs {scores[1]}")
+    for sock in sockets:
+        sock.close()
+    return 0 if ok else 1
+
+
+def draw_frame(session):
+    """The local game full screen, the opponent's in a corner and the rollback numbers"""
+    screen = si.app.screen
+    games = session.match.games
+    games[session.remote].draw(screen)
+    inset = pygame.transform.scale(screen, (si.SCREEN_WIDTH // 4, si.SCREEN_HEIGHT // 4))
+    games[session.local].draw(screen)
+    position = (si.SCREEN_WIDTH - inset.get_width() - 10, si.SCREEN_HEIGHT - inset.get_height() - 10)
+    screen.blit(inset, position)
+    pygame.draw.rect(screen, si.WHITE, (position, inset.get_size()), 1)
+
+    stats = session.stats
+    lines = [f"Opponent: {games[session.remote].score}",
+             f"rollback {stats.last_depth} ({stats.last_resim_ms:.1f} ms)  stalls {stats.stalls}"]
+    if session.remote_frame < 0:
+        lines[0] = "Waiting for opponent..."
+    if session.desync_frame is not None:
+        lines.append(f"DESYNC at frame {session.desync_frame}")
+    font = si.app.font(24)
+    for i, line in enumerate(lines):
+        screen.blit(font.render(line, True, si.YELLOW), (position[0], position[1] - 30 * (len(lines) - i)))
+
+
+def play(args):
+    """Play versus against a peer: the host waits on a port, the other side joins it"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if args.command == 'host':
+        sock.bind(('', args.port))
+        link, local = UdpLink(sock), 0
+    else:
+        host, _, port = args.address.rpartition(':')
+        if not host:
+            host, port = args.address, DEFAULT_PORT
+        sock.bind(('', 0))
+        link, local = UdpLink(sock, (socket.gethostbyname(host), int(port))), 1
+    if args.latency or args.jitter or args.loss:
+        link = LossyLink(link, args.latency, args.jitter, args.loss)
+
+    si.app.open_window(fullscreen=False)
+    si.app.preload_sounds()
+    session = RollbackSession(VersusMatch(args.seed, args.level), local, link, args.seed)
+    running = True
+    while running:
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            elif event.type == pygame.VIDEORESIZE:
+                si.app.note_resize(event.size)
+        session.tick(sample_input(events))
+        si.app.sfx.flush()
+        draw_frame(session)
+        si.app.present()
+        si.app.music.update()
+        si.app.clock.tick(si.FPS)
+
+    print(session.stats.summary())
+    pygame.quit()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    host = commands.add_parser('host', help="Wait for a peer on a UDP port")
+    host.add_argument('--port', type=int, default=DEFAULT_PORT)
+    join = commands.add_parser('join', help="Join a host at HOST:PORT")
+    join.add_argument('address')
+    test = commands.add_parser('selftest', help="Two scripted peers over loopback, checked against an offline run")
+    test.add_argument('--frames', type=int, default=1800)
+    test.add_argument('--verbose', action='store_true', help="Also print the rollback depth histogram")
+    for sub in (host, join, test):
+        sub.add_argument('--seed', type=int, default=0, help="Both peers must use the same seed")
+        sub.add_argument('--level', type=int, default=1)
+        sub.add_argument('--latency', type=float, default=0, help="Added one-way delay in ms")
+        sub.add_argument('--jitter', type=float, default=0, help="Random +/- ms on top of the latency")
+        sub.add_argument('--loss', type=float, default=0.0, help="Share of packets dropped, 0-1")
+    test.set_defaults(latency=60, jitter=20, loss=0.05)
+    args = parser.parse_args(argv)
+
+    if args.command == 'selftest':
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        return selftest(args)
+    return play(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
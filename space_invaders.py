@@ -1,14 +1,26 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # Keep stdout clean for the stats report
 import pygame
 import sys
+import threading
+import io
+import mmap
+import zlib
 import random
 import json
 import math
-import os
+import argparse
+import csv
+import heapq
+import collections
+import struct
+import bisect
+from operator import attrgetter
 from datetime import datetime
 
 
-pygame.mixer.init()
-
 def resource_path(filename):
     """Get absolute path to resource, works for dev and for PyInstaller exe"""
     if getattr(sys, 'frozen', False):  # Running as compiled .exe
@@ -17,32 +29,867 @@ def resource_path(filename):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, filename)
 
-laser_soundpath = resource_path("laser.wav")
-laser_sound = pygame.mixer.Sound(laser_soundpath)
-laser_sound.set_volume(0.8)
 
-explosion_soundpath = resource_path("explosion.wav")
-explosion_sound = pygame.mixer.Sound(explosion_soundpath)
-explosion_sound.set_volume(0.8)
+# Packed asset bundle built by build_assets.py. When present next to the game
+# (or inside the PyInstaller bundle) assets are read straight from the
+# memory-mapped archive instead of from loose files.
+ASSET_BUNDLE = "assets.pak"
+BUNDLE_MAGIC = b"SIPAK1\n"  # Followed by a 4-byte index length, the JSON index, then the data
+
+
+class _BundleEntry(io.RawIOBase):
+    """Read-only file object over one entry of the mapped bundle, without copying it"""
+    def __init__(self, view, name):
+        self._view = view
+        self._pos = 0
+        self.name = name  # Name hint carrying the stored format, e.g. "laser.ogg"
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self._view) - self._pos)
+        buffer[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getbuffer(self):
+        """The whole entry as a memoryview into the mapped file"""
+        return self._view
 
-game_over_soundpath = resource_path("game_over.wav")
-game_over_sound = pygame.mixer.Sound(game_over_soundpath)
-game_over_sound.set_volume(1)  # Set volume
 
-# Game BGM
-game_bg_soundpath = resource_path("space_invader_bgm.wav")
-game_bg = pygame.mixer.Sound(game_bg_soundpath)
-game_bg.set_volume(0.4)  # Set volume
-game_bg_playing = False  # Track BGM state
+class AssetBundle:
+    """Index over a packed asset archive; entries are decoded only when opened"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        index_start = len(BUNDLE_MAGIC) + 4
+        index_size = int.from_bytes(self._map[len(BUNDLE_MAGIC):index_start], 'little')
+        self.index = json.loads(self._map[index_start:index_start + index_size].decode('utf-8'))
+        self._data_start = index_start + index_size
 
-# Initialize Pygame
-pygame.init()
+    def __contains__(self, name):
+        return name in self.index
 
-# Screen settings
+    def open(self, name):
+        """File object for an entry; its name attribute carries the stored format"""
+        entry = self.index[name]
+        start = self._data_start + entry['offset']
+        view = memoryview(self._map)[start:start + entry['size']]
+        return _BundleEntry(view, entry['stored_as'])
+
+# Logical canvas everything is laid out and drawn on, whatever the window size
 SCREEN_WIDTH = 1366
 SCREEN_HEIGHT = 720
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Space Invaders')
+RESIZE_DEBOUNCE_MS = 150  # Wait for a window drag to settle before rebuilding the scale target
+RENDERERS = ('software', 'sdl2')  # sdl2 presents through pygame._sdl2.video textures
+RENDER_SCALE = 1.0  # sdl2 frame resolution relative to the canvas; below 1 trades sharpness for GPU time
+TEXTURE_CACHE_LIMIT = 512  # Sprite textures the sdl2 renderer keeps before starting the cache afresh
+TEXT_CACHE_LIMIT = 256     # Rendered strings App.text keeps, for the same reason
+
+# Sound effects: name -> (file, volume)
+SOUND_FILES = {
+    'laser': ("laser.wav", 0.8),
+    'explosion': ("explosion.wav", 0.8),
+    'game_over': ("game_over.wav", 1),
+}
+
+# Mixer channels reserved for each group of sound effects
+SFX_CHANNEL_GROUPS = {'ui': 1, 'player': 4, 'enemy': 6}
+# Per-effect routing: channel group, voice cap and priority. While an effect plays,
+# effects of lower priority are ducked to its 'duck' gain. Each group holds one
+# effect, so a full group just restarts its oldest voice.
+SFX_SETTINGS = {
+    'laser': {'group': 'player', 'max_voices': 3, 'priority': 1, 'duck': 1.0},
+    'explosion': {'group': 'enemy', 'max_voices': 4, 'priority': 2, 'duck': 0.7},
+    'game_over': {'group': 'ui', 'max_voices': 1, 'priority': 3, 'duck': 0.3},
+}
+# Pitch/gain variants precomputed for some effects so repeats don't sound identical
+SFX_VARIANTS = {
+    'laser': {'pitches': (0.92, 0.96, 1.0, 1.04, 1.08), 'gains': (0.85, 1.0)},
+    'explosion': {'pitches': (0.86, 0.93, 1.0, 1.07), 'gains': (0.9, 1.0)},
+}
+SFX_VARIANT_BUDGET = 6 * 1024 * 1024  # Bytes of sample data all variants may use together
+SFX_DEDUP_GAIN = 0.15  # Extra volume per repeat of a sound in the same frame
+SFX_MAX_GAIN = 1.6     # Most a repeated sound is raised over a single play (channels still top out at 1.0)
+
+# Long tracks, streamed from disk by MusicPlayer: name -> (file, volume)
+MUSIC_TRACKS = {
+    'title': ("space_invader_title.wav", 0.5),
+    'game': ("space_invader_bgm.wav", 0.4),  # Game BGM
+    'outro': ("outro_music.wav", 0.7),
+}
+CROSSFADE_MS = 800  # Fade out of one track and into the next
+
+# Mixer output format; SDL_mixer converts sound effects to it as they load
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16  # Signed 16-bit samples
+MIXER_CHANNELS = 2
+# Mixer buffer sizes (sample frames) to try, smallest first, per platform.
+# Smaller buffers mean less delay between a keypress and its sound; if the
+# device refuses one, the next size up is used.
+AUDIO_BUFFERS = {
+    'win32': [512, 1024, 2048],   # WASAPI/DirectSound glitch below ~512
+    'darwin': [256, 512, 1024],   # CoreAudio copes with small buffers
+    'linux': [512, 1024, 2048],   # PulseAudio/PipeWire add their own latency on top
+}
+DEFAULT_AUDIO_BUFFERS = [1024, 2048, 4096]
+
+# Startup budgets, checked by App.startup_report() and the benchmark
+IMPORT_BUDGET_MS = 350    # Importing this module, pygame and what it pulls in (numpy) included
+STARTUP_BUDGET_MS = 1500  # From import to the first frame on screen
+
+
+class _SilentSound:
+    """Stands in for a sound that couldn't be loaded, so callers needn't check"""
+    def play(self, *args, **kwargs):
+        return None
+
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def get_volume(self):
+        return 0
+
+
+class App:
+    """Owns the pygame subsystems and starts each one the first time it's needed.
+
+    Importing this module only creates the (empty) App; the display, mixer, fonts
+    and sounds start on first use, and sounds can be decoded on a worker thread
+    while the logos are showing.
+    """
+    def __init__(self):
+        self._screen = None   # The logical canvas the game draws on
+        self._window = None   # The display surface; the canvas itself when SDL does the scaling
+        self._scaled = None   # Cached scale target for the software path
+        self._viewport = None  # Where the scaled canvas sits in the window (software path)
+        self._pending_size = None
+        self._resize_at = 0
+        self.renderer = 'software'
+        self.render_scale = RENDER_SCALE
+        self._gpu = None       # TextureRenderer when the sdl2 renderer is in use
+        self._dim_surface = None
+        self.fullscreen = False
+        self._clock = None
+        self._mixer_ready = False
+        self.audio_settings = {'frequency': MIXER_FREQUENCY, 'channels': MIXER_CHANNELS, 'buffer': None}
+        self._fonts = {}
+        self._texts = {}
+        self._sounds = {}
+        self._variants = {}  # name -> list of Sounds, filled in by the loader thread
+        self.variant_bytes = 0
+        self._sound_lock = threading.Lock()
+        self._loader = None
+        self._bundle = None
+        self._music = None
+        self._sfx = None
+        self.timings = {'import': (_IMPORT_DONE - _IMPORT_STARTED) * 1000}
+
+    def mark(self, stage):
+        """Record how long after import started a startup stage finished"""
+        self.timings.setdefault(stage, (time.perf_counter() - _IMPORT_STARTED) * 1000)
+
+    @property
+    def screen(self):
+        """The SCREEN_WIDTH x SCREEN_HEIGHT canvas to draw on"""
+        if self._screen is None:
+            self.open_window()
+        if self._gpu is not None:
+            return self._gpu.target
+        return self._screen
+
+    def open_window(self, fullscreen=False):
+        """Open (or reopen) the window and return the canvas.
+
+        With pygame.SCALED, SDL stretches the display surface to the window on the
+        GPU where it can, and the game draws straight onto it. Otherwise the game
+        draws to an off-screen canvas that present() scales.
+        """
+        if not pygame.display.get_init():
+            pygame.display.init()
+            pygame.display.set_caption('Space Invaders')
+        if self.renderer == 'sdl2':
+            if self._gpu is not None:
+                self._gpu.set_fullscreen(fullscreen)
+                self.fullscreen = fullscreen
+                return self._screen
+            try:
+                self._gpu = TextureRenderer(fullscreen, self.render_scale)
+            except (ImportError, RuntimeError, pygame.error):
+                self.renderer = 'software'  # No usable SDL2 renderer at all
+            else:
+                self._screen = self._gpu.canvas
+                self.fullscreen = fullscreen
+                self.mark('display')
+                return self._screen
+        size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        if (self._window is not None and self._viewport is None and self._window.get_size() == size
+                and fullscreen != self.fullscreen):
+            # Already scaled by SDL at this size: switching in place keeps the renderer
+            try:
+                pygame.display.toggle_fullscreen()
+                self.fullscreen = fullscreen
+                return self._screen
+            except pygame.error:
+                pass
+        canvas_was_window = self._screen is not None and self._screen is self._window
+        if self._window is not None:
+            # Some drivers can't rebuild a SCALED renderer in place; start the display afresh
+            pygame.display.quit()
+            pygame.display.init()
+            pygame.display.set_caption('Space Invaders')
+        mode = pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE
+        try:
+            self._window = pygame.display.set_mode(size, pygame.SCALED | mode)
+            scaled_by_sdl = True
+        except pygame.error:
+            # No SCALED support: plain window, present() scales in software
+            self._window = pygame.display.set_mode((0, 0) if fullscreen else size, mode)
+            scaled_by_sdl = False
+        self.fullscreen = fullscreen
+        if scaled_by_sdl:
+            self._screen = self._window
+        elif self._screen is None or canvas_was_window:
+            self._screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self._scaled = None
+        self._viewport = None if scaled_by_sdl else self._fit_viewport(self._window.get_size())
+        self.mark('display')
+        return self._screen
+
+    def _fit_viewport(self, window_size):
+        """Largest canvas-shaped rect centred in the window"""
+        scale = min(window_size[0] / SCREEN_WIDTH, window_size[1] / SCREEN_HEIGHT)
+        size = (max(1, int(SCREEN_WIDTH * scale)), max(1, int(SCREEN_HEIGHT * scale)))
+        rect = pygame.Rect((0, 0), size)
+        rect.center = (window_size[0] // 2, window_size[1] // 2)
+        return rect
+
+    def note_resize(self, size):
+        """Record a window resize; present() acts on it once resizing pauses"""
+        self._pending_size = size
+        self._resize_at = pygame.time.get_ticks()
+
+    def dim(self, alpha):
+        """Darken everything drawn so far this frame; returns the surface to keep drawing on"""
+        if self._gpu is not None:
+            return self._gpu.dim(alpha)
+        if self._dim_surface is None:
+            self._dim_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self._dim_surface.fill((0, 0, 0))
+        self._dim_surface.set_alpha(alpha)
+        self._screen.blit(self._dim_surface, (0, 0))
+        return self._screen
+
+    def blit_faded(self, image, pos, alpha):
+        """Draw image at pos with an overall opacity, for fades"""
+        if self._gpu is not None:
+            self._gpu.blit_faded(image, pos, alpha)
+        else:
+            image.set_alpha(alpha)
+            self.screen.blit(image, pos)
+            image.set_alpha(None)
+
+    def blits(self, screen, commands):
+        """Draw (surface, dest rect) pairs on screen; returns the surface to keep drawing on.
+
+        With the sdl2 renderer the surfaces are drawn as cached textures above
+        what's on the canvas, and later drawing goes on a layer over them.
+        """
+        if self._gpu is not None and screen is self._gpu.target:
+            return self._gpu.blits(commands)
+        submit = getattr(screen, 'fblits', None)  # pygame-ce's faster blits
+        if submit is not None:
+            submit(commands)
+        else:
+            screen.blits(commands, doreturn=False)
+        return screen
+
+    def surface_changed(self, surface):
+        """Note that a surface drawn through blits() has been drawn on since"""
+        if self._gpu is not None:
+            self._gpu.forget(surface)
+
+    def present(self):
+        """Scale the canvas to the window (once) and flip"""
+        if self._gpu is not None:
+            self._gpu.present()
+            return
+        if self._viewport is not None:
+            # No SCALED display: fit the canvas into the window ourselves
+            if (self._pending_size is not None
+                    and pygame.time.get_ticks() - self._resize_at >= RESIZE_DEBOUNCE_MS):
+                self._window = pygame.display.get_surface()
+                self._viewport = self._fit_viewport(self._window.get_size())
+                self._pending_size = None
+                self._scaled = None
+            if self._scaled is None:
+                self._window.fill((0, 0, 0))
+                self._scaled = pygame.Surface(self._viewport.size).convert()
+            pygame.transform.smoothscale(self._screen, self._viewport.size, self._scaled)
+            self._window.blit(self._scaled, self._viewport)
+        pygame.display.flip()
+
+    def mouse_pos(self):
+        """Mouse position in canvas coordinates"""
+        x, y = pygame.mouse.get_pos()
+        viewport = self._viewport
+        if self._gpu is not None:
+            viewport = self._fit_viewport(self._gpu.window.size)
+        if viewport is not None:
+            x = (x - viewport.x) * SCREEN_WIDTH // viewport.width
+            y = (y - viewport.y) * SCREEN_HEIGHT // viewport.height
+        return x, y
+
+    @property
+    def sfx(self):
+        if self._sfx is None:
+            self._sfx = SoundEffects(self)
+        return self._sfx
+
+    @property
+    def music(self):
+        if self._music is None:
+            self._music = MusicPlayer(self)
+        return self._music
+
+    @property
+    def clock(self):
+        if self._clock is None:
+            self._clock = pygame.time.Clock()
+        return self._clock
+
+    def font(self, size):
+        """Shared default font of the given size"""
+        font = self._fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def text(self, size, string, color):
+        """string rendered in the shared font of that size, kept for later frames"""
+        key = (size, string, color)
+        surface = self._texts.get(key)
+        if surface is None:
+            if len(self._texts) >= TEXT_CACHE_LIMIT:
+                self._texts.clear()  # Mostly old scores
+            surface = self._texts[key] = self.font(size).render(string, True, color)
+        return surface
+
+    @property
+    def bundle(self):
+        """The packed asset bundle, or None when running from loose files"""
+        if self._bundle is None:
+            self._bundle = False
+            path = resource_path(ASSET_BUNDLE)
+            if os.path.exists(path):
+                try:
+                    self._bundle = AssetBundle(path)
+                except (OSError, ValueError):
+                    pass  # Fall back to loose files
+        return self._bundle or None
+
+    def open_asset(self, filename):
+        """Return (file object or path, name hint) for an asset, preferring the bundle"""
+        if self.bundle is not None and filename in self.bundle:
+            entry = self.bundle.open(filename)
+            return entry, entry.name
+        return resource_path(filename), filename
+
+    def load_image(self, filename):
+        source, hint = self.open_asset(filename)
+        return pygame.image.load(source, hint)
+
+    def load_sound(self, filename):
+        source, _ = self.open_asset(filename)  # SDL_mixer tells WAV from OGG by its header bytes; no hint needed
+        return pygame.mixer.Sound(source)
+
+    def load_logo(self, filename, paired=False):
+        """Logo scaled for the current screen, using a pre-scaled bundle variant if one exists"""
+        variant = image_variant_name(filename, (SCREEN_WIDTH, SCREEN_HEIGHT))
+        if self.bundle is not None and variant in self.bundle:
+            entry = self.bundle.index[variant]
+            pixels = zlib.decompress(self.bundle.open(variant).getbuffer())
+            return pygame.image.frombytes(pixels, tuple(entry['pixel_size']), entry['pixel_format'])
+        
+        logo = self.load_image(filename)
+        size = logo_fit_size(logo.get_size(), (SCREEN_WIDTH, SCREEN_HEIGHT), paired)
+        if size:
+            logo = pygame.transform.scale(logo, size)
+        return logo
+
+    def load_music(self, filename):
+        """Load a track into the streaming music player"""
+        source, hint = self.open_asset(filename)
+        pygame.mixer.music.load(source, hint)
+
+    def configure_audio(self, frequency=None, buffer=None, channels=None):
+        """Override the mixer settings; call before anything plays a sound"""
+        if frequency:
+            self.audio_settings['frequency'] = frequency
+        if buffer:
+            self.audio_settings['buffer'] = buffer
+        if channels:
+            self.audio_settings['channels'] = channels
+
+    def audio_buffers(self):
+        """Buffer sizes to try in order: the configured one first, then the platform's list"""
+        buffers = AUDIO_BUFFERS.get(sys.platform, DEFAULT_AUDIO_BUFFERS)
+        configured = self.audio_settings['buffer']
+        if configured:
+            buffers = [configured] + [b for b in buffers if b > configured]
+        return buffers
+
+    def init_mixer(self):
+        """Start the mixer; returns False when no audio device is available"""
+        if not self._mixer_ready:
+            settings = self.audio_settings
+            for buffer in self.audio_buffers():
+                try:
+                    pygame.mixer.pre_init(settings['frequency'], MIXER_SIZE, settings['channels'], buffer)
+                    pygame.mixer.init()
+                except pygame.error:
+                    continue  # Device won't run this buffer size; try a bigger one
+                settings['buffer'] = buffer
+                self._mixer_ready = True
+                break
+            else:
+                return False
+        return True
+
+    def audio_latency_ms(self):
+        """Delay the mixer's buffer adds before a started sound is heard"""
+        init = pygame.mixer.get_init()
+        if not init or not self.audio_settings['buffer']:
+            return 0.0
+        return self.audio_settings['buffer'] * 1000 / init[0]
+
+    def sound(self, name):
+        """Sound effect by SOUND_FILES name, decoded on first use"""
+        sound = self._sounds.get(name)
+        if sound is None:
+            with self._sound_lock:
+                sound = self._sounds.get(name)
+                if sound is None:
+                    sound = self._sounds[name] = self._load_sound(name)
+        return sound
+
+    def _load_sound(self, name):
+        filename, volume = SOUND_FILES[name]
+        if not self.init_mixer():
+            return _SilentSound()
+        try:
+            sound = self.load_sound(filename)
+        except (pygame.error, FileNotFoundError):
+            return _SilentSound()
+        return sound  # Its SOUND_FILES volume is set on the channel, leaving room for repeats
+
+    def sound_variants(self, name):
+        """Precomputed variants of an effect (the original included); empty until built"""
+        return self._variants.get(name, ())
+
+    def build_variants(self, budget=SFX_VARIANT_BUDGET):
+        """Resample the SFX_VARIANTS effects into pitch/gain banks, within budget bytes"""
+        try:
+            import numpy
+        except ImportError:
+            return  # Every shot plays the original sample
+        full = False
+        for name, spec in SFX_VARIANTS.items():
+            if full:
+                break  # Out of budget: the rest play their original sample, without copying it first
+            sound = self.sound(name)
+            if isinstance(sound, _SilentSound):
+                continue
+            samples = pygame.sndarray.array(sound)
+            frame_bytes = samples[0:1].nbytes
+            variants = [sound]
+            for pitch, gain in [(pitch, gain) for pitch in spec['pitches'] for gain in spec['gains']]:
+                if pitch == 1.0 and gain == 1.0:
+                    continue  # That's the original
+                length = int(len(samples) / pitch)
+                if self.variant_bytes + length * frame_bytes > budget:
+                    full = True
+                    break
+                variants.append(make_variant(numpy, samples, pitch, gain, length))
+                self.variant_bytes += length * frame_bytes
+            self._variants[name] = variants
+
+    def preload_sounds(self):
+        """Decode all sound effects on a worker thread (pygame releases the GIL while decoding)"""
+        if self._loader is None:
+            self.init_mixer()
+            def load():
+                for name in SOUND_FILES:
+                    self.sound(name)
+                self.build_variants()
+            self._loader = threading.Thread(target=load, name="sound-loader", daemon=True)
+            self._loader.start()
+
+    def startup_report(self, out=sys.stderr, always=False):
+        """Print startup timings; only when a budget was missed unless always is set"""
+        over = (self.timings['import'] > IMPORT_BUDGET_MS
+                or self.timings.get('first_frame', 0) > STARTUP_BUDGET_MS)
+        if always or over:
+            stages = ", ".join(f"{stage} {ms:.1f} ms" for stage, ms in self.timings.items())
+            budget = "OVER BUDGET" if over else "within budget"
+            print(f"startup ({budget}): {stages}", file=out)
+        return not over
+
+
+class TextureRenderer:
+    """Presents frames through pygame._sdl2.video instead of a display Surface.
+
+    Sprites drawn through App.blits (invaders, bullets, shields, particles,
+    HUD text) are uploaded to a texture the first time and drawn by the
+    renderer from then on; a shield is uploaded again after it's carved.
+    Everything else is still drawn on a software canvas, of which only the
+    part that was drawn on is uploaded and scaled to the window. Overlays
+    (App.dim) become renderer fills with alpha, and anything drawn in software
+    after one, or after a batch of sprites, goes on a transparent layer on
+    top that is likewise cleared and uploaded only where it was drawn on.
+    Faded images are drawn from their textures with an alpha mod. Without an
+    accelerated renderer SDL's software renderer is used.
+
+    At a scale below 1 an accelerated renderer puts the frame together on a
+    smaller render target, which it then stretches to the window, so every
+    draw fills fewer pixels.
+    """
+    def __init__(self, fullscreen=False, scale=RENDER_SCALE):
+        from pygame._sdl2 import video
+        self.video = video
+        self.window = video.Window('Space Invaders', size=(SCREEN_WIDTH, SCREEN_HEIGHT), resizable=True)
+        try:
+            self.renderer = video.Renderer(self.window, accelerated=1)
+            self.accelerated = True
+        except video.error:
+            self.renderer = video.Renderer(self.window, accelerated=0)
+            self.accelerated = False
+        self.renderer.logical_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.set_fullscreen(fullscreen)
+        self.frame = None  # The smaller render target at scales below 1
+        if scale < 1 and self.accelerated:  # SDL's software renderer would stretch on the CPU, costing more
+            size = (max(1, round(SCREEN_WIDTH * scale)), max(1, round(SCREEN_HEIGHT * scale)))
+            quality = os.environ.get('SDL_RENDER_SCALE_QUALITY')
+            os.environ['SDL_RENDER_SCALE_QUALITY'] = 'linear'  # Read as a texture is made: a smooth stretch
+            try:
+                self.frame = video.Texture(self.renderer, size, target=True)
+            except video.error:
+                pass  # No render targets here; draw at full size
+            if quality is None:
+                del os.environ['SDL_RENDER_SCALE_QUALITY']
+            else:
+                os.environ['SDL_RENDER_SCALE_QUALITY'] = quality
+        self.canvas = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.canvas_texture = video.Texture(self.renderer, (SCREEN_WIDTH, SCREEN_HEIGHT), streaming=True)
+        self.target = self.canvas
+        self.layers = []    # [surface, streaming texture, rect drawn on] for drawing above a dim, reused
+        self.layers_used = 0
+        self.ops = []       # This frame's ('dim', alpha), ('layer', layer), ('sprites', [(texture, dest)]),
+                            # ('image', texture, pos, alpha)
+        self.textures = {}  # id(image) -> (image, Texture), uploaded on first use; holding the image keeps its id
+        try:
+            import numpy
+            self.np = numpy
+        except ImportError:
+            self.np = None  # The canvas and layers are then uploaded whole
+
+    def set_fullscreen(self, fullscreen):
+        if fullscreen:
+            self.window.set_fullscreen(desktop=True)
+        else:
+            self.window.set_windowed()
+
+    def dim(self, alpha):
+        self.ops.append(('dim', alpha))
+        return self.new_layer()
+
+    def new_layer(self):
+        """Start a transparent layer above everything queued so far; returns it to draw on"""
+        if self.layers_used == len(self.layers):
+            texture = self.video.Texture(self.renderer, (SCREEN_WIDTH, SCREEN_HEIGHT), streaming=True)
+            texture.blend_mode = 1  # SDL_BLENDMODE_BLEND
+            self.layers.append([pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA), texture, None])
+        layer = self.layers[self.layers_used]
+        self.layers_used += 1
+        if layer[2] is not None:
+            layer[0].fill((0, 0, 0, 0), layer[2])  # The rest is still clear from before
+        self.ops.append(('layer', layer))
+        self.target = layer[0]
+        return layer[0]
+
+    def drawn_rect(self, surface):
+        """Box around every pixel that isn't clear, or None; the whole surface without numpy"""
+        np = self.np
+        if np is None:
+            return surface.get_rect()
+        pixels = np.frombuffer(surface.get_view('1'), np.uint32).reshape(surface.get_height(), -1)
+        rows = np.flatnonzero(pixels.any(axis=1))
+        if not len(rows):
+            return None
+        top, bottom = int(rows[0]), int(rows[-1]) + 1
+        cols = np.flatnonzero(pixels[top:bottom].any(axis=0))
+        left, right = int(cols[0]), int(cols[-1]) + 1
+        return pygame.Rect(left, top, right - left, bottom - top).clip(surface.get_rect())
+
+    def texture(self, image):
+        """The texture of a surface, uploaded the first time it's asked for"""
+        entry = self.textures.get(id(image))
+        if entry is None:
+            if len(self.textures) >= TEXTURE_CACHE_LIMIT:
+                self.textures.clear()  # Mostly surfaces nothing draws any more; the rest come back
+            entry = self.textures[id(image)] = (image, self.video.Texture.from_surface(self.renderer, image))
+        return entry[1]
+
+    def forget(self, image):
+        """Drop a surface's texture because the surface has changed"""
+        self.textures.pop(id(image), None)
+
+    def blits(self, commands):
+        texture = self.texture
+        self.ops.append(('sprites', [(texture(image), dest) for image, dest in commands]))
+        return self.new_layer()
+
+    def blit_faded(self, image, pos, alpha):
+        self.ops.append(('image', self.texture(image), pos, alpha))
+
+    def present(self):
+        renderer = self.renderer
+        if self.frame is not None:
+            renderer.target = self.frame
+            renderer.scale = (self.frame.width / SCREEN_WIDTH, self.frame.height / SCREEN_HEIGHT)
+        renderer.draw_color = (0, 0, 0, 255)
+        renderer.clear()
+        rect = self.drawn_rect(self.canvas)  # The rest is the black it was cleared to
+        if rect:
+            self.canvas_texture.update(self.canvas.subsurface(rect), area=rect)
+            self.canvas_texture.draw(srcrect=rect, dstrect=rect)
+        for op in self.ops:
+            if op[0] == 'dim':
+                renderer.draw_blend_mode = 1  # SDL_BLENDMODE_BLEND
+                renderer.draw_color = (0, 0, 0, op[1])
+                renderer.fill_rect((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+            elif op[0] == 'layer':
+                layer = op[1]
+                surface, texture, _ = layer
+                rect = layer[2] = self.drawn_rect(surface)
+                if rect:
+                    texture.update(surface.subsurface(rect), area=rect)
+                    texture.draw(srcrect=rect, dstrect=rect)
+            elif op[0] == 'sprites':
+                for texture, dest in op[1]:
+                    texture.draw(dstrect=(int(dest[0]), int(dest[1]), texture.width, texture.height))
+            else:
+                _, texture, pos, alpha = op
+                texture.blend_mode = 1
+                texture.alpha = alpha
+                texture.draw(dstrect=(pos[0], pos[1], texture.width, texture.height))
+        if self.frame is not None:
+            renderer.target = None
+            renderer.draw_color = (0, 0, 0, 255)
+            renderer.clear()
+            self.frame.draw(dstrect=(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+        renderer.present()
+        self.ops.clear()
+        self.layers_used = 0
+        self.target = self.canvas
+
+
+def make_variant(numpy, samples, pitch, gain, length):
+    """Sound resampled to play pitch times faster, scaled by gain"""
+    positions = numpy.arange(length) * pitch
+    source = numpy.arange(len(samples))
+    if samples.ndim == 1:
+        shifted = numpy.interp(positions, source, samples)
+    else:
+        shifted = numpy.stack([numpy.interp(positions, source, samples[:, channel])
+                               for channel in range(samples.shape[1])], axis=1)
+    limits = numpy.iinfo(samples.dtype) if samples.dtype.kind in 'iu' else numpy.finfo(samples.dtype)
+    shifted = numpy.clip(shifted * gain, limits.min, limits.max).astype(samples.dtype)
+    return pygame.sndarray.make_sound(numpy.ascontiguousarray(shifted))
+
+
+class SoundEffects:
+    """Plays sound effects on reserved channel groups with voice caps and priorities.
+
+    play() only records a request; flush(), called once per frame, starts each
+    requested effect once, louder if it was requested several times that frame,
+    so a rapid-fire volley or a multi-kill doesn't stack dozens of voices. It
+    also ducks effects under any higher-priority one that is playing.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.requests = {}     # name -> times requested this frame
+        self.groups = None     # group -> list of Channels, created with the mixer
+        self.voices = {}       # channel id -> [name, start order, undimmed volume, volume set]
+        self.started = 0
+        self.start_times = {}  # name -> perf_counter() when it last started
+        self.rng = random.Random()  # Own generator, so picking variants never touches the game's
+        self.master_volume = 1.0
+        self.sfx_volume = 1.0
+        self.muted = False
+
+    def play(self, name):
+        """Request an effect for this frame"""
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    def set_muted(self, muted):
+        self.muted = muted
+        if muted and self.groups:
+            for channels in self.groups.values():
+                for channel in channels:
+                    channel.stop()
+
+    def _reserve_channels(self):
+        total = sum(SFX_CHANNEL_GROUPS.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), total))
+        pygame.mixer.set_reserved(total)  # Keep pygame's automatic channel picking off them
+        self.groups = {}
+        index = 0
+        for group, count in SFX_CHANNEL_GROUPS.items():
+            self.groups[group] = [pygame.mixer.Channel(i) for i in range(index, index + count)]
+            index += count
+
+    def _pick_channel(self, name, settings):
+        """Free channel in the effect's group, or the voice it should replace"""
+        channels = self.groups[settings['group']]
+        playing = [(self.voices[id(channel)], channel) for channel in channels
+                   if channel.get_busy() and id(channel) in self.voices]
+        same = [(voice[1], channel) for voice, channel in playing if voice[0] == name]
+        if len(same) >= settings['max_voices']:
+            return min(same, key=lambda item: item[0])[1]  # Restart the oldest copy
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        # Group is full: steal its oldest voice
+        if playing:
+            return min(playing, key=lambda item: item[0][1])[1]
+        return None
+
+    def flush(self):
+        """Start this frame's requested effects and duck what they play over; call once per frame"""
+        requests, self.requests = self.requests, {}
+        if self.muted or not (requests or self.voices) or not self.app.init_mixer():
+            return
+        if self.groups is None:
+            self._reserve_channels()
+
+        bus = self.master_volume * self.sfx_volume
+        for name, count in requests.items():
+            settings = SFX_SETTINGS[name]
+            channel = self._pick_channel(name, settings)
+            if channel is None:
+                continue
+            # A single play is at its SOUND_FILES volume; only the repeats' extra gain is capped
+            gain = min(SFX_MAX_GAIN, 1 + SFX_DEDUP_GAIN * (count - 1))
+            variants = self.app.sound_variants(name)
+            channel.play(self.rng.choice(variants) if variants else self.app.sound(name))
+            self.started += 1
+            self.start_times[name] = time.perf_counter()
+            self.voices[id(channel)] = [name, self.started, min(1.0, SOUND_FILES[name][1] * gain) * bus, None]
+        self._duck()
+
+    def _duck(self):
+        """Set each playing voice's volume, dimmed under the highest-priority effect above it"""
+        playing = [(self.voices[id(channel)], channel) for channels in self.groups.values()
+                   for channel in channels if channel.get_busy() and id(channel) in self.voices]
+        self.voices = {id(channel): voice for voice, channel in playing}  # Forget finished ones
+        for voice, channel in playing:
+            priority = SFX_SETTINGS[voice[0]]['priority']
+            duck = min([SFX_SETTINGS[other[0]]['duck'] for other, _ in playing
+                        if SFX_SETTINGS[other[0]]['priority'] > priority], default=1.0)
+            volume = voice[2] * duck
+            if volume != voice[3]:
+                channel.set_volume(volume)
+                voice[3] = volume
+
+
+class MusicPlayer:
+    """Streams the long music tracks from disk and fades between them.
+
+    pygame.mixer.music decodes in small chunks as it plays, so nothing but the
+    stream buffer stays resident. Only one stream can play at a time: switching
+    tracks fades the current one out, then update() fades the next one in.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.current = None   # Track that is playing (or fading in)
+        self.pending = None   # (track, loops) waiting for the fade-out to finish
+        self.fade_ms = CROSSFADE_MS
+        self.muted = False
+
+    def play(self, track, loops=-1, fade_ms=CROSSFADE_MS):
+        """Switch to a track, fading out whatever is playing first"""
+        if not self.app.init_mixer():
+            return
+        if track == self.current and self.pending is None:
+            return
+        self.fade_ms = fade_ms
+        if self.current is not None and pygame.mixer.music.get_busy():
+            self.pending = (track, loops)
+            pygame.mixer.music.fadeout(fade_ms)  # Doesn't block; update() starts the next track
+        else:
+            self._start(track, loops)
+
+    def _start(self, track, loops):
+        self.pending = None
+        filename, volume = MUSIC_TRACKS[track]
+        try:
+            self.app.load_music(filename)
+        except (pygame.error, FileNotFoundError):
+            self.current = None  # Missing track: carry on in silence
+            return
+        pygame.mixer.music.set_volume(0 if self.muted else volume * self.app.sfx.master_volume)
+        pygame.mixer.music.play(loops, fade_ms=self.fade_ms)
+        self.current = track
+
+    def stop(self, fade_ms=0):
+        """Stop the music, optionally fading it out"""
+        self.pending = None
+        self.current = None
+        if pygame.mixer.get_init():
+            if fade_ms:
+                pygame.mixer.music.fadeout(fade_ms)
+            else:
+                pygame.mixer.music.stop()
+
+    def set_muted(self, muted):
+        self.muted = muted
+        if self.current is not None and pygame.mixer.get_init():
+            pygame.mixer.music.set_volume(0 if muted else MUSIC_TRACKS[self.current][1] * self.app.sfx.master_volume)
+
+    def is_playing(self, track):
+        return self.current == track or (self.pending is not None and self.pending[0] == track)
+
+    def update(self):
+        """Call once per frame: starts the next track once the previous has faded out"""
+        if self.pending is not None and not pygame.mixer.music.get_busy():
+            self._start(*self.pending)
+        elif self.current is not None and self.pending is None and not pygame.mixer.music.get_busy():
+            self.current = None  # A track played with loops=0 has finished
+
 
 # Colors
 BLACK = (0, 0, 0)
@@ -60,7 +907,6 @@ DARK_GRAY = (50, 50, 50)
 
 # Game settings
 FPS = 60
-clock = pygame.time.Clock()
 
 
 def is_new_high_score(self):
@@ -73,9 +919,9 @@ def is_new_high_score(self):
 
 
 class LeaderboardManager:
-    def __init__(self):
+    def __init__(self, load=True):
         self._determine_file_path()
-        self.scores = self.load_scores()
+        self.scores = self.load_scores() if load else []
 
     def _determine_file_path(self):
         """Determine the appropriate path for the leaderboard file"""
@@ -92,14 +938,17 @@ class LeaderboardManager:
                 # Create directory if it doesn't exist
                 os.makedirs(save_dir, exist_ok=True)
                 self.leaderboard_file = os.path.join(save_dir, "leaderboard.json")
+                self.history_file = os.path.join(save_dir, "score_history.jsonl")
             else:
                 # Running in development
                 base_dir = os.path.dirname(os.path.abspath(__file__))
                 self.leaderboard_file = os.path.join(base_dir, "space_invaders_leaderboard.json")
+                self.history_file = os.path.join(base_dir, "space_invaders_history.jsonl")
                 
             
         except Exception as e:
             self.leaderboard_file = "leaderboard_fallback.json"
+            self.history_file = "score_history_fallback.jsonl"
 
     def load_scores(self):
         """Load scores from the leaderboard file"""
@@ -190,6 +1039,20 @@ class LeaderboardManager:
             
             return False
     
+    def record_history(self, score, level):
+        """Append a finished game to the score history (one JSON object per line)"""
+        entry = {
+            'score': score,
+            'level': level,
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        try:
+            with open(self.history_file, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+            return True
+        except Exception as e:
+            return False
+    
     def get_top_scores(self, limit=10):
         """Get the top scores from the leaderboard"""
         return self.scores[:limit]
@@ -214,6 +1077,58 @@ class LeaderboardManager:
             
             return False
 
+class DrawBatch:
+    """Queues draw commands per layer and submits them all, bottom layer first, in one App.blits call.
+
+    Commands are (surface, dest rect) pairs: pre-rendered sprites, or solid
+    rects turned into blits of a cached surface of that colour and size. With
+    cull set, anything outside the screen is dropped before submitting.
+    """
+    LAYERS = ('particles', 'shields', 'bullets', 'invaders', 'hud')
+
+    def __init__(self, cull=True):
+        self.queues = {layer: [] for layer in self.LAYERS}
+        self.cull = cull
+        self.solids = {}  # (colour, size) -> filled surface
+
+    def solid(self, color, size):
+        surface = self.solids.get((color, size))
+        if surface is None:
+            surface = self.solids[(color, size)] = pygame.Surface(size)
+            surface.fill(color)
+        return surface
+
+    def add(self, layer, commands):
+        """Queue (surface, dest rect) pairs on a layer"""
+        self.queues[layer].extend(commands)
+
+    def flush(self, screen):
+        """Draw and clear every layer, bottom first; returns the surface to keep drawing on"""
+        bounds = screen.get_rect()
+        commands = []
+        for layer in self.LAYERS:
+            queue = self.queues[layer]
+            if self.cull:
+                commands.extend(command for command in queue if bounds.colliderect(command[1]))
+            else:
+                commands.extend(queue)
+            queue.clear()
+        if not commands:
+            return screen
+        return app.blits(screen, commands)
+
+
+def particle_sprite(color, size):
+    """Circle of the given radius, pre-rendered once per colour and size"""
+    surface = PARTICLE_SPRITES.get((color, size))
+    if surface is None:
+        surface = PARTICLE_SPRITES[(color, size)] = pygame.Surface((size * 2 + 1, size * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(surface, color, (size, size), size)
+    return surface
+
+PARTICLE_SPRITES = {}
+
+
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, text_color=WHITE):
         self.rect = pygame.Rect(x, y, width, height)
@@ -222,7 +1137,7 @@ class Button:
         self.hover_color = hover_color
         self.text_color = text_color
         self.is_hovered = False
-        self.font = pygame.font.Font(None, 36)
+        self.font = app.font(36)
         
     def draw(self, surface):
         color = self.hover_color if self.is_hovered else self.color
@@ -262,7 +1177,74 @@ class ToggleButton(Button):
         self.is_on = not self.is_on
         return self.is_on
 
+class Scheduler:
+    """One-shot and repeating callbacks keyed to a clock that only moves when advanced.
+
+    Timers wait in a heap ordered by due time, so advancing pops just the
+    ones that fire. A timer names its callback (a key of handlers) instead
+    of holding a function, which keeps the pending timers plain data that
+    state() can save. There is at most one timer per name and args:
+    scheduling the same pair again replaces the earlier one.
+    """
+    def __init__(self, handlers, now=0):
+        self.handlers = handlers
+        self.now = now
+        self.heap = []     # (due, seq, name, args, interval or None)
+        self.pending = {}  # (name, args) -> seq of its live heap entry
+        self.seq = 0
+
+    def after(self, delay, name, *args, every=None):
+        """Call handlers[name](*args) delay from now, then every `every` after that if given"""
+        self.seq += 1
+        self.pending[(name, args)] = self.seq
+        heapq.heappush(self.heap, (self.now + delay, self.seq, name, args, every))
+
+    def every(self, interval, name, *args):
+        self.after(interval, name, *args, every=interval)
+
+    def cancel(self, name, *args):
+        self.pending.pop((name, args), None)  # Its heap entry is skipped when it comes up
+
+    def is_pending(self, name, *args):
+        return (name, args) in self.pending
+
+    def advance(self, dt=1):
+        """Move the clock on by dt and run every timer that came due, in due order"""
+        self.advance_to(self.now + dt)
+
+    def advance_to(self, now):
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            due, seq, name, args, interval = heapq.heappop(heap)
+            key = (name, args)
+            if self.pending.get(key) != seq:
+                continue  # Cancelled or replaced
+            self.now = due  # Callbacks see the time they were due at
+            if interval:
+                heapq.heappush(heap, (due + interval, seq, name, args, interval))
+            else:
+                del self.pending[key]
+            self.handlers[name](*args)
+        self.now = now
+
+    def state(self):
+        """The clock and pending timers as JSON-friendly data"""
+        timers = [[due, name, list(args), interval] for due, seq, name, args, interval in sorted(self.heap)
+                  if self.pending.get((name, args)) == seq]
+        return {'now': self.now, 'timers': timers}
+
+    def restore(self, state):
+        """Replace the clock and timers with ones saved by state()"""
+        self.now = state['now']
+        self.heap, self.pending, self.seq = [], {}, 0
+        for due, name, args, interval in state['timers']:
+            self.after(due - self.now, name, *args, every=interval)
+
+
 class Player:
+    sprites = {}  # Base colour -> pre-rendered ship
+    hit_mask = None
+
     def __init__(self):
         self.width = 60
         self.height = 40
@@ -270,42 +1252,40 @@ class Player:
         self.y = SCREEN_HEIGHT - self.height - 20
         self.speed = 8
         self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.is_hit = False  # Track if player is currently in hit state
-        self.hit_timer = 0   # Timer for hit animation
+        self.hit_until = 0  # Game time the hit animation ends at
         self.hit_duration = 30  # Duration of hit animation (in frames)
         self.is_invincible = False  # Track invincibility state
-        self.death_animation_timer = 0  # New: Timer for death animation
+        self.death_duration = 60  # 1 second at 60 FPS
+        self.death_ends = 0  # Game time the death animation ends at
         self.is_dying = False  # New: Track if player is in death animation
         self.death_particles = []  # New: For particle effects
         self.death_stage = 0  # New: Track which stage of death animation we're in
         
-    def update(self, can_move=True):
+    def update(self, can_move=True, keys=None, dt=1):
         if not can_move or self.is_dying:  # Modified: Don't move during death animation
             return
             
-        # Update hit animation timer
-        if self.is_hit:
-            self.hit_timer -= 1
-            if self.hit_timer <= 0:
-                self.is_hit = False
-                
         # Check for Shift key to toggle invincibility
-        keys = pygame.key.get_pressed()
+        if keys is None:
+            keys = pygame.key.get_pressed()
         self.is_invincible = keys[pygame.K_RSHIFT]
         
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.x -= self.speed
+            self.x -= self.speed * dt
         if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.x += self.speed
+            self.x += self.speed * dt
             
         # Keep player on screen
         self.x = max(0, min(SCREEN_WIDTH - self.width, self.x))
         self.rect.x = self.x
         
-    def draw(self, screen):
+    def is_hit(self, now):
+        """Whether the hit animation is still playing at game time now"""
+        return now < self.hit_until
+
+    def draw(self, screen, now=0):
         if self.is_dying:
-            # Update death animation
-            self.death_animation_timer -= 1
+            death_timer = self.death_ends - now  # Counts down to 0 as the animation plays
             
             # Update particles
             for particle in self.death_particles[:]:
@@ -325,13 +1305,13 @@ class Player:
                 )
             
             # Draw different stages of explosion
-            if self.death_animation_timer > 40:  # Initial flash
-                radius = int((60 - self.death_animation_timer) * 3)
+            if death_timer > 40:  # Initial flash
+                radius = int((60 - death_timer) * 3)
                 pygame.draw.circle(screen, WHITE, 
                                 (self.x + self.width//2, self.y + self.height//2), 
                                 radius)
-            elif self.death_animation_timer > 20:  # Main explosion
-                radius = int((40 - self.death_animation_timer) * 4)
+            elif death_timer > 20:  # Main explosion
+                radius = int((40 - death_timer) * 4)
                 pygame.draw.circle(screen, ORANGE, 
                                 (self.x + self.width//2, self.y + self.height//2), 
                                 radius)
@@ -339,13 +1319,13 @@ class Player:
                                 (self.x + self.width//2, self.y + self.height//2), 
                                 radius - 10)
             else:  # Fading out
-                alpha = int(255 * (self.death_animation_timer / 20))
+                alpha = max(0, int(255 * (death_timer / 20)))
                 s = pygame.Surface((100, 100), pygame.SRCALPHA)
                 pygame.draw.circle(s, (255, 165, 0, alpha), (50, 50), 30)
                 screen.blit(s, (self.x + self.width//2 - 50, self.y + self.height//2 - 50))
             
             # Add new particles throughout the animation
-            if random.random() < 0.3 and self.death_animation_timer > 10:
+            if random.random() < 0.3 and death_timer > 10:
                 angle = random.uniform(0, 2 * math.pi)
                 speed = random.uniform(0.5, 3)
                 size = random.randint(1, 4)
@@ -363,7 +1343,7 @@ class Player:
             return
             
         # Flash between red and normal colors during hit
-        if self.is_hit and self.hit_timer % 10 < 5:  # Flash every 5 frames
+        if self.is_hit(now) and int(self.hit_until - now) % 10 < 5:  # Flash every 5 frames
             base_color = RED
         else:
             base_color = GREEN
@@ -375,23 +1355,35 @@ class Player:
             invincible_color = (min(255, pulse), min(255, 255 - pulse), 0)
             pygame.draw.rect(screen, invincible_color, self.rect.inflate(10, 10), 2)
             
-        pygame.draw.rect(screen, base_color, self.rect)
-        # Draw a simple spaceship shape
-        pygame.draw.polygon(screen, WHITE, [
-            (self.x + self.width//2, self.y),
-            (self.x + 10, self.y + self.height),
-            (self.x + self.width - 10, self.y + self.height)
-        ])
-        
-    def trigger_hit(self):
+        screen.blit(self.sprite(base_color), self.rect)
+
+    def sprite(self, base_color):
+        """Ship body with its spaceship shape, pre-rendered once per colour"""
+        surface = Player.sprites.get(base_color)
+        if surface is None:
+            surface = Player.sprites[base_color] = pygame.Surface((self.width, self.height))
+            surface.fill(base_color)
+            pygame.draw.polygon(surface, WHITE, [
+                (self.width//2, 0),
+                (10, self.height),
+                (self.width - 10, self.height)
+            ])
+        return surface
+
+    def mask(self):
+        """Collision mask of the ship: the white triangle of its art"""
+        if Player.hit_mask is None:
+            Player.hit_mask = pygame.mask.from_threshold(self.sprite(GREEN), WHITE, (1, 1, 1, 255))
+        return Player.hit_mask
+        
+    def trigger_hit(self, now=0):
         """Start the hit animation"""
-        self.is_hit = True
-        self.hit_timer = self.hit_duration
+        self.hit_until = now + self.hit_duration
         
-    def trigger_death(self):
-        """Start the death animation"""
+    def trigger_death(self, now=0):
+        """Start the death animation; the game schedules its end"""
         self.is_dying = True
-        self.death_animation_timer = 60  # 1 second at 60 FPS
+        self.death_ends = now + self.death_duration
         self.death_stage = 0
         self.death_particles = []  # Clear any old particles
         
@@ -411,27 +1403,52 @@ class Player:
                 'color': random.choice([RED, ORANGE, YELLOW, WHITE])
             })
 
+# Shots can cancel each other: the chance an overlapping player/invader pair
+# collides, and how many such hits each bullet absorbs before it's destroyed
+BULLET_INTERCEPT_CHANCE = 1.0
+PLAYER_BULLET_HP = 1
+INVADER_BULLET_HP = {1: 1, 2: 1, 3: 2, 4: 2, 5: 3}  # By the firing invader's type
+
 class Bullet:
-    def __init__(self, x, y, speed, color=WHITE):
+    def __init__(self, x, y, speed, color=WHITE, hp=PLAYER_BULLET_HP):
         self.x = x
         self.y = y
         self.speed = speed
         self.width = 4
         self.height = 10
-        self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.rect = pygame.Rect(x, 0, self.width, self.height)
+        self.rect.y = y  # Rounded, as update() keeps it; the constructor would truncate
         self.color = color
+        self.hp = hp
         
-    def update(self):
-        self.y += self.speed
+    def update(self, dt=1):
+        self.y += self.speed * dt
         self.rect.y = self.y
         
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
 
+# Invader detail shapes per type, in the 40x30 units of a full-size invader
+INVADER_SHAPES = {
+    1: [('rect', (8, 5, 24, 10)), ('rect', (5, 15, 10, 8)), ('rect', (25, 15, 10, 8))],
+    2: [('rect', (5, 5, 30, 15)), ('rect', (10, 20, 20, 5))],
+    3: [('rect', (3, 3, 34, 20)), ('rect', (8, 23, 8, 4)), ('rect', (24, 23, 8, 4))],
+    4: [('ellipse', (5, 5, 30, 20)), ('rect', (15, 25, 10, 3))],
+    5: [('ellipse', (2, 2, 36, 26)), ('rect', (5, 10, 8, 8)), ('rect', (27, 10, 8, 8))],  # Boss type
+}
+INVADER_WIDTH = 40
+INVADER_HEIGHT = 30
+INVADER_COLORS = [RED, YELLOW, BLUE, PURPLE, ORANGE]
+# Confirm bullet hits against the figures drawn on invaders and the ship, not their whole rects
+PIXEL_COLLISIONS = False
+
 class Invader:
-    def __init__(self, x, y, invader_type=1):
-        self.width = 40
-        self.height = 30
+    sprites = {}  # (type, width, height, body colour, detail colour) -> pre-rendered invader
+    masks = {}    # (type, width, height) -> collision mask
+
+    def __init__(self, x, y, invader_type=1, width=INVADER_WIDTH, height=INVADER_HEIGHT):
+        self.width = width
+        self.height = height
         self.x = x
         self.y = y
         self.type = invader_type
@@ -439,32 +1456,28 @@ class Invader:
         self.health = 1 if invader_type <= 2 else 2 if invader_type <= 4 else 3
         self.max_health = self.health
         self.points = 10 * invader_type
-        self.is_hit = False  # Track if invader is currently in hit state
-        self.hit_timer = 0   # Timer for hit animation
+        self.hit_until = 0  # Game time the hit animation ends at
         self.hit_duration = 15  # Duration of hit animation (shorter than player's)
+        self.row = None  # Lattice cell, set by Formation.add
+        self.col = None
+        self.slot = None  # Home cell, kept while the invader is off the lattice
         
     def update(self, dx, dy):
         self.x += dx
         self.y += dy
         self.rect.x = self.x
         self.rect.y = self.y
-        
-        # Update hit animation timer
-        if self.is_hit:
-            self.hit_timer -= 1
-            if self.hit_timer <= 0:
-                self.is_hit = False
                 
-    def hit(self):
+    def hit(self, now=0):
         """Start the hit animation and reduce health"""
-        self.is_hit = True
-        self.hit_timer = self.hit_duration
+        self.hit_until = now + self.hit_duration
         self.health -= 1
         return self.health <= 0
         
-    def draw(self, screen):
-        colors = [RED, YELLOW, BLUE, PURPLE, ORANGE]
-        color = colors[min(self.type - 1, 4)]
+    def sprite(self, now=None):
+        """Pre-rendered image for this invader's type, size and damage state, flashing if hit before now"""
+        color = INVADER_COLORS[min(self.type - 1, 4)]
+        is_hit = now is not None and now < self.hit_until
         
         # Draw invader with health indication
         if self.health < self.max_health:
@@ -472,30 +1485,710 @@ class Invader:
             color = tuple(c // 2 for c in color)
             
         # Flash white when hit
-        if self.is_hit and self.hit_timer % 5 < 3:  # Faster flash than player
+        if is_hit and int(self.hit_until - now) % 5 < 3:  # Faster flash than player
             color = WHITE
-            
-        pygame.draw.rect(screen, color, self.rect)
-        
-        # Draw simple invader shape based on type
-        if self.type == 1:
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 8, self.y + 5, 24, 10))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 5, self.y + 15, 10, 8))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 25, self.y + 15, 10, 8))
-        elif self.type == 2:
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 5, self.y + 5, 30, 15))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 10, self.y + 20, 20, 5))
-        elif self.type == 3:
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 3, self.y + 3, 34, 20))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 8, self.y + 23, 8, 4))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 24, self.y + 23, 8, 4))
-        elif self.type == 4:
-            pygame.draw.ellipse(screen, BLACK if self.is_hit else WHITE, (self.x + 5, self.y + 5, 30, 20))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 15, self.y + 25, 10, 3))
-        else:  # Boss type
-            pygame.draw.ellipse(screen, BLACK if self.is_hit else WHITE, (self.x + 2, self.y + 2, 36, 26))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 5, self.y + 10, 8, 8))
-            pygame.draw.rect(screen, BLACK if self.is_hit else WHITE, (self.x + 27, self.y + 10, 8, 8))
+        detail_color = BLACK if is_hit else WHITE
+        
+        key = (self.type, self.width, self.height, color, detail_color)
+        surface = Invader.sprites.get(key)
+        if surface is None:
+            surface = Invader.sprites[key] = pygame.Surface((self.width, self.height))
+            surface.fill(color)
+            # Draw simple invader shape based on type, scaled to this invader's size
+            sx = self.width / INVADER_WIDTH
+            sy = self.height / INVADER_HEIGHT
+            for kind, (x, y, w, h) in INVADER_SHAPES[min(self.type, 5)]:
+                shape_rect = (x * sx, y * sy, max(1, w * sx), max(1, h * sy))
+                if kind == 'ellipse':
+                    pygame.draw.ellipse(surface, detail_color, shape_rect)
+                else:
+                    pygame.draw.rect(surface, detail_color, shape_rect)
+        return surface
+
+    def mask(self):
+        """Collision mask of the invader's figure: the white detail pixels of its normal art"""
+        key = (self.type, self.width, self.height)
+        mask = Invader.masks.get(key)
+        if mask is None:
+            health, self.health = self.health, self.max_health
+            art = self.sprite()
+            self.health = health
+            mask = Invader.masks[key] = pygame.mask.from_threshold(art, WHITE, (1, 1, 1, 255))
+        return mask
+        
+    def draw(self, screen, now=None):
+        screen.blit(self.sprite(now), self.rect)
+
+def sweep_time(rect, dx, dy, target):
+    """Earliest fraction of a move by (dx, dy), ending at rect, at which rect overlaps target.
+
+    None if they never overlap during the move. A move of (0, 0) is a plain
+    overlap test, and a move that ends overlapping always hits.
+    """
+    start = 0.0
+    end = 1.0
+    for position, move, size, target_position, target_size in (
+            (rect.x - dx, dx, rect.width, target.x, target.width),
+            (rect.y - dy, dy, rect.height, target.y, target.height)):
+        if move == 0:
+            if position + size <= target_position or position >= target_position + target_size:
+                return None
+            continue
+        enter = (target_position - size - position) / move
+        leave = (target_position + target_size - position) / move
+        if enter > leave:
+            enter, leave = leave, enter
+        start = max(start, enter)
+        end = min(end, leave)
+        if start >= end:
+            return None
+    return start
+
+
+class Formation:
+    """Occupancy index over the invader lattice, kept up to date as invaders die.
+
+    Invaders on the lattice share one origin, so the occupied column range,
+    top/bottom rows and the lowest invader in each column give the formation's
+    edges, landing line and front line without scanning every invader.
+    """
+    def __init__(self, col_x, row_y, width, height):
+        self.col_x = col_x  # Lattice x of each column at creation
+        self.row_y = row_y  # Lattice y of each row at creation
+        self.width = width
+        self.height = height
+        rows, cols = len(row_y), len(col_x)
+        self.grid = [[None] * cols for _ in range(rows)]
+        self.column_counts = [0] * cols
+        self.row_counts = [0] * rows
+        self.front = [None] * cols  # Lowest live invader in each column
+        self.min_col, self.max_col = cols, -1
+        self.top_row, self.bottom_row = rows, -1
+        self.count = 0
+        # Mean lattice pitch; col_x/row_y are rounded, so lookups allow a pixel of slack
+        self.pitch_x = (col_x[-1] - col_x[0]) / (cols - 1) if cols > 1 else 1
+        self.pitch_y = (row_y[-1] - row_y[0]) / (rows - 1) if rows > 1 else 1
+        self.detached = []  # Live invaders that have left the lattice
+        self.version = 0    # Bumped whenever an invader joins or leaves the lattice
+        self.x = self.y = 0  # Origin: how far the lattice has moved since creation
+        self.slack = (0, 0)  # Largest offset a movement pattern currently puts invaders off their cells
+
+    def add(self, invader, row, col):
+        self.version += 1
+        invader.row, invader.col = row, col
+        invader.slot = (row, col)  # Kept while detached, so the invader can return to it
+        self.grid[row][col] = invader
+        self.column_counts[col] += 1
+        self.row_counts[row] += 1
+        self.count += 1
+        if self.front[col] is None or row > self.front[col].row:
+            self.front[col] = invader
+        self.min_col, self.max_col = min(self.min_col, col), max(self.max_col, col)
+        self.top_row, self.bottom_row = min(self.top_row, row), max(self.bottom_row, row)
+
+    def remove(self, invader):
+        self.version += 1
+        row, col = invader.row, invader.col
+        invader.row = invader.col = None
+        self.grid[row][col] = None
+        self.column_counts[col] -= 1
+        self.row_counts[row] -= 1
+        self.count -= 1
+        if self.front[col] is invader:
+            self.front[col] = next((self.grid[r][col] for r in range(row - 1, -1, -1)
+                                    if self.grid[r][col] is not None), None)
+        # Emptied edge columns/rows only ever shrink the range, so this is amortised O(1)
+        while self.min_col <= self.max_col and not self.column_counts[self.min_col]:
+            self.min_col += 1
+        while self.max_col >= self.min_col and not self.column_counts[self.max_col]:
+            self.max_col -= 1
+        while self.top_row <= self.bottom_row and not self.row_counts[self.top_row]:
+            self.top_row += 1
+        while self.bottom_row >= self.top_row and not self.row_counts[self.bottom_row]:
+            self.bottom_row -= 1
+
+    def detach(self, invader):
+        """Take a live invader off the lattice; hit_test still finds it by brute force"""
+        self.remove(invader)
+        self.detached.append(invader)
+
+    def attach(self, invader):
+        """Put a detached invader back in its lattice cell"""
+        self.detached.remove(invader)
+        self.add(invader, *invader.slot)
+
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+
+    def discard(self, invader):
+        """Forget a dead invader, wherever it is"""
+        if invader.row is not None and self.grid[invader.row][invader.col] is invader:
+            self.remove(invader)
+        else:
+            self.detached.remove(invader)
+
+    def hit_test(self, rect, dx=0, dy=0, step=(0, 0), pixel=False):
+        """First invader rect touches on its way there from (dx, dy) back.
+
+        step is how far the formation moved over the same interval. Only the
+        lattice cells the swept rect can reach are checked; detached invaders
+        are checked one by one. With pixel set, a rect hit only counts if the
+        swept path also touches the invader's mask.
+        """
+        hit, hit_time = None, 2
+        if self.count:
+            move_x, move_y = dx - step[0], dy - step[1]  # Relative to the formation
+            path = rect.union(rect.move(-move_x, -move_y)) if move_x or move_y else rect
+            area = path  # Where to look for cells; the mask test stays on the path itself
+            if self.slack != (0, 0):
+                area = path.inflate(2 * self.slack[0] + 2, 2 * self.slack[1] + 2)
+            origin_x, origin_y = self.origin()
+            left = area.left - origin_x - self.col_x[0]
+            top = area.top - origin_y - self.row_y[0]
+            first_col = max(self.min_col, int((left - self.width - 1) // self.pitch_x) + 1)
+            last_col = min(self.max_col, int((left + area.width + 1) // self.pitch_x))
+            first_row = max(self.top_row, int((top - self.height - 1) // self.pitch_y) + 1)
+            last_row = min(self.bottom_row, int((top + area.height + 1) // self.pitch_y))
+            grid = self.grid
+            for row in range(first_row, last_row + 1):
+                cells = grid[row]
+                for col in range(first_col, last_col + 1):
+                    invader = cells[col]
+                    if invader is not None:
+                        time = sweep_time(rect, move_x, move_y, invader.rect)
+                        if (time is not None and time < hit_time
+                                and (not pixel or mask_touches(invader.mask(), invader.rect, path))):
+                            hit, hit_time = invader, time
+        for invader in self.detached:
+            time = sweep_time(rect, dx, dy, invader.rect)
+            if (time is not None and time < hit_time
+                    and (not pixel or mask_touches(invader.mask(), invader.rect,
+                                                   rect.union(rect.move(-dx, -dy))))):
+                hit, hit_time = invader, time
+        return hit
+
+    def origin(self):
+        """Where the lattice's (0, 0) is now"""
+        return self.x, self.y
+
+    def bounds(self):
+        """(left, top, right, bottom) of the live formation, or None when it's empty"""
+        if not self.count:
+            return None
+        slack_x, slack_y = self.slack
+        return (self.x + self.col_x[self.min_col] - slack_x, self.y + self.row_y[self.top_row] - slack_y,
+                self.x + self.col_x[self.max_col] + self.width + slack_x,
+                self.y + self.row_y[self.bottom_row] + self.height + slack_y)
+
+    def front_line(self):
+        """The lowest invader of every occupied column: the only ones with a clear shot"""
+        return [invader for invader in self.front[self.min_col:self.max_col + 1] if invader is not None]
+
+# Movement patterns a level can name in its 'patterns' (a list of names, or a
+# dict of name -> overrides). Distances are in pixels, times in frames.
+MOVEMENT_PATTERNS = {
+    'sway': {'amplitude': 24, 'bob': 6, 'period': 150, 'phase': 0.7},  # Rows sway out of step
+    'breathe': {'amount': 0.08, 'period': 200},  # Lattice spacing swells and shrinks
+    'dive': {'chance': 0.01, 'burst': 1, 'max': 4, 'duration': 200, 'swing': 160},  # Bezier dive-bombs
+}
+# Patterns for the shipped levels. They change how those levels play, and a diver
+# that reaches the ship costs a life, so they're off unless --formation-patterns
+# turns them on. Endless levels and stress presets name their own.
+LEVEL_PATTERNS = {
+    3: ['sway'],
+    4: ['breathe'],
+    5: ['sway'],
+    6: ['sway', 'dive'],
+    7: ['breathe', 'dive'],
+    8: ['sway', 'breathe', 'dive'],
+    9: ['sway', 'breathe', 'dive'],
+    10: {'sway': {}, 'breathe': {}, 'dive': {'max': 6}},
+}
+FORMATION_PATTERNS = False
+
+
+def formation_motion(formation, patterns):
+    """Pattern movement for a level's formation; None (classic movement) without patterns or numpy"""
+    if not patterns:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        return None
+    if not isinstance(patterns, dict):
+        patterns = dict.fromkeys(patterns)
+    specs = {name: dict(MOVEMENT_PATTERNS[name], **(overrides or {})) for name, overrides in patterns.items()}
+    return FormationMotion(numpy, formation, specs)
+
+
+class FormationMotion:
+    """Places every invader as a function of time and its lattice slot.
+
+    Pattern offsets are evaluated for the whole lattice as (rows, cols)
+    arrays, positions and pixels for every invader on it are worked out in
+    one gather, and all diving invaders follow their cubic Bezier arcs in one
+    array expression, so the per-tick cost is a few numpy operations plus
+    storing the results on the invaders, however many invaders are diving.
+    """
+    def __init__(self, numpy, formation, patterns):
+        self.np = numpy
+        self.formation = formation
+        self.patterns = patterns
+        self.time = 0
+        self.col_x = numpy.array(formation.col_x, dtype=float)
+        self.row_y = numpy.array(formation.row_y, dtype=float)
+        self.center_x = (formation.col_x[0] + formation.col_x[-1] + formation.width) / 2
+        # Divers: the invaders, and one row per invader of (row, col, c1x, c1y, c2x, c2y, start)
+        self.divers = []
+        self.dives = numpy.zeros((0, 7))
+        self.positions = numpy.zeros((0, 2))  # Where each diver was put this tick
+        self.members = None  # (formation, its version, invaders on the lattice, their rows, cols)
+
+    def components(self):
+        """The pattern offsets split into per-row and per-column parts: (row_dx, col_dx, row_dy, col_dy)"""
+        np = self.np
+        rows, cols = len(self.row_y), len(self.col_x)
+        row_dx, col_dx = np.zeros(rows), np.zeros(cols)
+        row_dy, col_dy = np.zeros(rows), np.zeros(cols)
+        sway = self.patterns.get('sway')
+        if sway:
+            angle = 2 * math.pi * self.time / sway['period']
+            ease = min(1, self.time / sway['period'])  # Grow in over one period instead of jumping
+            row_dx += ease * sway['amplitude'] * np.sin(angle + sway['phase'] * np.arange(rows))
+            col_dy += ease * sway['bob'] * np.sin(angle + sway['phase'] * np.arange(cols))
+        breathe = self.patterns.get('breathe')
+        if breathe:
+            scale = breathe['amount'] * math.sin(2 * math.pi * self.time / breathe['period'])
+            col_dx += (self.col_x - self.center_x) * scale
+            row_dy += (self.row_y - self.row_y[0]) * scale  # The top row stays put
+        return row_dx, col_dx, row_dy, col_dy
+
+    def offsets(self):
+        """(dx, dy) of every lattice cell from its resting place now, as (rows, cols) arrays"""
+        row_dx, col_dx, row_dy, col_dy = self.components()
+        return row_dx[:, None] + col_dx, row_dy[:, None] + col_dy
+
+    def update(self, game, dt=1):
+        """Advance the patterns by dt frames and move every invader to its place"""
+        np = self.np
+        self.time += dt
+        formation = self.formation
+        dx, dy = self.offsets()
+        formation.slack = (float(np.abs(dx).max()), float(np.abs(dy).max()))
+        cell_x = formation.x + self.col_x + dx
+        cell_y = (formation.y + self.row_y)[:, None] + dy
+        self.place(cell_x, cell_y)
+
+        if 'dive' in self.patterns:
+            self.launch_dives(game, cell_x, cell_y, dt)
+            self.move_divers(cell_x, cell_y)
+
+    def place(self, cell_x, cell_y):
+        """Put every invader on the lattice at its cell, rect included"""
+        np = self.np
+        formation = self.formation
+        members = self.members
+        if members is None or members[0] is not formation or members[1] != formation.version:
+            invaders = [invader for cells in formation.grid for invader in cells if invader is not None]
+            members = self.members = (formation, formation.version, invaders,
+                                      np.array([invader.row for invader in invaders], dtype=int),
+                                      np.array([invader.col for invader in invaders], dtype=int))
+        _, _, invaders, rows, cols = members
+        if not invaders:
+            return
+        # One gather for the whole lattice, then plain attribute stores (Rect rounds the floats itself)
+        for invader, x, y in zip(invaders, cell_x[rows, cols].tolist(), cell_y[rows, cols].tolist()):
+            invader.x = x
+            invader.y = y
+            rect = invader.rect
+            rect.x = x
+            rect.y = y
+
+    def launch_dives(self, game, cell_x, cell_y, dt):
+        """Send up to a burst of front-line invaders diving at the player"""
+        spec = self.patterns['dive']
+        room = min(spec['burst'], spec['max'] - len(self.divers))
+        chance = spec['chance'] if dt == 1 else 1 - (1 - spec['chance']) ** dt
+        if room <= 0 or game.rng.random() >= chance:
+            return
+        candidates = self.formation.front_line()
+        chosen = game.rng.sample(candidates, min(room, len(candidates)))
+        if not chosen:
+            return
+        np = self.np
+        rows = np.array([invader.row for invader in chosen])
+        cols = np.array([invader.col for invader in chosen])
+        for invader in chosen:
+            self.formation.detach(invader)
+        # The arc leaves and returns to the slot; its midpoint is where the player is now:
+        # B(1/2) = slot/4 + 3/4 * (c1 + c2)/2, so centre the controls to put that on target
+        home_x, home_y = cell_x[rows, cols], cell_y[rows, cols]
+        target_x = game.player.rect.centerx - self.formation.width / 2
+        center_x = (target_x - home_x / 4) / 0.75
+        center_y = (game.player.y - home_y / 4) / 0.75
+        swing = spec['swing'] * np.array([game.rng.choice((-1, 1)) for _ in chosen])
+        dives = np.column_stack([rows, cols, center_x - swing, center_y, center_x + swing, center_y,
+                                 np.full(len(chosen), self.time)])
+        self.divers.extend(chosen)
+        self.dives = np.concatenate([self.dives, dives])
+
+    def move_divers(self, cell_x, cell_y):
+        """Put every diver on its arc; finished ones rejoin the lattice, dead ones are dropped"""
+        if not self.divers:
+            return
+        np = self.np
+        dives = self.dives
+        rows, cols = dives[:, 0].astype(int), dives[:, 1].astype(int)
+        t = np.minimum((self.time - dives[:, 6]) / self.patterns['dive']['duration'], 1)[:, None]
+        u = 1 - t
+        home = np.column_stack([cell_x[rows, cols], cell_y[rows, cols]])
+        positions = (u ** 3 + t ** 3) * home + 3 * u * u * t * dives[:, 2:4] + 3 * u * t * t * dives[:, 4:6]
+
+        keep = []
+        for invader, (x, y), done in zip(self.divers, positions.tolist(), (t[:, 0] >= 1).tolist()):
+            if invader.health <= 0:
+                keep.append(False)  # Shot down; the game has already taken it off the formation
+                continue
+            invader.x = x
+            invader.y = y
+            rect = invader.rect
+            rect.x = x
+            rect.y = y
+            if done:
+                self.formation.attach(invader)
+            keep.append(not done)
+        if not all(keep):
+            keep = np.array(keep)
+            self.divers = [invader for invader, kept in zip(self.divers, keep.tolist()) if kept]
+            self.dives = dives[keep]
+            positions = positions[keep]
+        self.positions = positions
+
+    def crashed(self, rect):
+        """A diver overlapping rect this tick, or None"""
+        if not self.divers:
+            return None
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        hits = self.np.flatnonzero((x < rect.right) & (x + self.formation.width > rect.left)
+                                   & (y < rect.bottom) & (y + self.formation.height > rect.top))
+        return self.divers[hits[0]] if len(hits) else None
+
+# Boss waves: a level's 'boss' entry gives the boss's health and points and a
+# list of emitters. Each emitter fires a volley every 'every' frames:
+#   ring/spiral - 'count' bullets evenly around the boss, turned by 'spin' radians each volley
+#   fan         - 'count' bullets over 'spread' radians, aimed at the player
+# 'speed' is the launch speed and 'accel' is added to it every frame.
+BOSS_WIDTH = 160
+BOSS_HEIGHT = 48
+BOSS_Y = 20
+BOSS_SWAY_PERIOD = 400  # Frames for one trip across the screen and back
+BOSS_BULLET_RADIUS = 4
+EMITTER_DEFAULTS = {'every': 60, 'count': 12, 'spin': 0.0, 'spread': 0.6, 'speed': 4, 'accel': 0.0,
+                    'color': ORANGE}
+
+
+def make_boss(spec):
+    """The boss for a level's 'boss' spec and the field its bullets live in; (None, None) without numpy"""
+    if not spec:
+        return None, None
+    try:
+        import numpy
+    except ImportError:
+        return None, None
+    return Boss(spec), BulletField(numpy)
+
+
+class BulletField:
+    """Enemy bullets stored as rows of one numpy array: (x, y, vx, vy, ax, ay).
+
+    Spawning a volley, moving, culling and testing against a rect are each a
+    handful of array operations, so thousands of live bullets cost about the
+    same Python time as a few.
+    """
+    def __init__(self, numpy, radius=BOSS_BULLET_RADIUS, capacity=1024):
+        self.np = numpy
+        self.radius = radius
+        self.size = radius * 2 + 1
+        self.data = numpy.zeros((capacity, 6))
+        self.colors = numpy.zeros(capacity, dtype=numpy.int32)  # Index into self.palette
+        self.ids = numpy.zeros(capacity, dtype=numpy.int64)  # Ascending, never reused; for the spectator stream
+        self.next_id = 0
+        self.palette = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, angles, speed, accel=0.0, color=ORANGE):
+        """Add one bullet per angle (radians, 0 = right, pi/2 = down) centred on (x, y)"""
+        np = self.np
+        cos, sin = np.cos(angles), np.sin(angles)
+        rows = np.empty((len(angles), 6))
+        rows[:, 0] = x - self.radius
+        rows[:, 1] = y - self.radius
+        rows[:, 2], rows[:, 3] = cos * speed, sin * speed
+        rows[:, 4], rows[:, 5] = cos * accel, sin * accel
+        self.append(rows, color)
+
+    def append(self, rows, color, ids=None):
+        """Add bullets given as (x, y, vx, vy, ax, ay) rows, numbered on from next_id unless ids are given"""
+        np = self.np
+        end = self.count + len(rows)
+        if end > len(self.data):
+            capacity = max(end, len(self.data) * 2)
+            extra = capacity - len(self.data)
+            self.data = np.concatenate([self.data, np.zeros((extra, 6))])
+            self.colors = np.concatenate([self.colors, np.zeros(extra, dtype=np.int32)])
+            self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        if color not in self.palette:
+            self.palette.append(color)
+        self.data[self.count:end] = rows
+        self.colors[self.count:end] = self.palette.index(color)
+        if ids is None:
+            ids = np.arange(self.next_id, self.next_id + len(rows))
+            self.next_id += len(rows)
+        self.ids[self.count:end] = ids
+        self.count = end
+
+    def update(self, dt=1):
+        """Accelerate and move every bullet, then drop those that left the screen"""
+        if not self.count:
+            return
+        bullets = self.data[:self.count]
+        bullets[:, 2:4] += bullets[:, 4:6] * dt
+        bullets[:, 0:2] += bullets[:, 2:4] * dt
+        x, y = bullets[:, 0], bullets[:, 1]
+        inside = (x > -self.size) & (x < SCREEN_WIDTH) & (y > -self.size) & (y < SCREEN_HEIGHT)
+        if not inside.all():
+            self.keep(inside)
+
+    def keep(self, selected):
+        """Keep only the bullets selected (a boolean array over the live ones), in order"""
+        kept = self.np.flatnonzero(selected)
+        self.data[:len(kept)] = self.data[kept]
+        self.colors[:len(kept)] = self.colors[kept]
+        self.ids[:len(kept)] = self.ids[kept]
+        self.count = len(kept)
+
+    def remove(self, indices):
+        selected = self.np.ones(self.count, dtype=bool)
+        selected[indices] = False
+        self.keep(selected)
+
+    def hits(self, rect, dx=0, dt=1):
+        """Indices of bullets whose path this step touched rect, which itself moved by dx.
+
+        Each path is taken as the box around its two ends, which for bullets
+        this small and slow is as good as a true sweep.
+        """
+        np = self.np
+        if not self.count:
+            return np.zeros(0, dtype=int)
+        bullets = self.data[:self.count]
+        x1, y1 = bullets[:, 0], bullets[:, 1]
+        x0 = x1 - bullets[:, 2] * dt + dx  # Start of the step, relative to where rect is now
+        y0 = y1 - bullets[:, 3] * dt
+        size = self.size
+        return np.flatnonzero((np.minimum(x0, x1) < rect.right) & (np.maximum(x0, x1) + size > rect.left)
+                              & (np.minimum(y0, y1) < rect.bottom) & (np.maximum(y0, y1) + size > rect.top))
+
+    def rect(self, index):
+        x, y = self.data[index, 0:2]
+        return pygame.Rect(int(x), int(y), self.size, self.size)
+
+    def dy(self, index, dt=1):
+        return self.data[index, 3] * dt
+
+    def draw_commands(self):
+        """(sprite, dest) pairs for DrawBatch"""
+        sprites = [particle_sprite(color, self.radius) for color in self.palette]
+        size = self.size
+        bullets = self.data[:self.count]
+        return [(sprites[color], (x, y, size, size))
+                for x, y, color in zip(bullets[:, 0].tolist(), bullets[:, 1].tolist(),
+                                       self.colors[:self.count].tolist())]
+
+
+class Boss(Invader):
+    """A single large invader that sweeps along the top and fires its emitters' volleys"""
+    def __init__(self, spec):
+        super().__init__(SCREEN_WIDTH // 2 - BOSS_WIDTH // 2, BOSS_Y, 5, BOSS_WIDTH, BOSS_HEIGHT)
+        self.health = self.max_health = spec['health']
+        self.points = spec['points']
+        self.emitters = [dict(EMITTER_DEFAULTS, **emitter) for emitter in spec['emitters']]
+        self.next_volley = [emitter['every'] for emitter in self.emitters]
+        self.phases = [0.0] * len(self.emitters)
+        self.time = 0
+
+    def update(self, game, dt=1):
+        """Sweep along the top and fire every emitter that's due"""
+        self.time += dt
+        travel = (SCREEN_WIDTH - 500) / 2  # Keep clear of the HUD in both top corners
+        x = SCREEN_WIDTH / 2 - self.width / 2 + travel * math.sin(2 * math.pi * self.time / BOSS_SWAY_PERIOD)
+        super().update(x - self.x, 0)
+        for index, emitter in enumerate(self.emitters):
+            while self.time >= self.next_volley[index]:
+                self.next_volley[index] += emitter['every']
+                self.fire(index, game)
+
+    def fire(self, index, game):
+        """Spawn one volley of an emitter into the game's bullet field"""
+        emitter = self.emitters[index]
+        np = game.boss_bullets.np
+        x, y = self.rect.centerx, self.rect.bottom
+        count = emitter['count']
+        if emitter['pattern'] == 'fan':
+            aim = math.atan2(game.player.rect.centery - y, game.player.rect.centerx - x)
+            offsets = np.linspace(-0.5, 0.5, count) if count > 1 else np.zeros(1)
+            angles = aim + offsets * emitter['spread']
+        else:  # ring / spiral
+            angles = self.phases[index] + np.arange(count) * (2 * math.pi / count)
+            self.phases[index] += emitter['spin']
+        game.boss_bullets.spawn(x, y, angles, emitter['speed'], emitter['accel'], emitter['color'])
+
+# Bunkers between the player and the formation
+SHIELD_COUNT = 4
+SHIELD_WIDTH = 88
+SHIELD_HEIGHT = 64
+SHIELD_GAP_ABOVE_PLAYER = 50
+CRATER_SIZE = 14
+CRATER_SHAPES = 4  # Distinct crater stamps, picked by impact position
+
+
+def full_mask(size):
+    """A filled Mask of the given size, cached"""
+    mask = FULL_MASKS.get(size)
+    if mask is None:
+        mask = FULL_MASKS[size] = pygame.mask.Mask(size, fill=True)
+    return mask
+
+FULL_MASKS = {}
+
+
+def mask_touches(mask, mask_rect, area):
+    """True if any set pixel of mask (placed at mask_rect) lies inside area"""
+    return mask.overlap(full_mask(area.size), (area.x - mask_rect.x, area.y - mask_rect.y)) is not None
+
+
+def shield_image():
+    """The undamaged bunker: a block with bevelled top corners and an arch cut out below"""
+    surface = pygame.Surface((SHIELD_WIDTH, SHIELD_HEIGHT), pygame.SRCALPHA)
+    bevel = SHIELD_WIDTH // 5
+    pygame.draw.polygon(surface, GREEN, [
+        (bevel, 0), (SHIELD_WIDTH - bevel, 0), (SHIELD_WIDTH, bevel),
+        (SHIELD_WIDTH, SHIELD_HEIGHT), (0, SHIELD_HEIGHT), (0, bevel)])
+    arch = pygame.Rect(0, 0, SHIELD_WIDTH // 2, SHIELD_HEIGHT // 2)
+    arch.midbottom = (SHIELD_WIDTH // 2, SHIELD_HEIGHT + SHIELD_HEIGHT // 4)
+    pygame.draw.ellipse(surface, (0, 0, 0, 0), arch)
+    return surface
+
+
+def crater_stamps():
+    """(mask, multiply surface) pairs for blast craters, built once.
+
+    The mask is erased from a shield's mask; the surface is blitted with
+    BLEND_RGBA_MULT to clear the same pixels from its image.
+    """
+    if not CRATER_STAMPS:
+        rng = random.Random(42)  # Fixed ragged shapes; never touches the game's random stream
+        for _ in range(CRATER_SHAPES):
+            surface = pygame.Surface((CRATER_SIZE, CRATER_SIZE), pygame.SRCALPHA)
+            centre = CRATER_SIZE // 2
+            pygame.draw.circle(surface, WHITE, (centre, centre), centre - 3)
+            for _ in range(7):  # Ragged edge: a few smaller bites around the rim
+                angle = rng.uniform(0, 2 * math.pi)
+                distance = rng.uniform(2, centre - 2)
+                pygame.draw.circle(surface, WHITE, (int(centre + math.cos(angle) * distance),
+                                                    int(centre + math.sin(angle) * distance)),
+                                   rng.randint(1, 3))
+            mask = pygame.mask.from_surface(surface)
+            multiply = mask.to_surface(setcolor=(0, 0, 0, 0), unsetcolor=(255, 255, 255, 255))
+            CRATER_STAMPS.append((mask, multiply))
+    return CRATER_STAMPS
+
+CRATER_STAMPS = []
+
+
+class Shield:
+    """A destructible bunker: a Mask of the pixels still standing and the image drawn from it"""
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, SHIELD_WIDTH, SHIELD_HEIGHT)
+        self.surface = shield_image()
+        self.mask = pygame.mask.from_surface(self.surface)
+        self.carves = []  # ('crater', x, y, stamp) / ('erase', x, y, w, h) in shield-local coordinates
+
+    def impact(self, rect, dy):
+        """Where a bullet ending at rect, having moved dy this step, first hits standing shield.
+
+        Returns the shield-local (x, y) of the impact or None. The whole
+        vertical path is tested in one overlap, and the hit nearest the
+        bullet's starting point is taken, so fast bullets can't skip through.
+        """
+        path = rect.union(rect.move(0, -dy)) if dy else rect
+        if not path.colliderect(self.rect):
+            return None
+        offset = (path.x - self.rect.x, path.y - self.rect.y)
+        if self.mask.overlap(full_mask(path.size), offset) is None:
+            return None  # Through a gap or a crater; no need to build the overlap mask
+        overlap = self.mask.overlap_mask(full_mask(path.size), offset)
+        hits = overlap.get_bounding_rects()
+        if not hits:
+            return None
+        if dy < 0:  # Moving up: the lowest standing pixel is met first
+            hit = max(hits, key=lambda r: r.bottom)
+            return rect.centerx - self.rect.x, hit.bottom - 1
+        hit = min(hits, key=lambda r: r.top)
+        return rect.centerx - self.rect.x, hit.top
+
+    def carve(self, x, y, stamp=None):
+        """Blast a crater centred on shield-local (x, y)"""
+        stamps = crater_stamps()
+        if stamp is None:
+            stamp = (x * 7 + y * 3) % len(stamps)  # Varied but deterministic
+        mask, multiply = stamps[stamp]
+        corner = (x - CRATER_SIZE // 2, y - CRATER_SIZE // 2)
+        self.mask.erase(mask, corner)
+        # Only the crater's own rectangle of the image is touched
+        self.surface.blit(multiply, corner, special_flags=pygame.BLEND_RGBA_MULT)
+        app.surface_changed(self.surface)
+        self.carves.append(('crater', x, y, stamp))
+
+    def erase_rect(self, rect):
+        """Remove everything under rect (an invader walking through the bunker)"""
+        area = rect.clip(self.rect)
+        if area:
+            local = area.move(-self.rect.x, -self.rect.y)
+            self.mask.erase(full_mask(local.size), local.topleft)
+            self.surface.fill((0, 0, 0, 0), local)
+            app.surface_changed(self.surface)
+            self.carves.append(('erase', local.x, local.y, local.width, local.height))
+
+# Logos shown at startup; a tuple is a pair shown side by side
+LOGO_SEQUENCE = [
+    "DD Lab1.png",
+    ("logo1.png", "logo2.jpg"),
+    "space_invaders.jpg"
+]
+
+
+def logo_fit_size(image_size, screen_size, paired=False):
+    """Size a logo is scaled down to on this screen, or None if it already fits"""
+    logo_width, logo_height = image_size
+    screen_width, screen_height = screen_size
+    # Single logos get most of the screen, each logo of a pair half of it
+    max_width = screen_width * (0.45 if paired else 0.9)
+    max_height = screen_height * 0.8
+    scale = min(max_width / logo_width, max_height / logo_height)
+    if scale < 1:
+        return (int(logo_width * scale), int(logo_height * scale))
+    return None
+
+
+def image_variant_name(filename, screen_size):
+    """Bundle entry name of an image pre-scaled for a screen size"""
+    return f"{filename}@{screen_size[0]}x{screen_size[1]}"
+
 
 class LogoScreen:
     def __init__(self):
@@ -507,147 +2200,784 @@ class LogoScreen:
         self.load_logos()
         self.fade_state = "in"  # "in", "hold", or "out"
         self.next_logo_time = self.start_time + self.fade_duration
+        self.finished = False
+        # Fade steps run off a wall-clock (ms) timer rather than a check every frame
+        self.scheduler = Scheduler({'fade': self.next_fade_state}, now=self.start_time)
+        self.scheduler.after(self.fade_duration, 'fade')
         self.paired_logos = []  # Store pairs of logos to display together
+        self.composites = {}  # Logo index -> image drawn for it (pairs side by side)
+
+        # Keys that should trigger skipping the logos
+        self.skip_keys = {
+            pygame.K_RETURN, pygame.K_ESCAPE
+        }
+
+    def load_logos(self):
+        # Try to load multiple logo images
+        for item in LOGO_SEQUENCE:
+            try:
+                # Handle single logos
+                if isinstance(item, str):
+                    self.logos.append([app.load_logo(item)])  # Store as single-item list
+                
+                # Handle logo pairs
+                elif isinstance(item, tuple) and len(item) == 2:
+                    self.logos.append([app.load_logo(path, paired=True) for path in item])
+            
+            except Exception as e:
+                pass
+        
+        # If no logos loaded, create text-based ones
+        if not self.logos:
+            font = app.font(72)
+            for i in range(3):
+                surf = pygame.Surface((400, 200), pygame.SRCALPHA)
+                text = font.render(f"Desk Devil Labs", True, WHITE)
+                text_rect = text.get_rect(center=(200, 100))
+                surf.blit(text, text_rect)
+                pygame.draw.rect(surf, WHITE, (0, 0, 400, 200), 2)
+                self.logos.append([surf])
+    
+    def update(self):
+        current_time = pygame.time.get_ticks()
+        elapsed = current_time - self.start_time
+
+        # Check for key presses to skip
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return "quit"
+            elif event.type == pygame.KEYDOWN:
+                # Skip only if it's one of our allowed keys
+                if event.key in self.skip_keys:
+                    return True
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                # Also allow skipping with mouse clicks
+                return True
+        
+        self.scheduler.advance_to(current_time)
+        return self.finished
+
+    def next_fade_state(self):
+        """Move on from the fade state that just ran its course and schedule the next step"""
+        now = self.scheduler.now
+        if self.fade_state == "in":
+            self.fade_state = "hold"
+            duration = self.logo_duration - 2 * self.fade_duration
+        elif self.fade_state == "hold":
+            self.fade_state = "out"
+            duration = self.fade_duration
+        else:
+            self.current_logo += 1
+            if self.current_logo >= len(self.logos):
+                self.finished = True
+                return
+            self.start_time = now
+            self.fade_state = "in"
+            duration = self.fade_duration
+        self.next_logo_time = now + duration
+        self.scheduler.after(duration, 'fade')
+    
+    def draw(self, surface):
+        surface.fill(BLACK)
+        
+        if self.current_logo < len(self.logos):
+            current_time = pygame.time.get_ticks()
+            elapsed = current_time - self.start_time
+            
+            # Calculate alpha based on fade state
+            if self.fade_state == "in":
+                alpha = min(255, int(255 * (elapsed / self.fade_duration)))
+            elif self.fade_state == "out":
+                alpha = max(0, 255 - int(255 * ((current_time - (self.next_logo_time - self.fade_duration)) / self.fade_duration)))
+            else:  # hold
+                alpha = 255
+            
+            # Get current logo(s) - could be single or pair
+            current_logos = self.logos[self.current_logo]
+            
+            # Pairs are drawn as one composite, built once
+            image = self.composites.get(self.current_logo)
+            if image is None:
+                if len(current_logos) > 1:
+                    total_width = sum(logo.get_width() for logo in current_logos) + 20 * (len(current_logos) - 1)
+                    max_height = max(logo.get_height() for logo in current_logos)
+                    image = pygame.Surface((total_width, max_height), pygame.SRCALPHA)
+                    x_offset = 0
+                    for logo in current_logos:
+                        image.blit(logo, (x_offset, (max_height - logo.get_height()) // 2))
+                        x_offset += logo.get_width() + 20
+                else:
+                    image = current_logos[0]
+                self.composites[self.current_logo] = image
+            
+            app.blit_faded(image, image.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2)).topleft, alpha)
+
+# Endless mode: levels past the shipped ones follow these curves, starting from
+# level 10's values. Each entry is (value at level 10, growth per level, cap).
+ENDLESS_START_LEVEL = 11
+ENDLESS_CURVES = {
+    'rows': (9, 0.5, 16),
+    'cols': (13, 0.35, 24),
+    'speed': (4.4, 0.15, 9.0),
+    'shoot_chance': (0.035, 0.002, 0.12),
+    'bullets_per_shot': (5, 0.2, 9),
+    'tough_rows': (3, 0.25, 6),  # How many of the 6 type slots hold boss-type invaders
+    'divers': (6, 0.5, 16),  # Invaders that may be dive-bombing at once
+    'boss_health': (80, 4, 200),
+}
+# Level 10's boss, which endless boss waves (every fifth level) bring back tougher
+ENDLESS_BOSS = {'health': 80, 'points': 2500, 'emitters': [
+    {'pattern': 'spiral', 'count': 3, 'every': 8, 'speed': 2.5, 'spin': 0.23},
+    {'pattern': 'ring', 'count': 24, 'every': 120, 'speed': 1.5, 'accel': 0.03, 'color': YELLOW},
+    {'pattern': 'fan', 'count': 7, 'spread': 0.8, 'every': 60, 'speed': 4, 'color': RED},
+]}
+
+# Stress presets far past the shipped content, for measuring the engine.
+# 'volley' is how many invaders may fire per tick.
+STRESS_PRESETS = {
+    'swarm': {
+        'rows': 40, 'cols': 60, 'types': [1, 2, 3, 4, 5], 'speed': 2, 'shoot_chance': 1.0,
+        'name': 'STRESS: SWARM', 'bullets_per_shot': 5, 'volley': 40
+    },
+    'blizzard': {
+        'rows': 60, 'cols': 80, 'types': [1, 2, 3, 4, 5], 'speed': 2, 'shoot_chance': 1.0,
+        'name': 'STRESS: BLIZZARD', 'bullets_per_shot': 9, 'volley': 100
+    },
+    'divebomb': {
+        'rows': 24, 'cols': 40, 'types': [1, 2, 3, 4, 5], 'speed': 2, 'shoot_chance': 0.5,
+        'name': 'STRESS: DIVEBOMB', 'bullets_per_shot': 5, 'volley': 10,
+        'patterns': {'sway': {}, 'breathe': {}, 'dive': {'chance': 1.0, 'burst': 8, 'max': 500, 'duration': 240}},
+    },
+    'barrage': {
+        'rows': 4, 'cols': 12, 'types': [1, 2, 3, 4], 'speed': 1, 'shoot_chance': 0.05,
+        'name': 'STRESS: BARRAGE', 'bullets_per_shot': 5,
+        'boss': {'health': 100000, 'points': 0, 'emitters': [
+            {'pattern': 'spiral', 'count': 6, 'every': 2, 'speed': 2, 'spin': 0.13},
+            {'pattern': 'ring', 'count': 48, 'every': 12, 'speed': 1.5, 'accel': 0.01, 'color': YELLOW},
+            {'pattern': 'fan', 'count': 15, 'spread': 1.2, 'every': 10, 'speed': 3, 'color': RED},
+        ]},
+    },
+}
+
+
+def endless_level_config(level, curves=ENDLESS_CURVES):
+    """Generate the config for an endless-mode level from the parameter curves"""
+    def curve(name):
+        base, growth, cap = curves[name]
+        return min(cap, base + growth * (level - 10))
+    
+    tough_rows = int(curve('tough_rows'))
+    return {
+        'rows': int(curve('rows')),
+        'cols': int(curve('cols')),
+        'types': [4] * (6 - tough_rows) + [5] * tough_rows,
+        'speed': round(curve('speed'), 2),
+        'shoot_chance': round(curve('shoot_chance'), 4),
+        'name': f'LEVEL {level}: ENDLESS ' + ('BOSS WAVE' if level % 5 == 0 else 'ASSAULT'),
+        'bullets_per_shot': int(curve('bullets_per_shot')),
+        'patterns': {'sway': {}, 'breathe': {}, 'dive': {'max': int(curve('divers'))}},
+        'boss': dict(ENDLESS_BOSS, health=int(curve('boss_health'))) if level % 5 == 0 else None,
+    }
+
+
+# Snapshots: the whole simulation state as one little-endian binary blob
+SNAPSHOT_MAGIC = b"SISNAP1\n"
+SNAPSHOT_FLAGS = ('game_over', 'won', 'level_complete', 'show_level_text', 'death_pending', 'endless',
+                  'score_submitted')
+SNAPSHOT_GAME = struct.Struct('<IiiHb')       # level, score, lives, flags, invader direction
+SNAPSHOT_PLAYER = struct.Struct('<ddd??')     # x, hit_until, death_ends, is_dying, is_invincible
+SNAPSHOT_RNG = struct.Struct('<625I?d')       # Mersenne Twister state, then the cached gauss value
+SNAPSHOT_FORMATION = struct.Struct('<dddd')   # origin x, y and pattern slack x, y
+SNAPSHOT_INVADER = struct.Struct('<HHbddd')   # slot row, col, health, hit_until, x, y
+SNAPSHOT_CELL = struct.Struct('<HH')          # slot row, col of an invader out of the lattice (diving)
+SNAPSHOT_BOSS = struct.Struct('<iddd')        # health, hit_until, x, time
+SNAPSHOT_BULLET = struct.Struct('<dddb3B')    # x, y, speed, hp, colour
+SNAPSHOT_CARVE = struct.Struct('<Bhhhh')      # 0 = crater (x, y, stamp), 1 = erase (x, y, w, h)
+QUICKSAVE_FILE = "space_invaders_quicksave.bin"
+REWIND_SECONDS = 5
+REWIND_MAX_BYTES = 4 * 1024 * 1024  # Busier levels get less than REWIND_SECONDS rather than more memory
+REWIND_KEYFRAME_INTERVAL = 60  # Frames between full snapshots in the rewind buffer
+
+
+def pack_block(data):
+    """Length-prefixed bytes, for the variable-size parts of a snapshot"""
+    return struct.pack('<I', len(data)) + data
+
+
+class SnapshotReader:
+    """Reads a snapshot blob front to back; running off the end raises ValueError"""
+    def __init__(self, blob):
+        if not blob.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("not a game snapshot")
+        self.blob = blob
+        self.offset = len(SNAPSHOT_MAGIC)
+
+    def skip(self, size):
+        """Move past size bytes, returning where they start"""
+        start = self.offset
+        if start + size > len(self.blob):
+            raise ValueError("snapshot is truncated")
+        self.offset = start + size
+        return start
+
+    def unpack(self, layout):
+        return layout.unpack_from(self.blob, self.skip(layout.size))
+
+    def block(self):
+        size, = struct.unpack_from('<I', self.blob, self.skip(4))
+        start = self.skip(size)
+        return self.blob[start:self.offset]
+
+    def records(self, layout):
+        """A block of fixed-size records, as a list of tuples"""
+        data = self.block()
+        if len(data) % layout.size:
+            raise ValueError("snapshot block ends partway through a record")
+        return list(layout.iter_unpack(data))
+
+    def end(self):
+        if self.offset != len(self.blob):
+            raise ValueError("snapshot has bytes after its last block")
+
+
+def xor_bytes(a, b):
+    """a XOR b, the shorter one zero-padded; done on big integers so it runs in C"""
+    size = max(len(a), len(b))
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(size, 'little')
+
+
+class RewindBuffer:
+    """The last few seconds of snapshots, newest last, in a bounded ring.
+
+    Every keyframe_interval-th snapshot is kept whole; the ones between are
+    XORed against that keyframe first. Consecutive states differ in a small
+    fraction of their bytes, so the XOR is mostly zeros and zlib shrinks it
+    to a few hundred bytes.
+    """
+    def __init__(self, frames=REWIND_SECONDS * FPS, max_bytes=REWIND_MAX_BYTES,
+                 keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        self.entries = collections.deque()  # (keyframe entry or None, size, zlib bytes), oldest first
+        self.frames = frames
+        self.max_bytes = max_bytes
+        self.bytes = 0  # Compressed bytes held, counting a dropped keyframe the oldest deltas still need
+        self.keyframe_interval = keyframe_interval
+        self.keyframe = None  # Keyframe entry new snapshots are XORed against, and its blob
+        self.keyframe_blob = None
+        self.since_keyframe = 0
+        self.decoded = (None, None)  # Last keyframe decoded while popping, and its blob
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, blob):
+        if self.keyframe is None or self.since_keyframe >= self.keyframe_interval:
+            entry = (None, len(blob), zlib.compress(blob, 1))
+            self.keyframe, self.keyframe_blob, self.since_keyframe = entry, blob, 0
+        else:
+            entry = (self.keyframe, len(blob), zlib.compress(xor_bytes(blob, self.keyframe_blob), 1))
+        self.since_keyframe += 1
+        self.entries.append(entry)
+        self.bytes += len(entry[2])
+        while len(self.entries) > 1 and (len(self.entries) > self.frames or self.bytes > self.max_bytes):
+            oldest = self.entries.popleft()
+            if oldest[0] is None and self.entries[0][0] is oldest:
+                continue  # Its deltas keep it alive, so its bytes stay counted
+            self.bytes -= len(oldest[2])
+            if oldest[0] is not None and self.entries[0][0] is not oldest[0]:
+                self.bytes -= len(oldest[0][2])  # That was the last delta needing its keyframe
+
+    def pop(self):
+        """Remove and return the newest snapshot, or None when the buffer is empty"""
+        if not self.entries:
+            return None
+        self.keyframe = self.keyframe_blob = None  # Pushing after a rewind starts a fresh keyframe
+        entry = self.entries.pop()
+        self.bytes -= len(entry[2])
+        if not self.entries:
+            self.bytes = 0  # Including a dropped keyframe only the popped deltas needed
+        return self.decode(entry)
+
+    def decode(self, entry):
+        keyframe, size, data = entry
+        data = zlib.decompress(data)
+        if keyframe is None:
+            return data
+        if keyframe is self.keyframe:
+            base = self.keyframe_blob
+        elif keyframe is self.decoded[0]:
+            base = self.decoded[1]
+        else:
+            base = self.decode(keyframe)
+            self.decoded = (keyframe, base)
+        return xor_bytes(data, base)[:size]
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.keyframe = self.keyframe_blob = None
+        self.decoded = (None, None)
+
+
+# Spectator stream: per-tick deltas that spectator.py rebuilds the game from
+SPECTATE_MAGIC = b"SISPEC1\n"
+SPECTATE_FRAME = struct.Struct('<IIdB')  # Record bytes that follow, tick, game time, frame flags
+SPECTATE_MOVED = 1  # Frame flag: every bullet advanced by its velocity this tick
+SPECTATE_MAX_BACKLOG = 4 * 1024 * 1024  # Bytes a socket viewer may fall behind before it's dropped
+SPECTATE_FLAGS = ('title_screen', 'paused', 'show_level_text', 'level_complete', 'game_over', 'won',
+                  'death_pending', 'endless')
+SPECTATE_OFF_LATTICE = 255  # Row and column of an invader the lattice doesn't place (a diver)
+(SPEC_RESET, SPEC_GAME, SPEC_STRESS, SPEC_PLAYER, SPEC_SHIELD, SPEC_CARVE, SPEC_BOSS, SPEC_BOSS_GONE,
+ SPEC_REMOVE, SPEC_INVADER, SPEC_SHIFT, SPEC_MOVE, SPEC_HIT, SPEC_BULLET, SPEC_BULLET_Y,
+ SPEC_SHOT, SPEC_SHOT_GONE, SPEC_SHOTS_CLEAR, SPEC_LATTICE_SHAPE, SPEC_LATTICE, SPEC_CELL) = range(21)
+# Every record is its opcode byte and then these fields
+SPECTATE_RECORDS = {
+    SPEC_RESET: struct.Struct('<B'),
+    SPEC_GAME: struct.Struct('<BiiHH'),        # score, lives, level, SPECTATE_FLAGS bits
+    SPEC_STRESS: struct.Struct('<BB'),         # name length, then that many bytes of name
+    SPEC_PLAYER: struct.Struct('<BdddB'),      # x, hit_until, death_ends, dying | invincible << 1
+    SPEC_SHIELD: struct.Struct('<BBhh'),       # index, x, y of a fresh bunker
+    SPEC_CARVE: struct.Struct('<BBBhhhh'),     # index, 0 = crater (x, y, stamp) / 1 = erase (x, y, w, h)
+    SPEC_BOSS: struct.Struct('<Bdiid'),        # x, health, max_health, hit_until
+    SPEC_BOSS_GONE: struct.Struct('<B'),
+    SPEC_REMOVE: struct.Struct('<BI'),         # invader or bullet id
+    # id, x, y, rect x, y, type, health, max_health, width, height, hit_until, lattice row, column
+    SPEC_INVADER: struct.Struct('<BIddhhBBBBBdBB'),
+    SPEC_SHIFT: struct.Struct('<Bdd'),         # dx, dy added to every invader the lattice didn't place
+    SPEC_MOVE: struct.Struct('<BIddhh'),       # id, x, y, rect x, y
+    SPEC_HIT: struct.Struct('<BIBd'),          # id, health, hit_until
+    SPEC_BULLET: struct.Struct('<BIBddd3B'),   # id, 0 = player's / 1 = invaders', x, y, speed, colour
+    SPEC_BULLET_Y: struct.Struct('<BId'),      # id, y
+    SPEC_SHOT: struct.Struct('<BI6d3B'),       # boss bullet id, its (x, y, vx, vy, ax, ay) row, colour
+    SPEC_SHOT_GONE: struct.Struct('<BI'),      # boss bullet id
+    SPEC_SHOTS_CLEAR: struct.Struct('<B'),
+    SPEC_LATTICE_SHAPE: struct.Struct('<BBB'),  # rows, cols, then cols doubles of col_x and rows of row_y
+    # Which of (row_dx, col_dx, row_dy, col_dy) follow as bits, rows, cols, formation x, y, then
+    # those vectors as doubles. Every invader on the lattice is moved to its cell straight away.
+    SPEC_LATTICE: struct.Struct('<BBBBdd'),
+    SPEC_CELL: struct.Struct('<BIBB'),         # id, lattice row, column it has joined or left
+}
+
+
+def rect_coordinate(value):
+    """The pixel pygame.Rect stores for a float coordinate: rounded half away from zero"""
+    return int(value + 0.5) if value >= 0 else -int(0.5 - value)
+
+
+class SpectatorEncoder:
+    """Turns a Game into one frame of records per tick, saying only what changed.
+
+    Bullets are sent once with their velocity; the viewer moves them itself and
+    hears about them again only if they stray from that path or go. A formation
+    moving as one is a single shift, and a patterned one is its lattice's per-row
+    and per-column offsets, from which the viewer places every invader the way
+    FormationMotion does. So a frame's size follows how much happened, not how
+    much is on screen.
+    """
+    def __init__(self):
+        self.tick = 0
+        self.now = 0         # Game time of the last frame
+        self.next_id = 0
+        self.game = None     # Last values sent
+        self.stress = None
+        self.player = None
+        self.boss = None
+        self.shields = []    # Per bunker: [shield, its carves list, carves sent]
+        # id(invader) -> [entity id, invader, viewer's x, y, game's x, y, health, hit_until,
+        #                 viewer's rect x, y, lattice (row, col) or None]
+        self.invaders = {}
+        self.lattice_shape = None  # (col_x, row_y) lists last sent
+        self.lattice = None        # ((formation x, y), [row_dx, col_dx, row_dy, col_dy]) last sent
+        self.bullets = {}    # id(bullet) -> [entity id, bullet, y, kind]
+        self.field = None    # The boss bullet field being followed, and the viewer's copy of it
+        self.shot_ids = self.shot_rows = None
+        self.started = False
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    def encode(self, game):
+        """The frame taking the viewer from the last encoded state to this one"""
+        records = SPECTATE_RECORDS
+        parts = []
+        if not self.started:
+            self.started = True
+            parts.append(records[SPEC_RESET].pack(SPEC_RESET))
+
+        state = (game.score, game.lives, game.level,
+                 sum(1 << bit for bit, name in enumerate(SPECTATE_FLAGS) if getattr(game, name)))
+        if state != self.game:
+            self.game = state
+            parts.append(records[SPEC_GAME].pack(SPEC_GAME, *state))
+        if game.stress != self.stress:
+            self.stress = game.stress
+            parts.append(self.stress_record())
+        player = game.player
+        state = (player.x, player.hit_until, player.death_ends, int(player.is_dying) | int(player.is_invincible) << 1)
+        if state != self.player:
+            self.player = state
+            parts.append(records[SPEC_PLAYER].pack(SPEC_PLAYER, *state))
+        boss = game.boss
+        state = None if boss is None else (boss.x, boss.health, boss.max_health, boss.hit_until)
+        if state != self.boss:
+            self.boss = state
+            parts.append(records[SPEC_BOSS_GONE].pack(SPEC_BOSS_GONE) if state is None
+                         else records[SPEC_BOSS].pack(SPEC_BOSS, *state))
+
+        self.encode_shields(game.shields, parts)
+        self.encode_invaders(game, parts)
+        moved = self.encode_bullets(game, parts)
+        self.tick += 1
+        self.now = game.scheduler.now
+        body = b''.join(parts)
+        return SPECTATE_FRAME.pack(len(body), self.tick, self.now, SPECTATE_MOVED if moved else 0) + body
+
+    def stress_record(self):
+        name = (self.stress or '').encode('utf-8')
+        return SPECTATE_RECORDS[SPEC_STRESS].pack(SPEC_STRESS, len(name)) + name
+
+    def carve_records(self, index, carves):
+        pack = SPECTATE_RECORDS[SPEC_CARVE].pack
+        return [pack(SPEC_CARVE, index, 0, *carve[1:], 0) if carve[0] == 'crater' else pack(SPEC_CARVE, index, 1, *carve[1:])
+                for carve in carves]
+
+    def encode_shields(self, shields, parts):
+        del self.shields[len(shields):]
+        for index, shield in enumerate(shields):
+            sent = self.shields[index] if index < len(self.shields) else None
+            if sent is not None and sent[0] is shield and sent[1] is not shield.carves:
+                # Restored from a snapshot: carry on if it's the same bunker plus more damage
+                if shield.carves[:sent[2]] == sent[1][:sent[2]]:
+                    sent[1] = shield.carves
+                else:
+                    sent = None
+            if sent is None or sent[0] is not shield:
+                sent = [shield, shield.carves, 0]
+                if index < len(self.shields):
+                    self.shields[index] = sent
+                else:
+                    self.shields.append(sent)
+                parts.append(SPECTATE_RECORDS[SPEC_SHIELD].pack(SPEC_SHIELD, index, *shield.rect.topleft))
+            if len(shield.carves) > sent[2]:
+                parts.extend(self.carve_records(index, shield.carves[sent[2]:]))
+                sent[2] = len(shield.carves)
+
+    def invader_record(self, entry):
+        invader = entry[1]
+        row, col = entry[10] or (SPECTATE_OFF_LATTICE, SPECTATE_OFF_LATTICE)
+        return SPECTATE_RECORDS[SPEC_INVADER].pack(SPEC_INVADER, entry[0], entry[2], entry[3], entry[8], entry[9],
+                                                   invader.type, entry[6], invader.max_health, invader.width,
+                                                   invader.height, entry[7], row, col)
+
+    def lattice_shape_record(self):
+        col_x, row_y = self.lattice_shape
+        return (SPECTATE_RECORDS[SPEC_LATTICE_SHAPE].pack(SPEC_LATTICE_SHAPE, len(row_y), len(col_x))
+                + struct.pack(f'<{len(col_x) + len(row_y)}d', *col_x, *row_y))
+
+    def lattice_record(self, vectors, sent=(None, None, None, None)):
+        """The lattice's position and whichever of its offset vectors differ from sent"""
+        col_x, row_y = self.lattice_shape
+        origin, _ = self.lattice
+        mask = 0
+        values = []
+        for bit, (vector, before) in enumerate(zip(vectors, sent)):
+            if vector != before:
+                mask |= 1 << bit
+                values.extend(vector)
+        return (SPECTATE_RECORDS[SPEC_LATTICE].pack(SPEC_LATTICE, mask, len(row_y), len(col_x), *origin)
+                + struct.pack(f'<{len(values)}d', *values))
+
+    def encode_lattice(self, game, parts):
+        """Lattice records, if FormationMotion moved it this tick; returns whether the viewer will place from it"""
+        motion = game.motion
+        if motion is None:
+            self.lattice_shape = self.lattice = None
+            return False
+        shape = (motion.col_x.tolist(), motion.row_y.tolist())
+        if shape != self.lattice_shape:
+            self.lattice_shape = shape
+            self.lattice = None
+            parts.append(self.lattice_shape_record())
+        origin = (game.formation.x, game.formation.y)
+        vectors = [vector.tolist() for vector in motion.components()]
+        if self.lattice is not None and self.lattice == (origin, vectors):
+            return False
+        sent = self.lattice[1] if self.lattice is not None else (None,) * 4
+        self.lattice = (origin, vectors)
+        parts.append(self.lattice_record(vectors, sent))
+        return True
+
+    def encode_invaders(self, game, parts):
+        records = SPECTATE_RECORDS
+        lattice = []
+        placed = self.encode_lattice(game, lattice)
+        old = self.invaders
+        table = {}
+        existing = []  # (entry, step since last frame, or None where the lattice places it)
+        added = []
+        hits = []
+        cells = []
+        for invader in game.invaders:
+            x, y = invader.x, invader.y
+            cell = None if invader.row is None else (invader.row, invader.col)
+            entry = old.pop(id(invader), None)
+            if entry is None:
+                entry = [self.new_id(), invader, x, y, x, y, invader.health, invader.hit_until,
+                         invader.rect.x, invader.rect.y, cell]
+                added.append(entry)
+            else:
+                if placed and entry[10] is not None:
+                    existing.append((entry, None))
+                else:
+                    # Rounded so a formation moving as one counts as one step despite float noise
+                    existing.append((entry, (round(x - entry[4], 6), round(y - entry[5], 6))))
+                entry[4], entry[5] = x, y
+                if invader.health != entry[6] or invader.hit_until != entry[7]:
+                    entry[6], entry[7] = invader.health, invader.hit_until
+                    hits.append(records[SPEC_HIT].pack(SPEC_HIT, entry[0], entry[6], entry[7]))
+            table[id(invader)] = entry
+        self.invaders = table
+
+        pack = records[SPEC_REMOVE].pack
+        parts.extend([pack(SPEC_REMOVE, entry[0]) for entry in old.values()])
+        parts.extend(lattice)  # After the removals, which may be of cells the new lattice hasn't got
+        if placed:
+            (origin_x, origin_y), (row_dx, col_dx, row_dy, col_dy) = self.lattice
+            col_x, row_y = self.lattice_shape
+        # Whatever the lattice didn't place, the commonest step is sent once for
+        # everyone. The viewer holds float positions just as Invader.update does,
+        # and only invaders it would draw on the wrong pixel are put right one by one.
+        shift = (0.0, 0.0)
+        counts = {}
+        for entry, step in existing:
+            if step is not None and step != (0.0, 0.0):
+                counts[step] = counts.get(step, 0) + 1
+        if counts:
+            step = max(counts, key=counts.get)
+            if counts[step] > 1:
+                shift = step
+                parts.append(records[SPEC_SHIFT].pack(SPEC_SHIFT, *shift))
+        dx, dy = shift
+        pack = records[SPEC_MOVE].pack
+        for entry, step in existing:
+            invader = entry[1]
+            x, y, rect_x, rect_y = entry[2], entry[3], entry[8], entry[9]
+            if step is None:
+                # The same sums as FormationMotion.update, so the viewer lands on the same floats
+                row, col = entry[10]
+                x = (origin_x + col_x[col]) + (row_dx[row] + col_dx[col])
+                y = (origin_y + row_y[row]) + (row_dy[row] + col_dy[col])
+                rect_x, rect_y = rect_coordinate(x), rect_coordinate(y)
+            elif dx or dy:
+                x, y = x + dx, y + dy
+                rect_x, rect_y = rect_coordinate(x), rect_coordinate(y)
+            rect = invader.rect
+            if rect_x != rect.x or rect_y != rect.y:
+                x, y, rect_x, rect_y = entry[4], entry[5], rect.x, rect.y
+                parts.append(pack(SPEC_MOVE, entry[0], x, y, rect_x, rect_y))
+            entry[2], entry[3], entry[8], entry[9] = x, y, rect_x, rect_y
+            cell = None if invader.row is None else (invader.row, invader.col)
+            if cell != entry[10]:
+                entry[10] = cell
+                cells.append(records[SPEC_CELL].pack(SPEC_CELL, entry[0], *(cell or (SPECTATE_OFF_LATTICE,) * 2)))
+        parts.extend(cells)
+        parts.extend([self.invader_record(entry) for entry in added])
+        parts.extend(hits)
+
+    def bullet_record(self, entry):
+        bullet = entry[1]
+        return SPECTATE_RECORDS[SPEC_BULLET].pack(SPEC_BULLET, entry[0], entry[3], bullet.x, entry[2], bullet.speed,
+                                                  *bullet.color[:3])
+
+    def shot_record(self, shot_id, row, color):
+        return SPECTATE_RECORDS[SPEC_SHOT].pack(SPEC_SHOT, shot_id, *row, *color[:3])
+
+    def encode_bullets(self, game, parts):
+        """Bullet records; returns whether bullets moved this tick, which the viewer then does too"""
+        records = SPECTATE_RECORDS
+        old = self.bullets
+        field = game.boss_bullets
+        if field is not self.field:
+            if self.shot_ids is not None and len(self.shot_ids):
+                parts.append(records[SPEC_SHOTS_CLEAR].pack(SPEC_SHOTS_CLEAR))
+            self.field = field
+            self.shot_ids = self.shot_rows = None
+            if field is not None:
+                self.shot_ids = field.ids[:0].copy()
+                self.shot_rows = field.data[:0].copy()
+
+        # Whether this tick moved bullets at all: ask the first one seen last frame too
+        moved = None
+        for bullets in (game.player_bullets, game.invader_bullets):
+            for bullet in bullets:
+                entry = old.get(id(bullet))
+                if entry is not None:
+                    moved = bullet.y != entry[2]
+                    break
+            if moved is not None:
+                break
+        kept = None
+        if field is not None:
+            np = field.np
+            ids = field.ids[:field.count]
+            kept = np.isin(self.shot_ids, ids, assume_unique=True)
+            if moved is None and kept.any():
+                first = int(np.flatnonzero(kept)[0])
+                moved = bool((field.data[int(np.searchsorted(ids, self.shot_ids[first])), 0:2]
+                              != self.shot_rows[first, 0:2]).any())
+        moved = bool(moved)
+
+        table = {}
+        for kind, bullets in ((0, game.player_bullets), (1, game.invader_bullets)):
+            for bullet in bullets:
+                entry = old.pop(id(bullet), None)
+                if entry is None:
+                    entry = [self.new_id(), bullet, bullet.y, kind]
+                    parts.append(self.bullet_record(entry))
+                else:
+                    expected = entry[2] + bullet.speed if moved else entry[2]
+                    if bullet.y != expected:
+                        parts.append(records[SPEC_BULLET_Y].pack(SPEC_BULLET_Y, entry[0], bullet.y))
+                    entry[2] = bullet.y
+                table[id(bullet)] = entry
+        pack = records[SPEC_REMOVE].pack
+        parts.extend([pack(SPEC_REMOVE, entry[0]) for entry in old.values()])
+        self.bullets = table
+
+        if field is not None:
+            view = self.shot_rows
+            if moved and len(view):
+                view[:, 2:4] += view[:, 4:6]  # Exactly what BulletField.update does, so it's exact
+                view[:, 0:2] += view[:, 2:4]
+            pack = records[SPEC_SHOT_GONE].pack
+            parts.extend([pack(SPEC_SHOT_GONE, shot_id) for shot_id in self.shot_ids[~kept].tolist()])
+            rows, colors = field.data[:field.count], field.colors[:field.count]
+            common = int(kept.sum())  # Ids ascend, so survivors come first and new bullets after
+            palette = field.palette
+            strayed = np.flatnonzero((rows[:common] != view[kept]).any(axis=1)).tolist()
+            for index in strayed + list(range(common, field.count)):
+                parts.append(self.shot_record(int(ids[index]), rows[index].tolist(), palette[colors[index]]))
+            self.shot_ids = ids.copy()
+            self.shot_rows = rows.copy()
+        return moved
+
+    def keyframe(self):
+        """A frame rebuilding everything sent so far from nothing, for a viewer joining late"""
+        records = SPECTATE_RECORDS
+        parts = [records[SPEC_RESET].pack(SPEC_RESET)]
+        if self.game is not None:
+            parts.append(records[SPEC_GAME].pack(SPEC_GAME, *self.game))
+        parts.append(self.stress_record())
+        if self.player is not None:
+            parts.append(records[SPEC_PLAYER].pack(SPEC_PLAYER, *self.player))
+        if self.boss is not None:
+            parts.append(records[SPEC_BOSS].pack(SPEC_BOSS, *self.boss))
+        for index, (shield, carves, sent) in enumerate(self.shields):
+            parts.append(records[SPEC_SHIELD].pack(SPEC_SHIELD, index, *shield.rect.topleft))
+            parts.extend(self.carve_records(index, carves[:sent]))
+        if self.lattice_shape is not None:
+            parts.append(self.lattice_shape_record())
+            if self.lattice is not None:
+                parts.append(self.lattice_record(self.lattice[1]))
+        parts.extend([self.invader_record(entry) for entry in self.invaders.values()])
+        parts.extend([self.bullet_record(entry) for entry in self.bullets.values()])
+        if self.field is not None:
+            palette, colors = self.field.palette, self.field.colors
+            # The viewer's copy matches the field as of the last frame, row for row
+            for index, (shot_id, row) in enumerate(zip(self.shot_ids.tolist(), self.shot_rows.tolist())):
+                parts.append(self.shot_record(shot_id, row, palette[colors[index]]))
+        body = b''.join(parts)
+        return SPECTATE_FRAME.pack(len(body), self.tick, self.now, 0) + body
+
+
+class SpectatorStream:
+    """Writes a game's spectator frames to a file and/or to viewers connected on a local TCP port"""
+    def __init__(self, path=None, port=None):
+        self.encoder = SpectatorEncoder()
+        self.file = None
+        self.server = None
+        self.clients = []  # [socket, bytes not yet sent]
+        self.bytes = 0     # Encoded so far, for the bandwidth report
+        if path:
+            self.file = open(path, 'wb')
+            self.file.write(SPECTATE_MAGIC)
+        if port is not None:
+            import socket
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server.bind(('127.0.0.1', port))
+            self.server.listen()
+            self.server.setblocking(False)
+
+    def capture(self, game):
+        """Encode this tick and send it on; call once per frame after Game.update"""
+        frame = self.encoder.encode(game)
+        self.bytes += len(frame)
+        if self.file is not None:
+            self.file.write(frame)
+        if self.server is not None:
+            for client in self.clients[:]:
+                client[1] += frame
+                self.flush(client)
+            self.accept()
+
+    def accept(self):
+        try:
+            conn, _ = self.server.accept()
+        except OSError:
+            return  # Nobody waiting
+        conn.setblocking(False)
+        client = [conn, bytearray(SPECTATE_MAGIC + self.encoder.keyframe())]
+        self.clients.append(client)
+        self.flush(client)
 
-        # Keys that should trigger skipping the logos
-        self.skip_keys = {
-            pygame.K_RETURN, pygame.K_ESCAPE
-        }
+    def flush(self, client):
+        conn, pending = client
+        try:
+            sent = conn.send(pending)
+            del pending[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.drop(client)
+            return
+        if len(pending) > SPECTATE_MAX_BACKLOG:
+            self.drop(client)  # Too slow to keep up; it can reconnect for a fresh keyframe
 
-    def load_logos(self):
-        # Try to load multiple logo images
-        logo_paths = [
-            resource_path("DD Lab1.png"),
-            (resource_path("logo1.png"), resource_path("logo2.jpg")),
-            resource_path("space_invaders.jpg")
-        ]
-        
-        for item in logo_paths:
-            try:
-                # Handle single logos
-                if isinstance(item, str):
-                    logo = pygame.image.load(item)
-                    # Scale logo if needed
-                    max_width = SCREEN_WIDTH * 0.9
-                    max_height = SCREEN_HEIGHT * 0.8
-                    logo_width, logo_height = logo.get_size()
-                    scale = min(max_width / logo_width, max_height / logo_height)
-                    if scale < 1:
-                        logo = pygame.transform.scale(
-                            logo, 
-                            (int(logo_width * scale), int(logo_height * scale)))
-                    self.logos.append([logo])  # Store as single-item list
-                
-                # Handle logo pairs
-                elif isinstance(item, tuple) and len(item) == 2:
-                    logo_pair = []
-                    for path in item:
-                        logo = pygame.image.load(path)
-                        # Scale each logo to fit half the screen
-                        max_width = SCREEN_WIDTH * 0.45
-                        max_height = SCREEN_HEIGHT * 0.8
-                        logo_width, logo_height = logo.get_size()
-                        scale = min(max_width / logo_width, max_height / logo_height)
-                        if scale < 1:
-                            logo = pygame.transform.scale(
-                                logo, 
-                                (int(logo_width * scale), int(logo_height * scale)))
-                        logo_pair.append(logo)
-                    self.logos.append(logo_pair)
-            
-            except Exception as e:
-                pass
-        
-        # If no logos loaded, create text-based ones
-        if not self.logos:
-            font = pygame.font.Font(None, 72)
-            for i in range(3):
-                surf = pygame.Surface((400, 200), pygame.SRCALPHA)
-                text = font.render(f"Desk Devil Labs", True, WHITE)
-                text_rect = text.get_rect(center=(200, 100))
-                surf.blit(text, text_rect)
-                pygame.draw.rect(surf, WHITE, (0, 0, 400, 200), 2)
-                self.logos.append([surf])
-    
-    def update(self):
-        current_time = pygame.time.get_ticks()
-        elapsed = current_time - self.start_time
+    def drop(self, client):
+        self.clients.remove(client)
+        try:
+            client[0].close()
+        except OSError:
+            pass
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for client in self.clients[:]:
+            self.drop(client)
+        if self.server is not None:
+            self.server.close()
+            self.server = None
 
-        # Check for key presses to skip
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return "quit"
-            elif event.type == pygame.KEYDOWN:
-                # Skip only if it's one of our allowed keys
-                if event.key in self.skip_keys:
-                    return True
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                # Also allow skipping with mouse clicks
-                return True
-        
-        # Update fade state
-        if self.fade_state == "in" and current_time >= self.next_logo_time:
-            self.fade_state = "hold"
-            self.next_logo_time = current_time + (self.logo_duration - 2 * self.fade_duration)
-        elif self.fade_state == "hold" and current_time >= self.next_logo_time:
-            self.fade_state = "out"
-            self.next_logo_time = current_time + self.fade_duration
-        elif self.fade_state == "out" and current_time >= self.next_logo_time:
-            self.current_logo += 1
-            if self.current_logo >= len(self.logos):
-                return True
-            self.start_time = current_time
-            self.fade_state = "in"
-            self.next_logo_time = current_time + self.fade_duration
-        
-        return False
-    
-    def draw(self, surface):
-        surface.fill(BLACK)
-        
-        if self.current_logo < len(self.logos):
-            current_time = pygame.time.get_ticks()
-            elapsed = current_time - self.start_time
-            
-            # Calculate alpha based on fade state
-            if self.fade_state == "in":
-                alpha = min(255, int(255 * (elapsed / self.fade_duration)))
-            elif self.fade_state == "out":
-                alpha = max(0, 255 - int(255 * ((current_time - (self.next_logo_time - self.fade_duration)) / self.fade_duration)))
-            else:  # hold
-                alpha = 255
-            
-            # Get current logo(s) - could be single or pair
-            current_logos = self.logos[self.current_logo]
-            
-            # Create a composite surface if multiple logos
-            if len(current_logos) > 1:
-                # Calculate total width and max height
-                total_width = sum(logo.get_width() for logo in current_logos) + 20 * (len(current_logos) - 1)
-                max_height = max(logo.get_height() for logo in current_logos)
-                
-                # Create a temporary surface for the composite
-                composite = pygame.Surface((total_width, max_height), pygame.SRCALPHA)
-                x_offset = 0
-                for logo in current_logos:
-                    composite.blit(logo, (x_offset, (max_height - logo.get_height()) // 2))
-                    x_offset += logo.get_width() + 20
-                
-                # Apply alpha to the composite
-                composite.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
-                composite_rect = composite.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-                surface.blit(composite, composite_rect)
-            
-            else:  # Single logo
-                logo = current_logos[0]
-                temp_surface = pygame.Surface((logo.get_width(), logo.get_height()), pygame.SRCALPHA)
-                temp_surface.blit(logo, (0, 0))
-                temp_surface.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
-                logo_rect = temp_surface.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-                surface.blit(temp_surface, logo_rect)
 
 class Game:
-    def __init__(self):
+    # Optional callable returning the key state; replaces the keyboard when the
+    # game is driven by a script (benchmarks) rather than a player
+    input_source = None
+    pixel_collisions = PIXEL_COLLISIONS
+    formation_patterns = FORMATION_PATTERNS  # Use LEVEL_PATTERNS on the shipped levels
+
+    def __init__(self, endless=False, stress=None, seed=None):
+        self.endless = endless  # Keep generating levels after the last shipped one
+        self.stress = stress    # Name of a STRESS_PRESETS entry to play instead of the levels
+        # Every random choice the simulation makes comes from here, so a snapshot
+        # (or a seed) pins down what happens next; effects use the module's random
+        self.rng = random.Random(seed)
+        # Stress presets are for measuring the engine; recording them would swamp the numbers
+        self.rewind = RewindBuffer() if stress is None else None
+        self.quicksave_blob = None
         self.player = Player()
         self.player_bullets = []
         self.invader_bullets = []
@@ -666,7 +2996,7 @@ class Game:
         self.invader_shoot_delay = 60
         self.level_start_time = 0
         self.show_level_text = False
-        self.level_text_timer = 180  # 3 seconds at 60 FPS
+        self.level_text_duration = 180  # 3 seconds at 60 FPS
         self.paused = False
         self.show_leaderboard = False
         self.show_options = False
@@ -680,7 +3010,16 @@ class Game:
         self.confirmation_buttons = []
         self.show_exit_confirmation = False
         self.death_delay = 120  # 1 second delay at 60 FPS
-        self.death_timer = 0
+        self.death_pending = False  # Death animation over, waiting to show the game over screen
+        # Game-time timers (frames, advanced by update) and wall-clock UI timers (ms)
+        self.scheduler = Scheduler({
+            'death_animation_done': self.death_animation_done,
+            'game_over': self.end_game,
+            'level_text_done': self.level_text_done,
+        })
+        self.ui_timers = Scheduler({'exit': self.allow_exit}, now=pygame.time.get_ticks())
+        self.exit_ready = False
+        self.batch = DrawBatch()  # Bullets, invaders and particles are drawn through this
         
 
     # Level configurations
@@ -708,7 +3047,12 @@ class Game:
             5: {
                 'rows': 6, 'cols': 12, 'types': [3, 3, 4, 4, 5, 5], 'speed': 3.5, 'shoot_chance': 0.025,
                 'name': 'LEVEL 5: BOSS WAVE',
-                'bullets_per_shot': 2
+                'bullets_per_shot': 2,
+                'boss': {'health': 40, 'points': 1000, 'emitters': [
+                    {'pattern': 'ring', 'count': 16, 'every': 110, 'speed': 2.5, 'spin': 0.2},
+                    {'pattern': 'fan', 'count': 5, 'spread': 0.5, 'every': 75, 'speed': 3.5, 'accel': 0.04,
+                     'color': RED},
+                ]}
             },
             6: {
                 'rows': 7, 'cols': 12, 'types': [3, 3, 4, 4, 5, 5], 'speed': 3.7, 'shoot_chance': 0.029,
@@ -733,13 +3077,29 @@ class Game:
             10: {
                 'rows': 9, 'cols': 13, 'types': [4, 4, 4, 5, 5, 5], 'speed': 4.4, 'shoot_chance': 0.035,
                 'name': 'LEVEL 10: GALACTIC SHOWDOWN',
-                'bullets_per_shot': 5
+                'bullets_per_shot': 5,
+                'boss': ENDLESS_BOSS
             }
         }
         
         # Initialize UI elements
         self.init_ui()  
 
+    def get_pressed(self):
+        """Current key state, from the input source if one is set"""
+        if self.input_source is not None:
+            return self.input_source()
+        return pygame.key.get_pressed()
+
+    def get_level_config(self, level=None):
+        """Config for a level: a stress preset, a shipped level or a generated endless one"""
+        level = self.level if level is None else level
+        if self.stress:
+            return STRESS_PRESETS[self.stress]
+        if level in self.level_configs:
+            return self.level_configs[level]
+        return endless_level_config(level)
+
     def init_ui(self):
         button_width = 200
         button_height = 50
@@ -796,70 +3156,148 @@ class Game:
         self.create_invaders()
 
     def toggle_fullscreen(self):
-        global screen, SCREEN_WIDTH, SCREEN_HEIGHT
         self.fullscreen = not self.fullscreen
-        
-        if self.fullscreen:
-            info = pygame.display.Info()
-            screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN)
-        else:
-            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
-        
-        SCREEN_WIDTH, SCREEN_HEIGHT = screen.get_size()
-        self.reposition_ui()
+        app.open_window(self.fullscreen)
 
     def create_invaders(self):
         self.invaders = []
-        config = self.level_configs[self.level]
+        config = self.get_level_config()
+        rows, cols = config['rows'], config['cols']
         
-        for row in range(config['rows']):
-            for col in range(config['cols']):
-                x = 100 + col * 70
-                y = 80 + row * 50
-                
+        # Use the classic 70x50 lattice when it fits, otherwise shrink the whole
+        # formation (spacing and invaders) to fit the current screen
+        scale = min(1, (SCREEN_WIDTH - 200) / ((cols - 1) * 70 + INVADER_WIDTH),
+                    (SCREEN_HEIGHT - 280) / ((rows - 1) * 50 + INVADER_HEIGHT))
+        spacing_x = 70 * scale
+        spacing_y = 50 * scale
+        width = max(2, int(INVADER_WIDTH * scale))
+        height = max(2, int(INVADER_HEIGHT * scale))
+        start_x = min(100, (SCREEN_WIDTH - (cols - 1) * spacing_x - width) / 2)
+        col_x = [int(start_x + col * spacing_x) for col in range(cols)]
+        row_y = [int(80 + row * spacing_y) for row in range(rows)]
+        self.formation = Formation(col_x, row_y, width, height)
+        
+        for row in range(rows):
+            for col in range(cols):
                 type_index = min(row, len(config['types']) - 1)
                 invader_type = config['types'][type_index]
                 
-                self.invaders.append(Invader(x, y, invader_type))
+                invader = Invader(col_x[col], row_y[row], invader_type, width, height)
+                self.invaders.append(invader)
+                self.formation.add(invader, row, col)
+        
+        patterns = config.get('patterns')
+        if patterns is None and self.formation_patterns and self.stress is None:
+            patterns = LEVEL_PATTERNS.get(self.level)
+        self.motion = formation_motion(self.formation, patterns)
+        self.boss, self.boss_bullets = make_boss(config.get('boss'))
+        self.create_shields()
+        self.built_level = (self.stress, self.level)  # Lets restore() reuse this level's objects
         
         self.invader_speed_x = config['speed']
+        self.invader_speed_y = max(1, int(40 * scale))
         self.invader_shoot_chance = config['shoot_chance']
+        self.invader_volley = config.get('volley', 1)
 
-    def reposition_ui(self):
-        button_width = 200
-        button_height = 50
-        center_x = SCREEN_WIDTH // 2 - button_width // 2
-        button_spacing = 70
-        start_y = SCREEN_HEIGHT // 2 - 120
-        
-        # Reposition all buttons
-        self.resume_button.rect = pygame.Rect(center_x, start_y, button_width, button_height)
-        self.leaderboard_button.rect = pygame.Rect(center_x, start_y + button_spacing, button_width, button_height)
-        self.options_button.rect = pygame.Rect(center_x, start_y + button_spacing * 2, button_width, button_height)
-        self.restart_button.rect = pygame.Rect(center_x, start_y + button_spacing * 3, button_width, button_height)
-        self.quit_button.rect = pygame.Rect(center_x, start_y + button_spacing * 4, button_width, button_height)
-                
-        self.back_button.rect = pygame.Rect(center_x, SCREEN_HEIGHT - 60, button_width, button_height)
-        
-        # Add the reset scores button to options position
-        self.reset_scores_button.rect = pygame.Rect(center_x, start_y + button_spacing * 4, button_width, button_height)
-        self.options_back_button.rect = pygame.Rect(center_x, start_y + button_spacing * 5, button_width, button_height)
-        
-        self.start_button.rect = pygame.Rect(center_x, SCREEN_HEIGHT // 2 + 50, button_width, button_height)
-        self.title_leaderboard_button.rect = pygame.Rect(center_x, SCREEN_HEIGHT // 2 + 50 + button_spacing, 
-                                                         button_width, button_height)
-        self.title_options_button.rect = pygame.Rect(center_x, SCREEN_HEIGHT // 2 + 50 + button_spacing * 2,
-                                                     button_width, button_height)
-        self.title_quit_button.rect = pygame.Rect(center_x, SCREEN_HEIGHT // 2 + 50 + button_spacing * 3,
-                                                  button_width, button_height)
-        
-        self.yes_button.rect = pygame.Rect(SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2 + 60, 120, 50)
-        self.no_button.rect = pygame.Rect(SCREEN_WIDTH//2 + 30, SCREEN_HEIGHT//2 + 60, 120, 50)
+    def intercept_bullets(self, dt=1):
+        """Let player and invader bullets that meet this step cancel each other out.
+
+        Invader bullets are sorted by x once (in C); each player bullet then
+        bisects to the few whose x range overlaps its own, so the cost grows
+        with the player's bullets rather than with every pair.
+        """
+        if not self.player_bullets or not self.invader_bullets:
+            return
+        chance = BULLET_INTERCEPT_CHANCE
+        enemies = sorted(self.invader_bullets, key=attrgetter('rect.left'))
+        lefts = [enemy.rect.left for enemy in enemies]
+        widest = max(map(attrgetter('width'), enemies))
+        hits = False
+        for shot in self.player_bullets:
+            first = bisect.bisect_right(lefts, shot.rect.left - widest)
+            last = bisect.bisect_left(lefts, shot.rect.right)
+            for enemy in enemies[first:last]:
+                if enemy.hp <= 0 or enemy.rect.right <= shot.rect.left:
+                    continue
+                # Both move vertically, so sweep one relative to the other
+                if sweep_time(shot.rect, 0, (shot.speed - enemy.speed) * dt, enemy.rect) is None:
+                    continue
+                if chance < 1 and self.rng.random() >= chance:
+                    continue
+                damage = min(shot.hp, enemy.hp)
+                shot.hp -= damage
+                enemy.hp -= damage
+                hits = True
+                if shot.hp <= 0:
+                    break
+        if hits:
+            self.player_bullets = [bullet for bullet in self.player_bullets if bullet.hp > 0]
+            self.invader_bullets = [bullet for bullet in self.invader_bullets if bullet.hp > 0]
+
+    def create_shields(self):
+        """Fresh bunkers, evenly spaced above the player, for each wave"""
+        y = self.player.y - SHIELD_GAP_ABOVE_PLAYER - SHIELD_HEIGHT
+        spacing = SCREEN_WIDTH / (SHIELD_COUNT + 1)
+        self.shields = [Shield(int(spacing * (i + 1) - SHIELD_WIDTH / 2), y) for i in range(SHIELD_COUNT)]
+        self.shield_rects = [shield.rect for shield in self.shields]
+
+    def stop_at_shields(self, bullets, dt):
+        """The bullets that didn't hit a shield this step (those that did carve it)"""
+        band_top, band_bottom = self.shield_rects[0].top, self.shield_rects[0].bottom
+        survivors = []
+        for bullet in bullets:
+            dy = bullet.speed * dt
+            rect = bullet.rect
+            # Most bullets are nowhere near the bunkers' row; skip them with two compares
+            if dy > 0:
+                clear = rect.bottom <= band_top or rect.top - dy >= band_bottom
+            else:
+                clear = rect.bottom - dy <= band_top or rect.top >= band_bottom
+            if clear or not self.hit_shield(bullet, dy):
+                survivors.append(bullet)
+        return survivors
+
+    def stop_field_at_shields(self, field, dt):
+        """Carve shields with, and remove, the field's bullets that hit one this step"""
+        np = field.np
+        bullets = field.data[:field.count]
+        y1 = bullets[:, 1]
+        y0 = y1 - bullets[:, 3] * dt
+        top, bottom = self.shield_rects[0].top, self.shield_rects[0].bottom
+        near = np.flatnonzero((np.minimum(y0, y1) < bottom) & (np.maximum(y0, y1) + field.size > top))
+        stopped = []
+        for index in near.tolist():
+            rect = field.rect(index)
+            dy = field.dy(index, dt)
+            shield_index = rect.union(rect.move(0, -dy)).collidelist(self.shield_rects)
+            if shield_index < 0:
+                continue
+            shield = self.shields[shield_index]
+            impact = shield.impact(rect, dy)
+            if impact is not None:
+                shield.carve(*impact)
+                stopped.append(index)
+        if stopped:
+            field.remove(stopped)
+
+    def hit_shield(self, bullet, dy):
+        """Carve the first shield on bullet's path this step; True if it was stopped"""
+        path = bullet.rect.union(bullet.rect.move(0, -dy)) if dy else bullet.rect
+        index = path.collidelist(self.shield_rects)  # Cheap rect prefilter in C
+        if index < 0:
+            return False
+        shield = self.shields[index]
+        impact = shield.impact(bullet.rect, dy)
+        if impact is None:
+            return False
+        shield.carve(*impact)
+        return True
 
     def handle_events(self):
-        global game_bg_playing, SCREEN_WIDTH, SCREEN_HEIGHT, screen
-        ctrl_pressed = pygame.key.get_pressed()[pygame.K_RCTRL]
-        alt_pressed = pygame.key.get_pressed()[pygame.K_RALT]
+        self.ui_timers.advance_to(pygame.time.get_ticks())
+        keys = self.get_pressed()
+        ctrl_pressed = keys[pygame.K_RCTRL]
+        alt_pressed = keys[pygame.K_RALT]
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -868,18 +3306,14 @@ class Game:
                 self.show_exit_confirmation = True
 
             elif event.type == pygame.VIDEORESIZE:
-                if not self.fullscreen:
-                    SCREEN_WIDTH, SCREEN_HEIGHT = event.size
-                    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
-                    self.reposition_ui()
+                app.note_resize(event.size)
                             
             elif event.type == pygame.KEYDOWN:
                 if self.title_screen:
                     if (event.key == pygame.K_RETURN or event.key == pygame.K_SPACE) and not (self.show_leaderboard or self.show_options):
                         self.title_screen = False
                         self.level_start_time = 0
-                        self.show_level_text = True
-                        self.level_text_timer = 180
+                        self.start_level_text()
                     elif event.key == pygame.K_ESCAPE:
                         if self.show_leaderboard or self.show_options:
                             self.show_leaderboard = False
@@ -895,11 +3329,15 @@ class Game:
                                 bullet_y = self.player.y
                                 self.player_bullets.append(Bullet(bullet_x, bullet_y, -12))
                             if not self.mute_sounds:
-                                laser_sound.play()
+                                app.sfx.play('laser')
                         else:
                             self.shoot_player_bullet()
                     elif event.key == pygame.K_r and (self.game_over or self.won):
                         self.restart_game()
+                    elif event.key == pygame.K_F5 and not (self.paused or self.game_over):
+                        self.quicksave()
+                    elif event.key == pygame.K_F9 and not (self.paused or self.game_over or self.won):
+                        self.quickload()
                     elif event.key == pygame.K_RETURN and self.level_complete and not self.won:
                         self.next_level()
                     elif event.key == pygame.K_ESCAPE:
@@ -912,19 +3350,19 @@ class Game:
                         elif not (self.game_over or self.won or self.level_complete or self.show_level_text):
                             self.paused = True
                         elif self.game_over or self.won:
-                            self.__init__()
+                            self.__init__(self.endless, self.stress)
                             self.title_screen = True
                         elif self.game_over or self.won:
-                            self.__init__()
+                            self.__init__(self.endless, self.stress)
                             self.title_screen = True
                         elif (event.key == pygame.K_RETURN or event.key == pygame.K_SPACE) and self.won:
                             # Return to main menu when won
-                            self.__init__()
+                            self.__init__(self.endless, self.stress)
                             self.title_screen = True
             
             # Handle mouse button down events
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button only
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = app.mouse_pos()
                 
                 # Handle confirmation dialog first if active
                 if self.show_confirmation:
@@ -939,9 +3377,8 @@ class Game:
                 # Handle exit confirmation first if active
                 if self.show_exit_confirmation:
                     if self.yes_button.rect.collidepoint(mouse_pos):
-                        game_bg.stop()
                         self.exit_confirmed = True
-                        self.exit_time = pygame.time.get_ticks()
+                        self.ui_timers.after(1000, 'exit')
                     elif self.no_button.rect.collidepoint(mouse_pos):
                         self.show_exit_confirmation = False
                     continue  # Skip other checks after confirmation
@@ -950,23 +3387,12 @@ class Game:
                 if self.show_options:
                     if self.mute_sounds_button.rect.collidepoint(mouse_pos):
                         self.mute_sounds = not self.mute_sounds_button.toggle()
-                        if self.mute_sounds:
-                            laser_sound.set_volume(0)
-                            explosion_sound.set_volume(0)
-                            game_over_sound.set_volume(0)
-                        else:
-                            laser_sound.set_volume(0.7)
-                            explosion_sound.set_volume(0.8)
-                            game_over_sound.set_volume(0.7)
+                        app.sfx.set_muted(self.mute_sounds)
                     elif self.mute_bgm_button.rect.collidepoint(mouse_pos):
                         self.mute_bgm = not self.mute_bgm_button.toggle()
-                        if self.mute_bgm:
-                            game_bg.set_volume(0)
-                        else:
-                            game_bg.set_volume(0.3)
-                            if not game_bg_playing and not self.title_screen:
-                                game_bg.play(-1)
-                                game_bg_playing = True
+                        app.music.set_muted(self.mute_bgm)
+                        if not self.mute_bgm and not app.music.is_playing('game') and not self.title_screen:
+                            app.music.play('game')
                     elif self.fullscreen_button.rect.collidepoint(mouse_pos):
                         self.toggle_fullscreen()
                         self.fullscreen_button.toggle()
@@ -992,14 +3418,13 @@ class Game:
                     elif self.quit_button.rect.collidepoint(mouse_pos):
                         mute_sounds = self.mute_sounds
                         mute_bgm = self.mute_bgm
-                        self.__init__()
+                        self.__init__(self.endless, self.stress)
                         self.mute_sounds = mute_sounds
                         self.mute_bgm = mute_bgm
                         self.title_screen = True
                         self.paused = False
                         # Stop the BGM when returning to main menu
-                        game_bg.stop()
-                        game_bg_playing = False
+                        app.music.stop(CROSSFADE_MS)
                     continue
                 
                 # Handle title screen buttons
@@ -1007,8 +3432,7 @@ class Game:
                     if not (self.show_leaderboard or self.show_options):
                         if self.start_button.rect.collidepoint(mouse_pos):
                             self.title_screen = False
-                            self.show_level_text = True
-                            self.level_text_timer = 180
+                            self.start_level_text()
                         elif self.title_leaderboard_button.rect.collidepoint(mouse_pos):
                             self.show_leaderboard = True
                             self.show_options = False
@@ -1029,7 +3453,7 @@ class Game:
         return True
         
     def shoot_player_bullet(self):
-        bullets_per_shot = self.level_configs[self.level]['bullets_per_shot']
+        bullets_per_shot = self.get_level_config()['bullets_per_shot']
         
         if bullets_per_shot == 1:
             # Single bullet (default behavior)
@@ -1058,72 +3482,374 @@ class Game:
                 self.player_bullets.append(Bullet(bullet_x, self.player.y, speed_y))
         
         if not self.mute_sounds:
-            laser_sound.play()
+            app.sfx.play('laser')
 
-    def shoot_invader_bullet(self):
-        if self.invaders and random.random() < self.invader_shoot_chance and not self.show_level_text:
-            invader = random.choice(self.invaders)
-            bullet_x = invader.x + invader.width // 2 - 2
-            bullet_y = invader.y + invader.height
-            
-            bullet_speed = 6 + self.level
-            bullet_color = RED if invader.type <= 2 else PURPLE if invader.type <= 4 else ORANGE
-            
-            self.invader_bullets.append(Bullet(bullet_x, bullet_y, bullet_speed, bullet_color))
+    def shoot_invader_bullet(self, dt=1):
+        # Same chance of at least one shot per frame's worth of time, whatever dt is
+        chance = self.invader_shoot_chance if dt == 1 else 1 - (1 - self.invader_shoot_chance) ** dt
+        for _ in range(self.invader_volley):
+            if self.invaders and self.rng.random() < chance and not self.show_level_text:
+                invader = self.rng.choice(self.formation.front_line() or self.invaders)
+                bullet_x = invader.x + invader.width // 2 - 2
+                bullet_y = invader.y + invader.height
+                
+                bullet_speed = 6 + self.level
+                bullet_color = RED if invader.type <= 2 else PURPLE if invader.type <= 4 else ORANGE
+                
+                self.invader_bullets.append(Bullet(bullet_x, bullet_y, bullet_speed, bullet_color,
+                                                   INVADER_BULLET_HP[min(invader.type, 5)]))
             
+    def snapshot(self):
+        """The complete simulation state as a compact binary blob (see restore)"""
+        flags = sum(1 << bit for bit, name in enumerate(SNAPSHOT_FLAGS) if getattr(self, name))
+        player = self.player
+        _, mt_state, gauss = self.rng.getstate()
+        parts = [
+            SNAPSHOT_MAGIC,
+            pack_block((self.stress or '').encode('utf-8')),
+            SNAPSHOT_GAME.pack(self.level, self.score, self.lives, flags, self.invader_direction),
+            SNAPSHOT_PLAYER.pack(player.x, player.hit_until, player.death_ends, player.is_dying,
+                                 player.is_invincible),
+            SNAPSHOT_RNG.pack(*mt_state, gauss is not None, gauss or 0.0),
+        ]
+        # Fixed-size parts go first, since rewind deltas only stay small while offsets line up.
+        # Shield pixels are either solid or clear, so the alpha channel is the whole picture.
+        for shield in self.shields:
+            parts.append(pack_block(pygame.image.tobytes(shield.surface, 'RGBA')[3::4]))
+            parts.append(pack_block(b''.join([
+                SNAPSHOT_CARVE.pack(0, *carve[1:], 0) if carve[0] == 'crater' else SNAPSHOT_CARVE.pack(1, *carve[1:])
+                for carve in shield.carves])))
+        parts.append(pack_block(json.dumps(self.scheduler.state(), separators=(',', ':')).encode('utf-8')))
+
+        formation = self.formation
+        parts.append(SNAPSHOT_FORMATION.pack(formation.x, formation.y, *formation.slack))
+        pack = SNAPSHOT_INVADER.pack
+        parts.append(pack_block(b''.join([pack(*invader.slot, invader.health, invader.hit_until, invader.x, invader.y)
+                                          for invader in self.invaders])))
+        parts.append(pack_block(b''.join([SNAPSHOT_CELL.pack(*invader.slot) for invader in formation.detached])))
+        motion = self.motion
+        parts.append(pack_block(struct.pack('<d', motion.time) + motion.dives.tobytes() if motion else b''))
+
+        boss, field = self.boss, self.boss_bullets
+        parts.append(pack_block(b'' if boss is None else
+                                SNAPSHOT_BOSS.pack(boss.health, boss.hit_until, boss.x, boss.time)
+                                + struct.pack(f'<{2 * len(boss.emitters)}d', *boss.next_volley, *boss.phases)))
+        if field is None:
+            parts.append(pack_block(b''))
+        else:
+            palette = bytes(channel for color in field.palette for channel in color)
+            parts.append(pack_block(struct.pack('<BI', len(field.palette), field.count) + palette
+                                    + field.data[:field.count].tobytes() + field.colors[:field.count].tobytes()))
+
+        pack = SNAPSHOT_BULLET.pack
+        for bullets in (self.player_bullets, self.invader_bullets):
+            parts.append(pack_block(b''.join([pack(bullet.x, bullet.y, bullet.speed, bullet.hp, *bullet.color)
+                                              for bullet in bullets])))
+        return b''.join(parts)
+
+    def restore(self, blob):
+        """Put the simulation back in the state a snapshot() blob recorded.
+
+        The whole blob is read and checked before anything is touched, so a
+        damaged or truncated one raises and leaves the game as it was.
+        """
+        reader = SnapshotReader(blob)
+        stress = reader.block().decode('utf-8') or None
+        if stress is not None and stress not in STRESS_PRESETS:
+            raise ValueError(f"snapshot of unknown stress preset {stress!r}")
+        level, score, lives, flags, direction = reader.unpack(SNAPSHOT_GAME)
+        if level < 1:
+            raise ValueError("snapshot has no level 0")
+        player_state = reader.unpack(SNAPSHOT_PLAYER)
+        rng = reader.unpack(SNAPSHOT_RNG)
+        if rng[624] > 624:
+            raise ValueError("snapshot has a bad random generator state")
+        shield_states = [(reader.block(), reader.records(SNAPSHOT_CARVE)) for _ in self.shields]
+        if any(len(alpha) != SHIELD_WIDTH * SHIELD_HEIGHT for alpha, _ in shield_states):
+            raise ValueError("snapshot shield is the wrong size")
+        clock = json.loads(reader.block())
+        if any(timer[1] not in self.scheduler.handlers for timer in clock['timers']):
+            raise ValueError("snapshot has a timer this game doesn't run")
+        formation_state = reader.unpack(SNAPSHOT_FORMATION)
+        invader_states = reader.records(SNAPSHOT_INVADER)
+        detached = reader.records(SNAPSHOT_CELL)
+        motion_state = reader.block()
+        boss_state = reader.block()
+        field_state = reader.block()
+        bullet_states = [reader.records(SNAPSHOT_BULLET) for _ in range(2)]
+        reader.end()
+
+        # The level the snapshot was taken on has to be able to hold what it recorded
+        config = STRESS_PRESETS[stress] if stress else self.level_configs.get(level) or endless_level_config(level)
+        slots = {(row, col) for row, col, *_ in invader_states}
+        if any(row >= config['rows'] or col >= config['cols'] for row, col in slots):
+            raise ValueError("snapshot invader is outside the formation")
+        if not slots.issuperset(detached):
+            raise ValueError("snapshot detaches an invader it doesn't have")
+        if motion_state and (len(motion_state) - 8) % 56:
+            raise ValueError("snapshot dive table is the wrong size")
+        if boss_state and (not config.get('boss') or len(boss_state) != SNAPSHOT_BOSS.size
+                           + 16 * len(config['boss']['emitters'])):
+            raise ValueError("snapshot boss doesn't match the level")
+        if field_state and (len(field_state) < 5 or len(field_state) != 5 + 3 * field_state[0]
+                            + 52 * struct.unpack_from('<I', field_state, 1)[0]):
+            raise ValueError("snapshot bullet field is the wrong size")
+        positions = [player_state[0]] + [value for state in invader_states for value in state[4:6]]
+        positions += [value for bullets in bullet_states for state in bullets for value in state[:2]]
+        if boss_state:
+            positions.append(SNAPSHOT_BOSS.unpack_from(boss_state)[2])
+        if not all(abs(value) < 2 ** 31 for value in positions):  # Rects can't hold them (NaN fails too)
+            raise ValueError("snapshot has a position no rect can hold")
+
+        self.stress = stress
+        self.level, self.score, self.lives, self.invader_direction = level, score, lives, direction
+        for bit, name in enumerate(SNAPSHOT_FLAGS):
+            setattr(self, name, bool(flags & (1 << bit)))
+        player = self.player
+        player.x, player.hit_until, player.death_ends, player.is_dying, player.is_invincible = player_state
+        player.rect.x = player.x
+        player.death_particles = []  # Cosmetic; not part of the snapshot
+        self.rng.setstate((3, rng[:625], rng[626] if rng[625] else None))
+
+        # Build the level unless it's the one being played; its objects are reused below
+        if self.built_level != (self.stress, self.level):
+            self.create_invaders()
+        for shield, (alpha, carves) in zip(self.shields, shield_states):
+            shield.carves = [('crater', x, y, w) if kind == 0 else ('erase', x, y, w, h)
+                             for kind, x, y, w, h in carves]
+            if alpha == pygame.image.tobytes(shield.surface, 'RGBA')[3::4]:
+                continue  # Unchanged, which is usual when rewinding a frame at a time
+            pixels = bytearray(len(alpha) * 4)
+            pixels[1::4] = alpha  # Standing pixels are GREEN, everything else clear
+            pixels[3::4] = alpha
+            shield.surface = pygame.image.frombytes(bytes(pixels), shield.rect.size, 'RGBA')
+            shield.mask = pygame.mask.from_surface(shield.surface)
+        self.scheduler.restore(clock)
+
+        # Refill the lattice with the snapshot's survivors, reusing the invaders still alive
+        types = config['types']
+        lattice = self.formation
+        formation = Formation(lattice.col_x, lattice.row_y, lattice.width, lattice.height)
+        formation.x, formation.y, *slack = formation_state
+        formation.slack = tuple(slack)
+        existing = {invader.slot: invader for invader in self.invaders}
+        survivors = []
+        for row, col, health, hit_until, x, y in invader_states:
+            invader = existing.get((row, col))
+            if invader is None:  # Shot since the snapshot
+                invader = Invader(x, y, types[min(row, len(types) - 1)], lattice.width, lattice.height)
+            invader.health, invader.hit_until, invader.x, invader.y = health, hit_until, x, y
+            invader.rect.x, invader.rect.y = x, y
+            formation.add(invader, row, col)
+            survivors.append(invader)
+        self.formation = formation
+        self.invaders = survivors
+        by_slot = {invader.slot: invader for invader in survivors}
+        for slot in detached:
+            formation.detach(by_slot[slot])
+
+        if self.motion is not None and motion_state:
+            motion = self.motion
+            motion.formation = formation
+            np = motion.np
+            motion.time, = struct.unpack_from('<d', motion_state)
+            motion.dives = np.frombuffer(motion_state, offset=8).reshape(-1, 7).copy()
+            motion.divers = []
+            for row, col in motion.dives[:, 0:2].tolist():
+                invader = by_slot.get((int(row), int(col)))
+                if invader is None:
+                    # A diver shot this tick has left game.invaders, but its dive stays
+                    # until move_divers next runs and drops dead divers. A dead stand-in
+                    # keeps the dive table lined up with divers until then; it is never
+                    # drawn or hit, since it isn't in game.invaders.
+                    invader = Invader(0, 0, types[min(int(row), len(types) - 1)], lattice.width, lattice.height)
+                    invader.health = 0
+                motion.divers.append(invader)
+            motion.positions = np.array([(invader.x, invader.y) for invader in motion.divers]).reshape(-1, 2)
+
+        if not boss_state:
+            self.boss = None
+        elif self.boss_bullets is not None:
+            if self.boss is None:  # Beaten since the snapshot
+                self.boss = make_boss(config.get('boss'))[0]
+            boss = self.boss
+            boss.health, boss.hit_until, x, boss.time = SNAPSHOT_BOSS.unpack_from(boss_state)
+            boss.x = x
+            boss.rect.x = x
+            timings = struct.unpack_from(f'<{2 * len(boss.emitters)}d', boss_state, SNAPSHOT_BOSS.size)
+            boss.next_volley = list(timings[:len(boss.emitters)])
+            boss.phases = list(timings[len(boss.emitters):])
+        field = self.boss_bullets
+        if field is not None and field_state:
+            np = field.np
+            colors, count = struct.unpack_from('<BI', field_state)
+            offset = 5 + 3 * colors
+            field.palette = [tuple(field_state[i:i + 3]) for i in range(5, offset, 3)]
+            field.count = 0
+            if count > len(field.data):
+                field.data = np.zeros((count, 6))
+                field.colors = np.zeros(count, dtype=np.int32)
+                field.ids = np.zeros(count, dtype=np.int64)
+            field.data[:count] = np.frombuffer(field_state, offset=offset, count=count * 6).reshape(-1, 6)
+            field.colors[:count] = np.frombuffer(field_state, dtype=np.int32, offset=offset + count * 48, count=count)
+            field.ids[:count] = np.arange(field.next_id, field.next_id + count)  # New bullets as far as ids go
+            field.next_id += count
+            field.count = count
+
+        for name, bullets in zip(('player_bullets', 'invader_bullets'), bullet_states):
+            setattr(self, name, [Bullet(x, y, speed, (r, g, b), hp) for x, y, speed, hp, r, g, b in bullets])
+
+    def quicksave(self):
+        """Keep a snapshot to quickload later, and write it out so it survives a restart"""
+        self.quicksave_blob = self.snapshot()
+        try:
+            with open(self.quicksave_path(), 'wb') as f:
+                f.write(self.quicksave_blob)
+        except OSError as e:
+            print(f"Quicksave kept for this run only: {e}", file=sys.stderr)
+
+    def quickload(self):
+        """Go back to the last quicksave, from this run or a saved file; False if there is none"""
+        blob = self.quicksave_blob
+        if blob is None:
+            try:
+                with open(self.quicksave_path(), 'rb') as f:
+                    blob = self.quicksave_blob = f.read()
+            except OSError:
+                return False  # Nothing saved yet
+        try:
+            self.restore(blob)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Quicksave not loaded: {e}", file=sys.stderr)
+            return False  # A file from an older version or a damaged one; the game is untouched
+        if self.rewind is not None:
+            self.rewind.clear()
+        return True
+
+    def quicksave_path(self):
+        return os.path.join(os.path.dirname(self.leaderboard_manager.leaderboard_file), QUICKSAVE_FILE)
+
+    def start_level_text(self):
+        """Show the level's name, hiding it again after level_text_duration frames of play"""
+        self.show_level_text = True
+        self.scheduler.after(self.level_text_duration, 'level_text_done')
+
+    def level_text_done(self):
+        if self.show_level_text:
+            self.show_level_text = False
+            if not self.mute_bgm and not app.music.is_playing('game') and not self.title_screen:
+                app.music.play('game')
+
+    def damage_player(self):
+        """Take a life for a hit; losing the last one starts the death animation"""
+        self.lives -= 1
+        if self.lives > 0:
+            self.player.trigger_hit(self.scheduler.now)
+        else:
+            self.start_death()
+
+    def start_death(self):
+        self.player.trigger_death(self.scheduler.now)
+        self.scheduler.after(self.player.death_duration, 'death_animation_done')
+
+    def death_animation_done(self):
+        self.player.is_dying = False
+        self.death_pending = True
+        self.scheduler.after(self.death_delay, 'game_over')
+        # Add final explosion particles when animation ends
+        for _ in range(50):
+            angle = random.uniform(0, 2 * math.pi)
+            speed = random.uniform(1, 8)
+            size = random.randint(1, 4)
+            lifetime = random.randint(20, 40)
+            self.player.death_particles.append({
+                'x': self.player.x + self.player.width//2,
+                'y': self.player.y + self.player.height//2,
+                'dx': math.cos(angle) * speed,
+                'dy': math.sin(angle) * speed,
+                'size': size,
+                'lifetime': lifetime,
+                'color': random.choice([RED, ORANGE, YELLOW, WHITE])
+            })
+
+    def end_game(self):
+        self.death_pending = False
+        self.game_over = True
+        if not self.mute_sounds:
+            app.sfx.play('game_over')
+
+    def allow_exit(self):
+        self.exit_ready = True
+
     def next_level(self):
-        if self.level < self.max_level:
+        if self.endless or self.level < self.max_level:
             self.level += 1
             self.level_complete = False
             self.player_bullets = []
             self.invader_bullets = []
             self.create_invaders()
-            self.show_level_text = True
-            self.level_text_timer = 180
+            self.start_level_text()
             self.score += 100 * self.level
         else:
             self.won = True
             self.game_over = True
             
-    def update(self):
-        global game_bg_playing
+    def update(self, dt=1):
+        """Step the game, recording each step for rewind; holding Backspace plays the steps backwards"""
+        if self.rewind is None:
+            self.step(dt)
+            return
+        if self.get_pressed()[pygame.K_BACKSPACE] and not (self.title_screen or self.paused or self.show_options
+                                                           or self.show_leaderboard or self.game_over or self.won):
+            blob = self.rewind.pop()
+            if blob is not None:
+                self.restore(blob)
+            return
+        now = self.scheduler.now
+        self.step(dt)
+        if self.scheduler.now != now:
+            self.rewind.push(self.snapshot())
+
+    def step(self, dt=1):
+        """Advance the game by dt frames (1/60 s each).
+
+        Whole frames are simulated one at a time, so step(3) plays out exactly as
+        three step(1) calls: the formation's edge bounce and drop and every random
+        draw happen per frame. Only a fractional remainder is one shorter tick.
+        """
+        while dt >= 1:
+            self.tick(1)
+            dt -= 1
+        if dt > 0:
+            self.tick(dt)
+
+    def tick(self, dt=1):
+        """Advance the game by at most one frame; bullets are swept, so they can't tunnel"""
         if self.title_screen or self.game_over or self.level_complete or self.paused or self.show_leaderboard or self.show_options:
             if self.game_over and not self.score_submitted:
-                if self.leaderboard_manager.is_high_score(self.score):
-                    self.leaderboard_manager.add_score(self.score, self.level)
+                if self.stress is None:  # Stress presets are load tests, not games to rank
+                    self.leaderboard_manager.record_history(self.score, self.level)
+                    if self.leaderboard_manager.is_high_score(self.score):
+                        self.leaderboard_manager.add_score(self.score, self.level)
                 self.score_submitted = True
                 # Stop BGM when game is over
-                game_bg.stop()
-                game_bg_playing = False
+                app.music.stop(CROSSFADE_MS)
+            return
+            
+        # Fire whatever timers came due (death animation, game over, level text)
+        self.scheduler.advance(dt)
+        if self.game_over:
             return
             
-        alt_pressed = pygame.key.get_pressed()[pygame.K_RALT]
+        keys = self.get_pressed()
+        alt_pressed = keys[pygame.K_RALT]
 
-        # Handle death animation
+        # The death animation plays out in Player.draw
         if self.player.is_dying:
-            self.player.death_animation_timer -= 1
-            if self.player.death_animation_timer <= 0:
-                self.death_timer = self.death_delay
-                self.player.is_dying = False
-                # Add final explosion particles when animation ends
-                for _ in range(50):
-                    angle = random.uniform(0, 2 * math.pi)
-                    speed = random.uniform(1, 8)
-                    size = random.randint(1, 4)
-                    lifetime = random.randint(20, 40)
-                    self.player.death_particles.append({
-                        'x': self.player.x + self.player.width//2,
-                        'y': self.player.y + self.player.height//2,
-                        'dx': math.cos(angle) * speed,
-                        'dy': math.sin(angle) * speed,
-                        'size': size,
-                        'lifetime': lifetime,
-                        'color': random.choice([RED, ORANGE, YELLOW, WHITE])
-                    })
             return
                 
         # Handle death delay
-        if self.death_timer > 0:
+        if self.death_pending:
             # Update particles during death delay
             for particle in self.player.death_particles[:]:
                 particle['x'] += particle['dx']
@@ -1131,90 +3857,134 @@ class Game:
                 particle['lifetime'] -= 1
                 if particle['lifetime'] <= 0:
                     self.player.death_particles.remove(particle)
-            
-            self.death_timer -= 1
-            if self.death_timer <= 0:
-                self.game_over = True
-                if not self.mute_sounds:
-                    game_over_sound.play()
             return
             
-        if self.show_level_text:
-            self.level_text_timer -= 1
-            if self.level_text_timer <= 0:
-                self.show_level_text = False
-                if not self.mute_bgm and not game_bg_playing and not self.title_screen:
-                    game_bg.play(-1)
-                    game_bg_playing = True
-            
-        self.player.update(can_move=not self.show_level_text)
+        lives = self.lives  # A tick costs at most one life, however many things hit the ship in it
+        player_x = self.player.rect.x
+        self.player.update(can_move=not self.show_level_text, keys=keys, dt=dt)
+        player_step = self.player.rect.x - player_x
         
-        for bullet in self.player_bullets[:]:
-            bullet.update()
-            if bullet.y < 0:
-                self.player_bullets.remove(bullet)
+        for bullet in self.player_bullets:
+            bullet.update(dt)
                 
-        for bullet in self.invader_bullets[:]:
-            bullet.update()
-            if bullet.y > SCREEN_HEIGHT:
-                self.invader_bullets.remove(bullet)
+        for bullet in self.invader_bullets:
+            bullet.update(dt)
                 
-        if not self.show_level_text and not alt_pressed:
-            move_down = False
-            for invader in self.invaders:
-                invader.update(self.invader_speed_x * self.invader_direction, 0)
-                if invader.x <= 0 or invader.x + invader.width >= SCREEN_WIDTH:
-                    move_down = True
-                    
-            if move_down:
-                self.invader_direction *= -1
+        formation_step = (0, 0)
+        if not self.show_level_text and not alt_pressed and self.invaders:
+            # The lattice origin sweeps and drops as it always has; movement
+            # patterns then place each invader relative to its cell
+            step_x = step_y = 0
+            if self.formation.count:
+                step_x = self.invader_speed_x * self.invader_direction * dt
+                self.formation.move(step_x, 0)
+                left, _, right, _ = self.formation.bounds()
+                if left <= 0 or right >= SCREEN_WIDTH:
+                    self.invader_direction *= -1
+                    step_y = self.invader_speed_y
+                    self.formation.move(0, step_y)
+            formation_step = (step_x, step_y)
+            if self.motion is not None:
+                self.motion.update(self, dt)
+            else:
                 for invader in self.invaders:
-                    invader.update(0, self.invader_speed_y)
+                    invader.update(step_x, step_y)
+                    
+            # Divers that reach the ship crash into it
+            diver = self.motion.crashed(self.player.rect) if self.motion is not None else None
+            if diver is not None and not self.player.is_invincible:
+                diver.health = 0
+                self.invaders.remove(diver)
+                self.formation.discard(diver)
+                if not self.mute_sounds:
+                    app.sfx.play('explosion')
+                self.damage_player()
                 
+        boss_step = 0
         if not alt_pressed:
-            self.shoot_invader_bullet()
+            self.shoot_invader_bullet(dt)
+            if self.boss is not None and not self.show_level_text:
+                boss_x = self.boss.rect.x
+                self.boss.update(self, dt)
+                boss_step = self.boss.rect.x - boss_x
+        if self.boss_bullets is not None and self.boss_bullets.count:
+            self.boss_bullets.update(dt)
+            self.stop_field_at_shields(self.boss_bullets, dt)
+        
+        self.intercept_bullets(dt)
         
+        # Invaders reaching the bunkers wipe out whatever they walk through
+        if self.formation.count and self.formation.bounds()[3] > self.shield_rects[0].top:
+            for invader in self.formation.front_line():
+                index = invader.rect.collidelist(self.shield_rects)
+                if index >= 0:
+                    self.shields[index].erase_rect(invader.rect)
+        
+        # Swept tests: each bullet is checked along the whole path it moved this step.
+        # Shields sit between the player and the formation, so they're tested first.
+        self.player_bullets = self.stop_at_shields(self.player_bullets, dt)
+        self.invader_bullets = self.stop_at_shields(self.invader_bullets, dt)
+        boss = self.boss
         for bullet in self.player_bullets[:]:
-            for invader in self.invaders[:]:
-                if bullet.rect.colliderect(invader.rect):
-                    self.player_bullets.remove(bullet)
-                    if invader.hit():
-                        if not self.mute_sounds:
-                            explosion_sound.play()
-                        self.invaders.remove(invader)
-                        self.score += invader.points
-                    break
-                    
-        for bullet in self.invader_bullets[:]:
-            if bullet.rect.colliderect(self.player.rect) and not self.player.is_invincible:
-                self.invader_bullets.remove(bullet)
-                self.lives -= 1
-                if self.lives > 0:
-                    self.player.trigger_hit()
-                else:
-                    self.player.trigger_death()  # Start death animation instead of immediate game over
-                break
-
-                if self.lives <= 0:
-                    self.game_over = True
+            dy = bullet.speed * dt
+            if boss is not None and sweep_time(bullet.rect, -boss_step, dy, boss.rect) is not None and (
+                    not self.pixel_collisions or mask_touches(
+                        boss.mask(), boss.rect, bullet.rect.union(bullet.rect.move(boss_step, -dy)))):
+                self.player_bullets.remove(bullet)
+                if boss.hit(self.scheduler.now):
+                    if not self.mute_sounds:
+                        app.sfx.play('explosion')
+                    self.score += boss.points
+                    self.boss = boss = None  # Its bullets stay in flight
+                continue
+            invader = self.formation.hit_test(bullet.rect, 0, bullet.speed * dt, formation_step,
+                                              self.pixel_collisions)
+            if invader is not None:
+                self.player_bullets.remove(bullet)
+                if invader.hit(self.scheduler.now):
                     if not self.mute_sounds:
-                        game_over_sound.play()
+                        app.sfx.play('explosion')
+                    self.invaders.remove(invader)
+                    self.formation.discard(invader)
+                    self.score += invader.points
+                    
+        if not self.player.is_invincible and self.lives == lives:
+            for bullet in self.invader_bullets[:]:
+                dy = bullet.speed * dt
+                if sweep_time(bullet.rect, -player_step, dy, self.player.rect) is not None and (
+                        not self.pixel_collisions or mask_touches(
+                            self.player.mask(), self.player.rect,
+                            bullet.rect.union(bullet.rect.move(player_step, -dy)))):
+                    self.invader_bullets.remove(bullet)
+                    self.damage_player()
+                    break
+            
+            if self.lives == lives and self.boss_bullets is not None and self.boss_bullets.count:
+                hits = self.boss_bullets.hits(self.player.rect, player_step, dt).tolist()
+                if hits and self.pixel_collisions:
+                    hits = [index for index in hits if mask_touches(
+                        self.player.mask(), self.player.rect, self.boss_bullets.rect(index))]
+                if hits:
+                    self.boss_bullets.remove(hits)
+                    self.damage_player()
+        
+        # Only now drop bullets that have left the screen, so their last step still counted
+        self.player_bullets = [bullet for bullet in self.player_bullets if bullet.y >= 0]
+        self.invader_bullets = [bullet for bullet in self.invader_bullets if bullet.y <= SCREEN_HEIGHT]
                     
-        if not self.invaders and not self.level_complete and not self.show_level_text:
-            if self.level >= self.max_level:
+        if not self.invaders and self.boss is None and not self.level_complete and not self.show_level_text:
+            if self.level >= self.max_level and not self.endless:
                 self.won = True
                 self.game_over = True
             else:
                 self.level_complete = True
                 
-        for invader in self.invaders:
-            if invader.y + invader.height >= self.player.y and not self.player.is_invincible:
-                self.lives = 0
-                self.player.trigger_death()  # Start death animation
-                break
+        if (self.formation.count and not self.player.is_invincible and not self.player.is_dying
+                and self.formation.bounds()[3] >= self.player.y):
+            self.lives = 0
+            self.start_death()
                 
     def restart_game(self, current_level_only=False):
-        global game_bg_playing
         if current_level_only:
             self.player_bullets = []
             self.invader_bullets = []
@@ -1223,25 +3993,22 @@ class Game:
             self.create_invaders()
             self.game_over = False
             self.level_complete = False
-            self.show_level_text = True
-            self.level_text_timer = 180
+            self.start_level_text()
             # Stop BGM during restart
-            game_bg.stop()
-            game_bg_playing = False
+            app.music.stop(CROSSFADE_MS)
             
         else:
-            self.__init__()
+            self.__init__(self.endless, self.stress)
             self.title_screen = False
-            self.show_level_text = True
-            self.level_text_timer = 180
+            self.start_level_text()
             # Stop BGM during full restart
-            game_bg.stop()
-            game_bg_playing = False
+            app.music.stop(CROSSFADE_MS)
             
     def draw_title_screen(self):
+        screen = app.screen
         screen.fill(BLACK)
         
-        title_font = pygame.font.Font(None, 120)
+        title_font = app.font(120)
         shadow_offset = 5
         shadow_color = (50, 50, 100)
         
@@ -1253,15 +4020,15 @@ class Game:
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4))
         screen.blit(title_text, title_rect)
         
-        subtitle_font = pygame.font.Font(None, 36)
+        subtitle_font = app.font(36)
         subtitle_text = subtitle_font.render("Defeat Them All !", True, WHITE)
         screen.blit(subtitle_text, subtitle_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4 + 80)))
 
-        subtitle_font = pygame.font.Font(None, 28)
+        subtitle_font = app.font(28)
         subtitle_text = subtitle_font.render("Press ENTER/SPACE to start", True, YELLOW)
         screen.blit(subtitle_text, subtitle_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//4 + 120)))
         
-        instr_font = pygame.font.Font(None, 24)
+        instr_font = app.font(24)
         instructions = [
             "Controls:",
             "Arrow Keys or A/D: Move",
@@ -1273,7 +4040,7 @@ class Game:
             text = instr_font.render(line, True, WHITE)
             screen.blit(text, (50, SCREEN_HEIGHT - 150 + i * 30))
     
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.start_button.check_hover(mouse_pos)
         self.title_leaderboard_button.check_hover(mouse_pos)
         self.title_options_button.check_hover(mouse_pos)
@@ -1292,15 +4059,13 @@ class Game:
             self.draw_options_menu()
     
     def draw_pause_menu(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 200))
-        screen.blit(overlay, (0, 0))
+        screen = app.dim(200)
         
-        big_font = pygame.font.Font(None, 72)
+        big_font = app.font(72)
         title = big_font.render("GAME PAUSED", True, WHITE)
         screen.blit(title, title.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 200)))
         
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.resume_button.check_hover(mouse_pos)
         self.leaderboard_button.check_hover(mouse_pos)
         self.options_button.check_hover(mouse_pos)
@@ -1314,15 +4079,13 @@ class Game:
         self.quit_button.draw(screen)
     
     def draw_options_menu(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 200))
-        screen.blit(overlay, (0, 0))
+        screen = app.dim(200)
         
-        big_font = pygame.font.Font(None, 72)
+        big_font = app.font(72)
         title = big_font.render("OPTIONS", True, WHITE)
         screen.blit(title, title.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 200)))
         
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.mute_sounds_button.check_hover(mouse_pos)
         self.mute_bgm_button.check_hover(mouse_pos)
         self.fullscreen_button.check_hover(mouse_pos)
@@ -1339,21 +4102,19 @@ class Game:
             self.draw_confirmation_dialog()
     
     def draw_leaderboard(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 220))
-        screen.blit(overlay, (0, 0))
+        screen = app.dim(220)
         
-        big_font = pygame.font.Font(None, 72)
+        big_font = app.font(72)
         title = big_font.render("LEADERBOARD", True, CYAN)
         screen.blit(title, title.get_rect(center=(SCREEN_WIDTH//2, 100)))
 
         # Check if this is a new high score and show message if it is
         if self.game_over and self.is_new_high_score():
-            high_score_font = pygame.font.Font(None, 48)
+            high_score_font = app.font(48)
             high_score_text = high_score_font.render("NEW HIGH SCORE!", True, YELLOW)
             screen.blit(high_score_text, high_score_text.get_rect(center=(SCREEN_WIDTH//2, 160)))
             
-        header_font = pygame.font.Font(None, 48)
+        header_font = app.font(48)
         rank_header = header_font.render("RANK", True, YELLOW)
         score_header = header_font.render("SCORE", True, YELLOW)
         level_header = header_font.render("LEVEL", True, YELLOW)
@@ -1367,7 +4128,7 @@ class Game:
         
         pygame.draw.line(screen, WHITE, (150, header_y + 50), (SCREEN_WIDTH - 150, header_y + 50), 2)
         
-        score_font = pygame.font.Font(None, 36)
+        score_font = app.font(36)
         scores = self.leaderboard_manager.get_top_scores()
         
         if not scores:
@@ -1392,17 +4153,15 @@ class Game:
                 screen.blit(level_text, (550, y_pos))
                 screen.blit(date_text, (700, y_pos))
         
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.back_button.check_hover(mouse_pos)
         self.back_button.draw(screen)
         
     def draw_confirmation_dialog(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 220))
-        screen.blit(overlay, (0, 0))
+        screen = app.dim(220)
         
         # Calculate required width based on text
-        confirm_font = pygame.font.Font(None, 48)
+        confirm_font = app.font(48)
         confirm_text = confirm_font.render("Are you sure you want to reset all scores?", True, WHITE)
         text_width = confirm_text.get_width()
         
@@ -1438,7 +4197,7 @@ class Game:
         self.yes_button.rect = pygame.Rect(button_start_x, SCREEN_HEIGHT//2 + 60, 120, 50)
         self.no_button.rect = pygame.Rect(button_start_x + 120 + button_spacing, SCREEN_HEIGHT//2 + 60, 120, 50)
         
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.yes_button.check_hover(mouse_pos)
         self.no_button.check_hover(mouse_pos)
         
@@ -1446,6 +4205,7 @@ class Game:
         self.no_button.draw(screen)
     
     def draw_exit_confirmation(self):
+        screen = app.screen
         # Check if confirmation was already given
         if hasattr(self, 'exit_confirmed') and self.exit_confirmed:
             # Initialize starfield if not already done
@@ -1460,8 +4220,7 @@ class Game:
                     ])
             
             # Show thank you messages and exit after delay
-            current_time = pygame.time.get_ticks()
-            if current_time - self.exit_time >= 1000:  
+            if self.exit_ready:
                 return "exit"
             
             # Solid black background
@@ -1477,18 +4236,16 @@ class Game:
                         
             return
         
-        # Create a new overlay surface that will cover everything
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 250))
-        screen.blit(overlay, (0, 0))
+        # Darken everything behind the dialog
+        screen = app.dim(250)
         
         # Draw confirmation dialog
-        confirm_font = pygame.font.Font(None, 48)
+        confirm_font = app.font(48)
         confirm_text = confirm_font.render("Are you sure you want to exit?", True, WHITE)
         
         screen.blit(confirm_text, confirm_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 40)))
         
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = app.mouse_pos()
         self.yes_button.check_hover(mouse_pos)
         self.no_button.check_hover(mouse_pos)
         
@@ -1498,18 +4255,18 @@ class Game:
     def draw(self, screen):
         exit_signal = None  
         screen.fill(BLACK)
-        font = pygame.font.Font(None, 36)
-        big_font = pygame.font.Font(None, 72)
+        font = app.font(36)
+        big_font = app.font(72)
 
+        batch = self.batch
         # Draw particles first (so they appear behind other elements)
-        if self.player.is_dying or (self.death_timer > 0 and self.player.death_particles):
-            for particle in self.player.death_particles:
-                pygame.draw.circle(
-                    screen, 
-                    particle['color'],
-                    (int(particle['x']), int(particle['y'])),
-                    particle['size']
-                )
+        if self.player.is_dying or (self.death_pending and self.player.death_particles):
+            batch.add('particles', [
+                (particle_sprite(particle['color'], particle['size']),
+                 (int(particle['x']) - particle['size'], int(particle['y']) - particle['size'],
+                  particle['size'] * 2 + 1, particle['size'] * 2 + 1))
+                for particle in self.player.death_particles])
+            screen = batch.flush(screen)
         
         # Draw game elements first (only if no overlays are active)
         if not (self.show_level_text or self.level_complete or self.game_over or self.paused or 
@@ -1517,56 +4274,64 @@ class Game:
             
             # Draw player unless in death animation (it draws itself during death)
             if not self.player.is_dying:
-                self.player.draw(screen)
-                
-            for bullet in self.player_bullets:
-                bullet.draw(screen)
-                
-            for bullet in self.invader_bullets:
-                bullet.draw(screen)
-                
-            for invader in self.invaders:
-                invader.draw(screen)
-                
-            # Draw HUD elements
-            score_text = font.render(f'Score: {self.score}', True, WHITE)
-            lives_text = font.render(f'Lives: {self.lives}', True, WHITE)
-            level_text = font.render(f'Level: {self.level}/{self.max_level}', True, WHITE)
-            screen.blit(score_text, (20, 20))
-            screen.blit(lives_text, (20, 60))
-            screen.blit(level_text, (20, 100))
+                self.player.draw(screen, self.scheduler.now)
+            
+            solid = batch.solid
+            batch.add('bullets', [(solid(bullet.color, bullet.rect.size), bullet.rect)
+                                  for bullet in self.player_bullets])
+            batch.add('bullets', [(solid(bullet.color, bullet.rect.size), bullet.rect)
+                                  for bullet in self.invader_bullets])
+            if self.boss_bullets is not None:
+                batch.add('bullets', self.boss_bullets.draw_commands())
+            batch.add('shields', [(shield.surface, shield.rect) for shield in self.shields])
+            now = self.scheduler.now
+            batch.add('invaders', [(invader.sprite(now), invader.rect) for invader in self.invaders])
+            if self.boss is not None:
+                batch.add('invaders', [(self.boss.sprite(now), self.boss.rect)])
+
+            # Draw HUD elements; app.text keeps them rendered, so they batch like sprites
+            if self.endless:
+                level_label = f'Level: {self.level}'
+            else:
+                level_label = f'Level: {self.level}/{self.max_level}'
+            labels = [(app.text(36, f'Score: {self.score}', WHITE), (20, 20)),
+                      (app.text(36, f'Lives: {self.lives}', WHITE), (20, 60)),
+                      (app.text(36, level_label, WHITE), (20, 100))]
             
             # Show "HIT!" message when player is hit
-            if self.player.is_hit:
-                hit_text = font.render("HIT!", True, RED)
-                screen.blit(hit_text, (self.player.x + self.player.width//2 - 20, self.player.y - 30))
+            if self.player.is_hit(self.scheduler.now):
+                labels.append((app.text(36, "HIT!", RED),
+                               (int(self.player.x) + self.player.width//2 - 20, self.player.y - 30)))
             
-            control_font = pygame.font.Font(None, 24)
             controls = [
                 "Arrow Keys / AD: Move",
                 "SPACE: Shoot",
-                "ESC: Pause"
+                "ESC: Pause",
+                "F5/F9: Save/Load",
+                "BACKSPACE: Rewind"
             ]
             for i, control in enumerate(controls):
-                text = control_font.render(control, True, WHITE)
-                screen.blit(text, (SCREEN_WIDTH - 200, 20 + i * 25))
+                labels.append((app.text(24, control, WHITE), (SCREEN_WIDTH - 200, 20 + i * 25)))
+            batch.add('hud', [(text, text.get_rect(topleft=pos)) for text, pos in labels])
+            screen = batch.flush(screen)
+            
+            if self.boss is not None:
+                # Health bar under the boss
+                bar = pygame.Rect(self.boss.rect.x, self.boss.rect.bottom + 4, self.boss.width, 6)
+                pygame.draw.rect(screen, DARK_GRAY, bar)
+                pygame.draw.rect(screen, RED, (bar.x, bar.y, bar.width * self.boss.health // self.boss.max_health,
+                                               bar.height))
         
         # Draw overlay screens
         if self.show_level_text:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(180)
-            overlay.fill(BLACK)
-            screen.blit(overlay, (0, 0))
+            screen = app.dim(180)
             
-            level_name = self.level_configs[self.level]['name']
+            level_name = self.get_level_config()['name']
             level_intro_text = big_font.render(level_name, True, CYAN)
             screen.blit(level_intro_text, level_intro_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2)))
             
         elif self.level_complete and not self.won:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            screen.blit(overlay, (0, 0))
+            screen = app.dim(128)
             
             complete_text = big_font.render('LEVEL COMPLETE!', True, GREEN)
             bonus_text = font.render(f'Bonus: {100 * self.level} points', True, YELLOW)
@@ -1577,10 +4342,7 @@ class Game:
             screen.blit(continue_text, continue_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 60)))
             
         elif self.game_over:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            overlay.set_alpha(128)
-            overlay.fill(BLACK)
-            screen.blit(overlay, (0, 0))
+            screen = app.dim(128)
             
             if self.won:
                 game_over_text = big_font.render('YOU WON', True, RED)
@@ -1629,7 +4391,7 @@ class Game:
         
         return exit_signal
 
-def star_wars_intro(screen, duration_seconds=11):
+def star_wars_intro(screen, duration_seconds=11, fps=60, max_frames=None):
     # Star Wars intro crawl
     intro_text = [
         "SPACE INVADERS",
@@ -1648,16 +4410,14 @@ def star_wars_intro(screen, duration_seconds=11):
     ]
     
     # Set up the crawl
-    pygame.mixer.music.load(resource_path("space_invader_title.wav"))  # You'll need this file
-    pygame.mixer.music.set_volume(0.5)
-    pygame.mixer.music.play()
+    app.music.play('title', loops=0)
     
     # Create a surface for the text with per-pixel alpha
     text_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT * 3), pygame.SRCALPHA)
     
     # Render the text
-    font_large = pygame.font.Font(None, 80)
-    font_small = pygame.font.Font(None, 48)
+    font_large = app.font(80)
+    font_small = app.font(48)
     y_pos = SCREEN_HEIGHT  # Start below the visible screen
     
     for i, line in enumerate(intro_text):
@@ -1688,15 +4448,22 @@ def star_wars_intro(screen, duration_seconds=11):
     crawl_pos = 0
     running = True
     start_time = pygame.time.get_ticks()  # Get the start time in milliseconds
+    frames = 0
     
     while running:
+        # Benchmarks run a fixed number of unthrottled frames
+        frames += 1
+        if max_frames is not None and frames > max_frames:
+            app.music.stop(CROSSFADE_MS)
+            return
+        
         current_time = pygame.time.get_ticks()
         elapsed_seconds = (current_time - start_time) / 1000  # Convert to seconds
         
         # Exit if duration is reached
         if elapsed_seconds >= duration_seconds:
             running = False
-            pygame.mixer.music.stop()
+            app.music.stop(CROSSFADE_MS)
             return
         
         for event in pygame.event.get():
@@ -1707,7 +4474,7 @@ def star_wars_intro(screen, duration_seconds=11):
                 # Check for specific keys to skip
                 if (event.key == pygame.K_RETURN):  
                     running = False
-                    pygame.mixer.music.stop()
+                    app.music.stop(CROSSFADE_MS)
                     return
         
         # Update star positions
@@ -1737,28 +4504,25 @@ def star_wars_intro(screen, duration_seconds=11):
         # Draw the text surface (scrolling up) with transparency
         screen.blit(text_surface, (0, -crawl_pos))
         
-        pygame.display.flip()
-        clock.tick(60)
+        app.present()
+        app.music.update()
+        clock.tick(fps)
         
         # Update crawl position
         crawl_pos += 2
         if crawl_pos > SCREEN_HEIGHT * 2 + y_pos:
             running = False
-            pygame.mixer.music.stop()
+            app.music.stop(CROSSFADE_MS)
 
-def show_exit_credits():
+def show_exit_credits(fps=FPS, max_frames=None):
     """Display exit credits sequence with scrolling credits and dedicated outro music"""
+    screen = app.screen
     # Stop any currently playing sounds
-    pygame.mixer.stop()
+    if pygame.mixer.get_init():
+        pygame.mixer.stop()
     
-    # Load outro music (replace with your actual file path)
-    outro_music_path = resource_path("outro_music.wav")  # or .ogg
-    try:
-        outro_music = pygame.mixer.Sound(outro_music_path)
-        outro_music.set_volume(0.7)  # Adjust volume as needed
-        outro_music.play(loops=-1)  # Loop indefinitely
-    except:
-        outro_music = None
+    # Fade from the game music into the outro, streamed from disk
+    app.music.play('outro')
     
     # Initialize parameters
     rolling_text_y = SCREEN_HEIGHT  # Start below screen
@@ -1767,7 +4531,7 @@ def show_exit_credits():
     start_time = pygame.time.get_ticks()
     
     # Define credits content
-    credit_font = pygame.font.Font(None, 32)
+    credit_font = app.font(32)
     credits = [
         "SPACE INVADERS",
         "",
@@ -1802,39 +4566,41 @@ def show_exit_credits():
         
     # Main loop
     running = True
+    frames = 0
     while running:
         current_time = pygame.time.get_ticks()
         elapsed = current_time - start_time
         
+        # Benchmarks run a fixed number of unthrottled frames
+        frames += 1
+        if max_frames is not None and frames > max_frames:
+            app.music.stop()
+            return "quit"
+        
         # Check if total duration has been reached
         if elapsed >= total_duration:
-            if outro_music:
-                outro_music.stop()
+            app.music.stop()
             return "quit"
         
         # Handle events (allow skipping only for specific keys)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                if outro_music:
-                    outro_music.stop()
+                app.music.stop()
                 return "quit"
             elif event.type == pygame.KEYDOWN:
                 # Skip only if it's one of our allowed keys
                 if event.key in skip_keys:
-                    if outro_music:
-                        outro_music.stop()
+                    app.music.stop()
                     return "quit"
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 # Also allow skipping with mouse clicks
-                if outro_music:
-                    outro_music.stop()
+                app.music.stop()
                 return "quit"
         
         # Update credits scrolling
         rolling_text_y -= rolling_text_speed
         if rolling_text_y < -2000:  # End when credits scroll past
-            if outro_music:
-                outro_music.stop()
+            app.music.stop()
             return "quit"
         
         # Draw everything
@@ -1849,18 +4615,276 @@ def show_exit_credits():
                 screen.blit(text, text_rect)
             y_pos += 40
         
-        pygame.display.flip()
-        clock.tick(FPS)
+        app.present()
+        app.music.update()
+        app.clock.tick(fps)
     
     # Clean up music if we exit early
-    if outro_music:
-        outro_music.stop()
+    app.music.stop()
     return 'quit'
 
-def main():
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
-    pygame.display.set_caption('Space Invaders')
+# Leaderboard analytics (no window needed)
+REPORT_CHUNK_SIZE = 64 * 1024     # Bytes read from a data file at a time
+REPORT_MAX_RECORD_SIZE = 64 * 1024  # Give up on a file if one record is larger than this
+REPORT_SAMPLE_SIZE = 10000        # Scores kept for percentiles (exact below this count)
+
+
+def iter_score_records(path):
+    """Yield score entries one at a time from a leaderboard (.json) or history (.jsonl) file"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    with open(path, 'r') as f:
+        while True:
+            chunk = f.read(REPORT_CHUNK_SIZE)
+            buffer += chunk
+            pos = 0
+            while True:
+                # Skip array brackets, separators and whitespace between records
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                try:
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # Record continues in the next chunk
+                if (isinstance(record, dict) and isinstance(record.get('score'), int)
+                        and isinstance(record.get('level'), int) and isinstance(record.get('date'), str)):
+                    yield record
+            buffer = buffer[pos:]
+            if not chunk or len(buffer) > REPORT_MAX_RECORD_SIZE:
+                return  # End of file, or a corrupt tail we can't make sense of
+
+
+def find_score_files(paths):
+    """Expand files and directories into the list of score data files to read"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.json', '.jsonl')):
+                    files.append(os.path.join(path, name))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+
+class ScoreReport:
+    """Running aggregates over a stream of score entries, using constant memory per key"""
+    def __init__(self, top_k=10, since=None, until=None, sample_size=REPORT_SAMPLE_SIZE):
+        self.top_k = top_k
+        self.since = since
+        self.until = until
+        self.sample_size = sample_size
+        self.count = 0
+        self.by_day = {}    # day -> [games, total score, best score]
+        self.by_level = {}  # level -> [games, total score, best score]
+        self.sample = []    # Reservoir sample of scores for percentiles
+        self.top = []       # Min-heap of (score, level, order, date)
+        self.rng = random.Random(0)
+
+    def add(self, entry):
+        """Fold one entry into the report, skipping it if it's outside the date range"""
+        day = entry['date'][:10]
+        if (self.since and day < self.since) or (self.until and day > self.until):
+            return
+        score = entry['score']
+        self.count += 1
+        
+        for table, key in ((self.by_day, day), (self.by_level, entry['level'])):
+            stats = table.setdefault(key, [0, 0, score])
+            stats[0] += 1
+            stats[1] += score
+            stats[2] = max(stats[2], score)
+        
+        if len(self.sample) < self.sample_size:
+            self.sample.append(score)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < self.sample_size:
+                self.sample[slot] = score
+        
+        item = (score, entry['level'], -self.count, entry['date'])
+        if len(self.top) < self.top_k:
+            heapq.heappush(self.top, item)
+        elif item > self.top[0]:
+            heapq.heapreplace(self.top, item)
+
+    def percentiles(self, ranks):
+        """Nearest-rank percentiles of the scores seen so far"""
+        ordered = sorted(self.sample)
+        result = {}
+        for rank in ranks:
+            if ordered:
+                index = max(0, min(len(ordered) - 1, math.ceil(rank / 100 * len(ordered)) - 1))
+                result[f"p{rank:g}"] = ordered[index]
+        return result
+
+    def to_dict(self, ranks):
+        """Return the finished report as plain JSON-friendly data"""
+        def rows(table):
+            return [{'key': key, 'games': games, 'mean': round(total / games, 1), 'best': best}
+                    for key, (games, total, best) in sorted(table.items())]
+        
+        top = sorted(self.top, reverse=True)
+        return {
+            'records': self.count,
+            'by_day': rows(self.by_day),
+            'by_level': rows(self.by_level),
+            'percentiles': self.percentiles(ranks),
+            'top': [{'rank': i + 1, 'score': score, 'level': level, 'date': date}
+                    for i, (score, level, _, date) in enumerate(top)]
+        }
+
+
+def write_report(report, out, fmt):
+    """Write a report dict to an open text file as JSON or CSV"""
+    if fmt == 'json':
+        json.dump(report, out, indent=2)
+        out.write("\n")
+        return
+    
+    writer = csv.writer(out)
+    writer.writerow(['section', 'key', 'games', 'mean', 'score', 'level', 'date'])
+    for section in ('by_day', 'by_level'):
+        for row in report[section]:
+            writer.writerow([section, row['key'], row['games'], row['mean'], row['best'], '', ''])
+    for name, score in report['percentiles'].items():
+        writer.writerow(['percentile', name, '', '', score, '', ''])
+    for row in report['top']:
+        writer.writerow(['top', row['rank'], '', '', row['score'], row['level'], row['date']])
+
+
+def leaderboard_report_main(argv):
+    """Command line entry point: python space_invaders.py stats [options] [files or dirs]"""
+    parser = argparse.ArgumentParser(prog="space_invaders.py stats",
+                                     description="Summarise leaderboard and score history files")
+    parser.add_argument('paths', nargs='*',
+                        help="Data files or directories (default: this machine's score history)")
+    parser.add_argument('--since', help="First day to include (YYYY-MM-DD)")
+    parser.add_argument('--until', help="Last day to include (YYYY-MM-DD)")
+    parser.add_argument('--top', type=int, default=10, help="Number of top scores to list")
+    parser.add_argument('--percentiles', default="50,90,99",
+                        help="Comma separated percentiles to report")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--output', help="Write the report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    
+    paths = args.paths
+    if not paths:
+        # The history logs every game, top-10 ones included, so adding the leaderboard would count those twice
+        paths = [LeaderboardManager(load=False).history_file]
+    
+    ranks = [float(rank) for rank in args.percentiles.split(',') if rank.strip()]
+    report = ScoreReport(top_k=args.top, since=args.since, until=args.until)
+    for path in find_score_files(paths):
+        try:
+            for entry in iter_score_records(path):
+                report.add(entry)
+        except OSError as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+    
+    if args.output:
+        with open(args.output, 'w', newline='') as out:
+            write_report(report.to_dict(ranks), out, args.format)
+    else:
+        write_report(report.to_dict(ranks), sys.stdout, args.format)
+    return 0
+
+def calibrate_audio(shots=40, fps=FPS, out=sys.stdout):
+    """Fire the player's gun from synthetic SPACE presses and time each press to its laser starting.
+
+    Presses land at random points within a frame, as real ones do, and go through
+    the same handle_events -> shoot_player_bullet -> SoundEffects path as play.
+    The reported total adds the mixer buffer, which is what delays the sound
+    after the mixer has started it.
+    """
+    if not app.init_mixer():
+        print("audio calibration: no audio device", file=out)
+        return 1
+    app.sound('laser')  # Decode up front so it isn't measured
+    game = Game()
+    game.title_screen = False
+    game.show_level_text = False
+    game.create_invaders()
+    frame = 1.0 / fps
+    jitter = random.Random(0)
+    delays = []
+    for _ in range(shots):
+        game.player_bullets.clear()
+        time.sleep(jitter.random() * frame)  # Key arrives part-way through the previous frame
+        pressed = time.perf_counter()
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0, unicode=' ', scancode=0))
+        app.clock.tick(fps)  # Wait for the next frame, as the main loop would
+        game.handle_events()
+        game.update()
+        app.sfx.flush()
+        started = app.sfx.start_times.get('laser', 0)
+        if started >= pressed:
+            delays.append((started - pressed) * 1000)
+        game.draw(app.screen)
+        app.present()
+
+    if not delays:
+        print("audio calibration: the laser never started", file=out)
+        return 1
+    delays.sort()
+    settings = app.audio_settings
+    buffer_ms = app.audio_latency_ms()
+    median = delays[len(delays) // 2]
+    print(f"mixer: {settings['frequency']} Hz, {settings['channels']} channel(s), "
+          f"buffer {settings['buffer']} frames ({buffer_ms:.1f} ms)", file=out)
+    print(f"keypress -> mixer start: min {delays[0]:.1f} ms, median {median:.1f} ms, "
+          f"max {delays[-1]:.1f} ms over {len(delays)} shots", file=out)
+    print(f"estimated keypress -> audible: {median + buffer_ms:.1f} ms", file=out)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="space_invaders.py")
+    parser.add_argument('--endless', action='store_true',
+                        help="Keep generating harder levels after level 10")
+    parser.add_argument('--stress', choices=sorted(STRESS_PRESETS),
+                        help="Play a stress preset with thousands of invaders and bullets")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="Print how long each startup stage took")
+    parser.add_argument('--pixel-collisions', action='store_true',
+                        help="Bullets must touch the drawn figure of an invader or the ship, not just its box")
+    parser.add_argument('--formation-patterns', action='store_true',
+                        help="Levels 3-10 sway, breathe and dive-bomb; a diver reaching the ship costs a life")
+    parser.add_argument('--renderer', choices=RENDERERS,
+                        help="sdl2 draws sprites, overlays and fades with GPU textures (falls back to software); "
+                             "the default is software, or sdl2 with --render-scale")
+    parser.add_argument('--render-scale', type=float, default=RENDER_SCALE,
+                        help="Draw frames at this fraction of 1366x720 and let SDL stretch them to the window, "
+                             "e.g. 0.5 on slow GPUs (sdl2 renderer)")
+    parser.add_argument('--audio-buffer', type=int, help="Mixer buffer size in sample frames")
+    parser.add_argument('--audio-frequency', type=int, help="Mixer sample rate in Hz")
+    parser.add_argument('--audio-channels', type=int, choices=(1, 2), help="Mono or stereo output")
+    parser.add_argument('--calibrate-audio', action='store_true',
+                        help="Measure keypress-to-sound latency for the player's shot and exit")
+    parser.add_argument('--spectate-file', metavar='PATH',
+                        help="Record a spectator stream to PATH (play it back with spectator.py replay)")
+    parser.add_argument('--spectate-port', type=int, metavar='PORT',
+                        help="Serve a spectator stream on localhost:PORT (watch with spectator.py watch)")
+    args = parser.parse_args(argv)
+    if not 0 < args.render_scale <= 1:
+        parser.error("--render-scale must be above 0 and at most 1")
+    if args.render_scale < 1 and args.renderer == 'software':
+        parser.error("--render-scale needs the sdl2 renderer")
+    app.configure_audio(args.audio_frequency, args.audio_buffer, args.audio_channels)
+    
+    if args.calibrate_audio:
+        app.open_window()
+        sys.exit(calibrate_audio())
+    
+    # Open the window first; sounds decode in the background while the logos show
+    Game.pixel_collisions = args.pixel_collisions or PIXEL_COLLISIONS
+    Game.formation_patterns = args.formation_patterns or FORMATION_PATTERNS
+    app.renderer = args.renderer or ('sdl2' if args.render_scale < 1 else 'software')
+    app.render_scale = args.render_scale
+    screen = app.open_window(fullscreen=True)
+    app.preload_sounds()
     
     # Show logos first
     logo_screen = LogoScreen()
@@ -1874,26 +4898,36 @@ def main():
             logo_done = True
         
         logo_screen.draw(screen)
-        pygame.display.flip()
-        clock.tick(FPS)
+        app.present()
+        if 'first_frame' not in app.timings:
+            app.mark('first_frame')
+            app.startup_report(always=args.startup_report)
+        app.clock.tick(FPS)
     
     # Show Star Wars intro after logos
     star_wars_intro(screen)
     
-    game = Game()
+    game = Game(endless=args.endless, stress=args.stress)
+    spectators = None
+    if args.spectate_file or args.spectate_port is not None:
+        spectators = SpectatorStream(args.spectate_file, args.spectate_port)
     running = True
     
     while running:
         running = game.handle_events()
         game.update()
+        if spectators is not None:
+            spectators.capture(game)
+        app.sfx.flush()  # Before drawing, so a shot is heard without waiting for the frame
         
         # Check for exit signal from draw method
-        exit_signal = game.draw(screen)
+        exit_signal = game.draw(app.screen)
         if exit_signal == "exit":
             running = False
 
-        pygame.display.flip()
-        clock.tick(FPS)
+        app.present()
+        app.music.update()
+        app.clock.tick(FPS)
         
         # Check if we should show exit credits (only after game is won and player has seen the message)
         if hasattr(game, 'exit_confirmed') and game.exit_confirmed:
@@ -1906,8 +4940,15 @@ def main():
                 show_exit_credits()
                 running = False
     
+    if spectators is not None:
+        spectators.close()
     pygame.quit()
     sys.exit()
 
+_IMPORT_DONE = time.perf_counter()
+app = App()
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if sys.argv[1:2] == ['stats']:
+        sys.exit(leaderboard_report_main(sys.argv[2:]))
+    main(sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,373 @@
+"""Watch a Space Invaders game from its spectator stream, live or recorded.
+
+    python space_invaders.py --spectate-file game.spec   # record while playing
+    python spectator.py replay game.spec --speed 2
+    python space_invaders.py --spectate-port 7780        # serve viewers while playing
+    python spectator.py watch 7780
+    python spectator.py info game.spec                   # frame sizes, bandwidth and record counts
+
+The viewer keeps a Game of its own only as something to draw. Each frame's
+records add, remove and move its invaders, bullets and bunkers, and Game.draw
+does the rest, so the picture is the game's own.
+"""
+import argparse
+import collections
+import socket
+import struct
+import sys
+
+import pygame
+import space_invaders as si
+
+RECORDS = si.SPECTATE_RECORDS
+FRAME = si.SPECTATE_FRAME
+
+
+class FrameReader:
+    """Splits a byte stream into frames as the bytes arrive"""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.started = False
+
+    def feed(self, data):
+        self.buffer += data
+
+    def frames(self):
+        """Every complete frame received so far, as (tick, game time, flags, records)"""
+        buffer = self.buffer
+        offset = 0
+        if not self.started:
+            if len(buffer) < len(si.SPECTATE_MAGIC):
+                return
+            if not buffer.startswith(si.SPECTATE_MAGIC):
+                raise ValueError("not a spectator stream")
+            self.started = True
+            offset = len(si.SPECTATE_MAGIC)
+        try:
+            while len(buffer) - offset >= FRAME.size:
+                size, tick, now, flags = FRAME.unpack_from(buffer, offset)
+                end = offset + FRAME.size + size
+                if end > len(buffer):
+                    break
+                yield tick, now, flags, bytes(buffer[offset + FRAME.size:end])
+                offset = end
+        finally:
+            del buffer[:offset]
+
+
+def iter_records(body):
+    """(opcode, fields) for each record in a frame body"""
+    offset = 0
+    while offset < len(body):
+        op = body[offset]
+        layout = RECORDS[op]
+        fields = layout.unpack_from(body, offset)[1:]
+        offset += layout.size
+        if op == si.SPEC_STRESS:
+            length, = fields
+            fields = (body[offset:offset + length].decode('utf-8'),)
+            offset += length
+        elif op == si.SPEC_LATTICE_SHAPE:
+            rows, cols = fields
+            values = struct.unpack_from(f'<{cols + rows}d', body, offset)
+            fields = (values[:cols], values[cols:])
+            offset += 8 * (cols + rows)
+        elif op == si.SPEC_LATTICE:
+            # Only the vectors that changed are there; the others come back as None
+            mask, rows, cols, x, y = fields
+            vectors = []
+            for bit, length in enumerate((rows, cols, rows, cols)):
+                if mask & (1 << bit):
+                    vectors.append(struct.unpack_from(f'<{length}d', body, offset))
+                    offset += 8 * length
+                else:
+                    vectors.append(None)
+            fields = (x, y, vectors)
+        yield op, fields
+
+
+class SpectatorView:
+    """The viewer's copy of the game, kept up to date by applying frames"""
+    def __init__(self):
+        game = si.Game()
+        game.rewind = None
+        game.title_screen = False
+        game.mute_sounds = game.mute_bgm = True
+        self.game = game
+        self.tick = 0
+        self.invaders = {}  # Entity id -> Invader
+        self.lattice = None  # [col_x, row_y, formation x, y, row_dx, col_dx, row_dy, col_dy]
+        self.bullets = {}   # Entity id -> (kind, Bullet)
+        self.field = None   # Boss bullets, when numpy is around to hold them
+        try:
+            import numpy
+            self.field = si.BulletField(numpy)
+        except ImportError:
+            pass
+        self.clear()
+
+    def clear(self):
+        game = self.game
+        self.invaders.clear()
+        self.bullets.clear()
+        self.lattice = None
+        game.invaders = []
+        game.player_bullets = []
+        game.invader_bullets = []
+        game.shields = []
+        game.boss = None
+        game.boss_bullets = self.field
+        if self.field is not None:
+            self.field.count = 0
+
+    def apply(self, tick, now, flags, body):
+        """Bring the view forward by one frame"""
+        game = self.game
+        self.tick = tick
+        game.scheduler.now = now
+        field = self.field
+        if flags & si.SPECTATE_MOVED:
+            for _, bullet in self.bullets.values():
+                bullet.update()
+            if field is not None and field.count:
+                rows = field.data[:field.count]
+                rows[:, 2:4] += rows[:, 4:6]
+                rows[:, 0:2] += rows[:, 2:4]
+
+        gone_shots = []
+        placed = False  # Whether the lattice put its invaders in place this frame
+        for op, fields in iter_records(body):
+            if op == si.SPEC_LATTICE:
+                self.place(*fields)
+                placed = True
+            elif op == si.SPEC_SHIFT:
+                dx, dy = fields
+                for invader in self.invaders.values():
+                    if not (placed and invader.row is not None):
+                        invader.update(dx, dy)
+            elif op == si.SPEC_MOVE:
+                invader = self.invaders[fields[0]]
+                invader.x, invader.y = fields[1:3]
+                invader.rect.topleft = fields[3:]
+            elif op == si.SPEC_CELL:
+                self.set_cell(self.invaders[fields[0]], *fields[1:])
+            elif op == si.SPEC_BULLET_Y:
+                bullet = self.bullets[fields[0]][1]
+                bullet.y = fields[1]
+                bullet.rect.y = bullet.y
+            elif op == si.SPEC_REMOVE:
+                if self.invaders.pop(fields[0], None) is None:
+                    self.bullets.pop(fields[0], None)
+            elif op == si.SPEC_BULLET:
+                entity, kind, x, y, speed, *color = fields
+                self.bullets[entity] = (kind, si.Bullet(x, y, speed, tuple(color)))
+            elif op == si.SPEC_SHOT:
+                if field is not None:
+                    self.put_shot(fields[0], fields[1:7], tuple(fields[7:]))
+            elif op == si.SPEC_SHOT_GONE:
+                gone_shots.append(fields[0])
+            elif op == si.SPEC_SHOTS_CLEAR:
+                gone_shots = []
+                if field is not None:
+                    field.count = 0
+            elif op == si.SPEC_INVADER:
+                entity, x, y, rect_x, rect_y, invader_type, health, max_health, width, height, hit_until, row, col = fields
+                invader = si.Invader(x, y, invader_type, width, height)
+                invader.rect.topleft = (rect_x, rect_y)
+                invader.health, invader.max_health, invader.hit_until = health, max_health, hit_until
+                self.set_cell(invader, row, col)
+                self.invaders[entity] = invader
+            elif op == si.SPEC_LATTICE_SHAPE:
+                self.lattice = [*fields, 0.0, 0.0, None, None, None, None]
+            elif op == si.SPEC_HIT:
+                invader = self.invaders[fields[0]]
+                invader.health, invader.hit_until = fields[1:]
+            elif op == si.SPEC_PLAYER:
+                player = game.player
+                player.x, player.hit_until, player.death_ends, state = fields
+                player.rect.x = player.x
+                player.is_dying, player.is_invincible = bool(state & 1), bool(state & 2)
+            elif op == si.SPEC_GAME:
+                game.score, game.lives, game.level, state = fields
+                for bit, name in enumerate(si.SPECTATE_FLAGS):
+                    setattr(game, name, bool(state & (1 << bit)))
+            elif op == si.SPEC_STRESS:
+                game.stress = fields[0] or None
+            elif op == si.SPEC_SHIELD:
+                index, x, y = fields
+                if index < len(game.shields):
+                    game.shields[index] = si.Shield(x, y)
+                else:
+                    game.shields.append(si.Shield(x, y))
+            elif op == si.SPEC_CARVE:
+                shield = game.shields[fields[0]]
+                kind, x, y, a, b = fields[1:]
+                if kind == 0:
+                    shield.carve(x, y, a)
+                else:
+                    shield.erase_rect(pygame.Rect(shield.rect.x + x, shield.rect.y + y, a, b))
+            elif op == si.SPEC_BOSS:
+                x, health, max_health, hit_until = fields
+                if game.boss is None:
+                    game.boss = si.Invader(x, si.BOSS_Y, 5, si.BOSS_WIDTH, si.BOSS_HEIGHT)
+                boss = game.boss
+                boss.x, boss.health, boss.max_health, boss.hit_until = x, health, max_health, hit_until
+                boss.rect.x = x
+            elif op == si.SPEC_BOSS_GONE:
+                game.boss = None
+            elif op == si.SPEC_RESET:
+                self.clear()
+
+        if gone_shots and field is not None and field.count:
+            field.keep(~field.np.isin(field.ids[:field.count], gone_shots))
+        game.invaders = list(self.invaders.values())
+        game.player_bullets = [bullet for kind, bullet in self.bullets.values() if kind == 0]
+        game.invader_bullets = [bullet for kind, bullet in self.bullets.values() if kind == 1]
+
+    def set_cell(self, invader, row, col):
+        if row == si.SPECTATE_OFF_LATTICE:
+            invader.row = invader.col = None
+        else:
+            invader.row, invader.col = row, col
+
+    def place(self, x, y, vectors):
+        """Take the lattice's new offsets and move its invaders to their cells, as FormationMotion.place does"""
+        lattice = self.lattice
+        lattice[2:4] = x, y
+        for index, vector in enumerate(vectors):
+            if vector is not None:
+                lattice[4 + index] = vector
+        col_x, row_y, x, y, row_dx, col_dx, row_dy, col_dy = lattice
+        for invader in self.invaders.values():
+            row, col = invader.row, invader.col
+            if row is not None:
+                invader.x = (x + col_x[col]) + (row_dx[row] + col_dx[col])
+                invader.y = (y + row_y[row]) + (row_dy[row] + col_dy[col])
+                invader.rect.topleft = (si.rect_coordinate(invader.x), si.rect_coordinate(invader.y))
+
+    def put_shot(self, shot_id, row, color):
+        """Add a boss bullet, or put one back on the path the game says it's on"""
+        field = self.field
+        np = field.np
+        ids = field.ids[:field.count]
+        index = int(np.searchsorted(ids, shot_id))
+        if index < field.count and ids[index] == shot_id:
+            field.data[index] = row
+            if color not in field.palette:
+                field.palette.append(color)
+            field.colors[index] = field.palette.index(color)
+        else:
+            field.append(np.array([row]), color, [shot_id])
+
+    def draw(self, screen, status=None):
+        self.game.draw(screen)
+        font = si.app.font(24)
+        label = font.render(status or "SPECTATING", True, si.YELLOW)
+        screen.blit(label, label.get_rect(midbottom=(si.SCREEN_WIDTH // 2, si.SCREEN_HEIGHT - 4)))
+
+
+def run_viewer(source, speed=1.0):
+    """Show frames from source, a callable returning new bytes or None once the stream has ended.
+
+    speed is frames per display frame for a recording; None plays whatever has
+    arrived, for a live stream.
+    """
+    si.app.open_window(fullscreen=False)
+    view = SpectatorView()
+    reader = FrameReader()
+    pending = collections.deque()
+    ended = False
+    budget = 0.0
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            elif event.type == pygame.VIDEORESIZE:
+                si.app.note_resize(event.size)
+        if not ended and (speed is None or len(pending) < si.FPS + speed):
+            data = source()
+            if data is None:
+                ended = True
+            elif data:
+                reader.feed(data)
+                pending.extend(reader.frames())
+        # A live stream plays everything that arrived; a recording plays at its own pace
+        budget = len(pending) if speed is None else budget + speed
+        while pending and budget >= 1:
+            view.apply(*pending.popleft())
+            budget -= 1
+        if not pending:
+            budget = 0.0
+
+        status = None
+        if ended and not pending:
+            status = f"STREAM ENDED (tick {view.tick}) - ESC to quit"
+        view.draw(si.app.screen, status)
+        si.app.present()
+        si.app.clock.tick(si.FPS)
+    pygame.quit()
+    return 0
+
+
+def replay(args):
+    with open(args.path, 'rb') as stream:
+        return run_viewer(lambda: stream.read(64 * 1024) or None, args.speed)
+
+
+def watch(args):
+    host, _, port = args.address.rpartition(':')
+    sock = socket.create_connection((host or '127.0.0.1', int(port)))
+    sock.setblocking(False)
+    def source():
+        try:
+            data = sock.recv(1 << 20)
+        except BlockingIOError:
+            return b''
+        except OSError:
+            return None
+        return data or None
+    return run_viewer(source, None)
+
+
+def info(args):
+    """Frame count, sizes and what the records were spent on"""
+    with open(args.path, 'rb') as f:
+        reader = FrameReader()
+        reader.feed(f.read())
+    sizes = []
+    counts = {}
+    names = {value: name for name, value in vars(si).items() if name.startswith('SPEC_')}
+    for _, _, _, body in reader.frames():
+        sizes.append(FRAME.size + len(body))
+        for op, _ in iter_records(body):
+            counts[op] = counts.get(op, 0) + 1
+    if not sizes:
+        print("no frames")
+        return 1
+    total = sum(sizes)
+    seconds = len(sizes) / si.FPS
+    print(f"{len(sizes)} frames ({seconds:.1f} s at {si.FPS} FPS), {total / 1024:.1f} KB, "
+          f"{total / seconds / 1024:.2f} KB/s")
+    print(f"frame bytes: mean {total / len(sizes):.1f}  median {sorted(sizes)[len(sizes) // 2]}  max {max(sizes)}")
+    for op, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {names[op]:<18}{count:>10}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    play = commands.add_parser('replay', help="Play back a recorded stream")
+    play.add_argument('path')
+    play.add_argument('--speed', type=float, default=1.0, help="Frames shown per display frame")
+    live = commands.add_parser('watch', help="Follow a game serving a stream on [HOST:]PORT")
+    live.add_argument('address')
+    stats = commands.add_parser('info', help="Report a recording's size and contents")
+    stats.add_argument('path')
+    args = parser.parse_args(argv)
+    return {'replay': replay, 'watch': watch, 'info': info}[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())